@@ -1,32 +1,136 @@
 import sqlite3
+import threading
+
+DB_PATH = 'game.db'
+
+# One long-lived connection per thread. Opening a connection (and re-preparing
+# every statement on it) costs far more than the queries the game runs, so the
+# connection is kept open and sqlite3's per-connection statement cache reuses
+# prepared statements across calls.
+STATEMENT_CACHE_SIZE = 256
+
+# Players kept in the materialized leaderboard table
+LEADERBOARD_SIZE = 100
+
+# Schema migrations, applied in order by init_db(). PRAGMA user_version
+# records how many have run, so each one runs exactly once per database.
+MIGRATIONS = [
+    # 1: per-player stats and history read (user_id, date_time, score) straight
+    # from an index, and the global top score is the last entry of another
+    '''
+    CREATE INDEX IF NOT EXISTS idx_game_scores_user_date ON game_scores(user_id, date_time, score);
+    CREATE INDEX IF NOT EXISTS idx_game_scores_score ON game_scores(score);
+    ''',
+    # 2: materialized top players and running game totals, kept up to date by
+    # leaderboard.save_scores() so reads never scan users or game_scores
+    f'''
+    CREATE INDEX IF NOT EXISTS idx_users_score ON users(score);
+    CREATE TABLE IF NOT EXISTS leaderboard (
+        user_id INTEGER PRIMARY KEY,
+        score INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO leaderboard (user_id, score)
+        SELECT id, score FROM users WHERE score > 0 ORDER BY score DESC, id LIMIT {LEADERBOARD_SIZE};
+    CREATE TABLE IF NOT EXISTS score_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        games INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        best_score INTEGER,
+        best_user_id INTEGER
+    );
+    INSERT OR IGNORE INTO score_totals (id, games, total)
+        SELECT 1, COUNT(*), IFNULL(SUM(score), 0) FROM game_scores;
+    UPDATE score_totals SET (best_score, best_user_id) =
+        (SELECT score, user_id FROM game_scores ORDER BY score DESC LIMIT 1);
+    ''',
+    # 3: level reached in each game; NULL for games saved before it was kept
+    '''
+    ALTER TABLE game_scores ADD COLUMN level INTEGER;
+    ''',
+    # 4: the top of the leaderboard in order, so reading a page (and trimming
+    # the table) walks the index instead of sorting
+    '''
+    CREATE INDEX IF NOT EXISTS idx_leaderboard_score ON leaderboard(score DESC, user_id);
+    ''',
+]
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0  # Bumped by close_all(), so threads know their connection was closed
+
+def _open_connection():
+    # Each connection is only used by the thread that opened it; the check is
+    # disabled so close_all() can close worker connections from the main thread
+    conn = sqlite3.connect(DB_PATH, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+    # WAL lets the dashboard read while a score is being written, and with
+    # synchronous=NORMAL a commit no longer waits for an fsync of the main file
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-8000")  # 8 MB page cache
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+def get_connection():
+    """Get this thread's shared connection, opening it on first use.
+
+    The connection stays open; callers must not close it. Use `with conn:`
+    around writes so they are committed (or rolled back on error).
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.generation != _generation:
+        conn = _open_connection()
+        with _connections_lock:
+            _connections.append(conn)
+            _local.conn = conn
+            _local.generation = _generation
+    return conn
+
+def close_all():
+    """Close every thread's connection, e.g. when the game exits.
+
+    A thread that uses the database afterwards gets a new connection.
+    """
+    global _generation
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        _generation += 1
+    _local.conn = None
 
 def init_db():
-    conn = sqlite3.connect('game.db')
+    conn = get_connection()
     c = conn.cursor()
 
-    # Buat tabel user
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        score INTEGER DEFAULT 0
-    )
-    ''')
-    
-    # Create game_scores table to track individual game sessions
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS game_scores (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        score INTEGER NOT NULL,
-        date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users(id)
-    )
-    ''')
-
-    conn.commit()
-    conn.close()
+    with conn:
+        # Buat tabel user
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            score INTEGER DEFAULT 0
+        )
+        ''')
 
-def get_connection():
-    return sqlite3.connect('game.db')
+        # Create game_scores table to track individual game sessions
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS game_scores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''')
+
+    migrate(conn)
+
+def migrate(conn):
+    """Run the migrations this database has not seen yet"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        # Each migration and its version bump commit together
+        conn.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
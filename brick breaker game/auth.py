@@ -1,24 +1,22 @@
 import sqlite3
 from Db import get_connection
+from leaderboard import remove_player
 
 def register(username, password):
     conn = get_connection()
     c = conn.cursor()
     try:
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-        conn.commit()
+        with conn:
+            c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 def login(username, password):
     conn = get_connection()
     c = conn.cursor()
     c.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
     result = c.fetchone()
-    conn.close()
     return result
 
 def update_username(user_id, new_username):
@@ -28,31 +26,28 @@ def update_username(user_id, new_username):
         # Check if username already exists
         c.execute("SELECT * FROM users WHERE username=? AND id!=?", (new_username, user_id))
         if c.fetchone():
-            conn.close()
             return False, "Username already exists"
         
         # Update username
-        c.execute("UPDATE users SET username=? WHERE id=?", (new_username, user_id))
-        conn.commit()
-        conn.close()
+        with conn:
+            c.execute("UPDATE users SET username=? WHERE id=?", (new_username, user_id))
         return True, "Username updated successfully"
     except Exception as e:
-        conn.close()
         return False, str(e)
 
 def delete_account(user_id):
     conn = get_connection()
     c = conn.cursor()
     try:
-        # Delete user's game records
-        c.execute("DELETE FROM game_scores WHERE user_id=?", (user_id,))
-        
-        # Delete user account
-        c.execute("DELETE FROM users WHERE id=?", (user_id,))
-        
-        conn.commit()
-        conn.close()
+        with conn:
+            # Take the user out of the leaderboard and global totals
+            remove_player(c, user_id)
+            
+            # Delete user's game records
+            c.execute("DELETE FROM game_scores WHERE user_id=?", (user_id,))
+            
+            # Delete user account
+            c.execute("DELETE FROM users WHERE id=?", (user_id,))
         return True, "Account deleted successfully"
     except Exception as e:
-        conn.close()
         return False, str(e)
@@ -0,0 +1,79 @@
+import pygame
+
+# Shared background renderer for the game, dashboard and login screens.
+# Gradients are baked once per (theme, screen size) into a Surface and blitted,
+# and stars are drawn from cached sprites with a single Surface.blits() call.
+
+def game_gradient(progress):
+    r = int(15 * (1 - progress*0.7))
+    g = int(20 * (1 - progress*0.7))
+    b = int(35 + 20 * (1 - progress*0.7))
+    return (r, g, b)
+
+def dashboard_gradient(progress):
+    r = int(20 * (1 - progress))
+    g = int(30 * (1 - progress))
+    b = int(80 + 50 * (1 - progress))
+    return (r, g, b)
+
+def login_gradient(progress):
+    r = int(10 + (30 - 10) * (1 - progress))
+    g = int(20 + (50 - 20) * (1 - progress))
+    b = int(40 + (80 - 40) * (1 - progress))
+    return (r, g, b)
+
+THEMES = {
+    "game": game_gradient,
+    "dashboard": dashboard_gradient,
+    "login": login_gradient,
+}
+
+# Star brightness is rounded to this step so the sprite cache stays small
+BRIGHTNESS_STEP = 8
+
+_gradient_cache = {}
+_star_cache = {}
+
+def get_gradient(theme, size):
+    """Get the baked gradient surface for a theme, rendering it on first use"""
+    key = (theme, size)
+    surface = _gradient_cache.get(key)
+    if surface is None:
+        width, height = size
+        color_at = THEMES[theme]
+        surface = pygame.Surface(size)
+        for y in range(height):
+            pygame.draw.line(surface, color_at(y / height), (0, y), (width, y))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        _gradient_cache[key] = surface
+    return surface
+
+def draw_gradient(screen, theme):
+    screen.blit(get_gradient(theme, screen.get_size()), (0, 0))
+
+def get_star(size, brightness):
+    """Get a cached star sprite of the given radius and grey level"""
+    brightness = min(255, int(brightness) // BRIGHTNESS_STEP * BRIGHTNESS_STEP)
+    key = (size, brightness)
+    sprite = _star_cache.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((size * 2 + 1, size * 2 + 1), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (brightness, brightness, brightness), (size, size), size)
+        _star_cache[key] = sprite
+    return sprite
+
+def draw_stars(screen, stars):
+    """Draw (x, y, radius, brightness) stars as one batched blit"""
+    batch = []
+    for x, y, size, brightness in stars:
+        size = int(size)
+        if size < 1:
+            continue
+        batch.append((get_star(size, brightness), (int(x) - size, int(y) - size)))
+    screen.blits(batch, doreturn=False)
+
+def clear_cache():
+    """Drop all baked surfaces, e.g. after a theme or display mode change"""
+    _gradient_cache.clear()
+    _star_cache.clear()
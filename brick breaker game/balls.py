@@ -0,0 +1,275 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:  # ArrayBallStore below is used instead
+    np = None
+
+# Ball stores for chaos mode. Hundreds of balls are kept in parallel arrays
+# (position, velocity and an alive flag per slot) instead of one object per
+# ball, so moving them and bouncing them off the walls and the paddle takes a
+# few whole-array operations per step. NumPy does those when it is installed;
+# otherwise ArrayBallStore does the same work in plain Python loops.
+#
+# Dead balls only have their alive flag cleared. Their slots are reclaimed by
+# compact(), which the engine calls once enough of them have piled up.
+
+class NumpyBallStore:
+    """Balls in NumPy arrays, moved and bounced with whole-array operations"""
+
+    def __init__(self, radius, capacity=256):
+        self.radius = radius
+        self.count = 0   # Slots in use, alive or dead
+        self.live = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.dx = np.zeros(capacity)
+        self.dy = np.zeros(capacity)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def add(self, x, y, dx, dy):
+        if self.count == len(self.x):
+            self.compact()
+        if self.count == len(self.x):
+            # Still full of live balls, double the capacity
+            self.x, self.y, self.dx, self.dy = (np.concatenate((a, np.zeros_like(a)))
+                                                for a in (self.x, self.y, self.dx, self.dy))
+            self.alive = np.concatenate((self.alive, np.zeros_like(self.alive)))
+        i = self.count
+        self.x[i], self.y[i], self.dx[i], self.dy[i] = x, y, dx, dy
+        self.alive[i] = True
+        self.count += 1
+        self.live += 1
+
+    def compact(self):
+        """Pack the live balls into the first slots"""
+        n = self.count
+        keep = self.alive[:n]
+        for a in (self.x, self.y, self.dx, self.dy):
+            live = a[:n][keep]
+            a[:len(live)] = live
+        self.count = self.live
+        self.alive[:self.count] = True
+        self.alive[self.count:n] = False
+
+    def clear(self):
+        self.alive[:self.count] = False
+        self.count = 0
+        self.live = 0
+
+    def kill(self, indices):
+        self.alive[indices] = False
+        self.live -= len(indices)
+
+    def max_speed(self):
+        n = self.count
+        if not self.live:
+            return 0.0
+        return float(np.max(np.hypot(self.dx[:n], self.dy[:n])[self.alive[:n]]))
+
+    def move(self, dt):
+        n = self.count
+        self.x[:n] += self.dx[:n] * dt
+        self.y[:n] += self.dy[:n] * dt
+
+    def bounce_walls(self, width, height, rng, randomness=0.2, floor=False):
+        """Bounce balls off the side and top walls (and the floor if floor is set).
+
+        Returns the indices of bounced balls and of balls that fell out.
+        """
+        n, r = self.count, self.radius
+        x, y, dx, dy, alive = self.x[:n], self.y[:n], self.dx[:n], self.dy[:n], self.alive[:n]
+        fell = alive & (y > height - r)
+        if floor:
+            lost = np.zeros(0, dtype=np.intp)
+            bottom = fell
+        else:
+            # Balls that fell out are not bounced
+            lost = np.nonzero(fell)[0]
+            alive = alive & ~fell
+            bottom = np.zeros_like(fell)
+        left = alive & (x < r)
+        right = alive & (x > width - r)
+        top = alive & (y < r)
+        x[left] = r
+        x[right] = width - r
+        y[top] = r
+        y[bottom] = height - r
+
+        # Same small random variation of the angle as a single ball gets
+        hit = np.nonzero(left | right | top | bottom)[0]
+        if len(hit):
+            variation = np.array([rng.uniform(-randomness, randomness) for _ in range(len(hit))])
+            angle = np.arctan2(dy[hit], dx[hit]) + variation
+            speed = np.hypot(dx[hit], dy[hit])
+            dx[hit] = np.cos(angle) * speed
+            dy[hit] = np.sin(angle) * speed
+        # Always away from the wall that was hit
+        dx[left] = np.abs(dx[left])
+        dx[right] = -np.abs(dx[right])
+        dy[top] = np.abs(dy[top])
+        dy[bottom] = -np.abs(dy[bottom])
+        return hit, lost
+
+    def bounce_paddle(self, left, top, width, height):
+        """Bounce falling balls off the paddle top, angled by where they land.
+
+        Returns the indices of the balls that hit it.
+        """
+        n, r = self.count, self.radius
+        x, y, dx, dy = self.x[:n], self.y[:n], self.dx[:n], self.dy[:n]
+        hit = np.nonzero(self.alive[:n] & (dy > 0) & (x + r > left) & (x - r < left + width)
+                         & (y + r > top) & (y < top + height))[0]
+        if len(hit):
+            hit_pos = np.clip((x[hit] - left) / width, 0, 1)
+            angle = math.pi * (0.25 + 0.5 * hit_pos)  # Between pi/4 and 3pi/4
+            speed = np.hypot(dx[hit], dy[hit])
+            dx[hit] = np.cos(angle) * speed
+            dy[hit] = -np.sin(angle) * speed
+            y[hit] = top - r
+        return hit
+
+    def above(self, limit):
+        """Indices of live balls reaching above y=limit"""
+        n = self.count
+        return np.nonzero(self.alive[:n] & (self.y[:n] - self.radius < limit))[0]
+
+    def get(self, i):
+        return float(self.x[i]), float(self.y[i]), float(self.dx[i]), float(self.dy[i])
+
+    def set_velocity(self, i, dx, dy):
+        self.dx[i] = dx
+        self.dy[i] = dy
+
+    def positions(self):
+        """(x, y) of every live ball"""
+        n = self.count
+        alive = self.alive[:n]
+        return list(zip(self.x[:n][alive].tolist(), self.y[:n][alive].tolist()))
+
+    def __len__(self):
+        return self.live
+
+class ArrayBallStore:
+    """The same store in plain Python lists, for machines without NumPy"""
+
+    def __init__(self, radius, capacity=256):
+        self.radius = radius
+        self.count = 0
+        self.live = 0
+        self.x = []
+        self.y = []
+        self.dx = []
+        self.dy = []
+        self.alive = []
+
+    def add(self, x, y, dx, dy):
+        self.x.append(x)
+        self.y.append(y)
+        self.dx.append(dx)
+        self.dy.append(dy)
+        self.alive.append(True)
+        self.count += 1
+        self.live += 1
+
+    def compact(self):
+        """Pack the live balls into the first slots"""
+        alive = self.alive
+        for name in ("x", "y", "dx", "dy"):
+            values = getattr(self, name)
+            setattr(self, name, [v for v, a in zip(values, alive) if a])
+        self.count = self.live
+        self.alive = [True] * self.count
+
+    def clear(self):
+        self.x, self.y, self.dx, self.dy, self.alive = [], [], [], [], []
+        self.count = 0
+        self.live = 0
+
+    def kill(self, indices):
+        for i in indices:
+            self.alive[i] = False
+        self.live -= len(indices)
+
+    def max_speed(self):
+        return max((math.hypot(dx, dy) for dx, dy, a in zip(self.dx, self.dy, self.alive) if a), default=0.0)
+
+    def move(self, dt):
+        self.x = [x + dx * dt for x, dx in zip(self.x, self.dx)]
+        self.y = [y + dy * dt for y, dy in zip(self.y, self.dy)]
+
+    def bounce_walls(self, width, height, rng, randomness=0.2, floor=False):
+        """Bounce balls off the side and top walls (and the floor if floor is set).
+
+        Returns the indices of bounced balls and of balls that fell out.
+        """
+        r = self.radius
+        x, y, dx, dy = self.x, self.y, self.dx, self.dy
+        hit, lost = [], []
+        for i, alive in enumerate(self.alive):
+            if not alive:
+                continue
+            xi, yi = x[i], y[i]
+            if r <= xi <= width - r and yi >= r and yi <= height - r:
+                continue
+            if yi > height - r and not floor:
+                lost.append(i)
+                continue
+            hit.append(i)
+
+            # Same small random variation of the angle as a single ball gets
+            angle = math.atan2(dy[i], dx[i]) + rng.uniform(-randomness, randomness)
+            speed = math.hypot(dx[i], dy[i])
+            new_dx, new_dy = math.cos(angle) * speed, math.sin(angle) * speed
+            # Always away from the wall that was hit
+            if xi < r:
+                x[i], new_dx = r, abs(new_dx)
+            elif xi > width - r:
+                x[i], new_dx = width - r, -abs(new_dx)
+            if yi < r:
+                y[i], new_dy = r, abs(new_dy)
+            elif yi > height - r:
+                y[i], new_dy = height - r, -abs(new_dy)
+            dx[i], dy[i] = new_dx, new_dy
+        return hit, lost
+
+    def bounce_paddle(self, left, top, width, height):
+        """Bounce falling balls off the paddle top, angled by where they land.
+
+        Returns the indices of the balls that hit it.
+        """
+        r = self.radius
+        x, y, dx, dy = self.x, self.y, self.dx, self.dy
+        hit = []
+        for i, alive in enumerate(self.alive):
+            if (alive and dy[i] > 0 and x[i] + r > left and x[i] - r < left + width
+                    and y[i] + r > top and y[i] < top + height):
+                hit_pos = min(max((x[i] - left) / width, 0), 1)
+                angle = math.pi * (0.25 + 0.5 * hit_pos)  # Between pi/4 and 3pi/4
+                speed = math.hypot(dx[i], dy[i])
+                dx[i], dy[i] = math.cos(angle) * speed, -math.sin(angle) * speed
+                y[i] = top - r
+                hit.append(i)
+        return hit
+
+    def above(self, limit):
+        """Indices of live balls reaching above y=limit"""
+        limit += self.radius
+        return [i for i, (y, alive) in enumerate(zip(self.y, self.alive)) if alive and y < limit]
+
+    def get(self, i):
+        return self.x[i], self.y[i], self.dx[i], self.dy[i]
+
+    def set_velocity(self, i, dx, dy):
+        self.dx[i] = dx
+        self.dy[i] = dy
+
+    def positions(self):
+        """(x, y) of every live ball"""
+        return [(x, y) for x, y, alive in zip(self.x, self.y, self.alive) if alive]
+
+    def __len__(self):
+        return self.live
+
+# The store the engine uses
+BallStore = NumpyBallStore if np is not None else ArrayBallStore
@@ -0,0 +1,793 @@
+import os
+import sys
+import time
+import math
+import random
+import sqlite3
+import tempfile
+
+# Run without a window so the benchmark works on CI machines and servers
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import engine
+from brickgrid import BrickGrid
+from levels import Level
+
+# Usage: python benchmark.py [frames] [bench ...]
+# Exits with status 1 when a scenario's p99 frame time is over the budget.
+# Rendering benches import pygame lazily, so the engine benches also run on
+# machines without pygame installed.
+
+def open_game():
+    """The game module, with its (dummy) window open for the rendering benches"""
+    import game
+    game.init_display()
+    return game
+
+def time_frames(draw, frames=300):
+    """Run draw() once per frame and return the frame times in milliseconds"""
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        draw()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+def report(name, times):
+    mean = sum(times) / len(times)
+    print(f"{name:<40} mean {mean:7.3f} ms  max {max(times):7.3f} ms")
+    return mean
+
+def legacy_game_background(screen):
+    """The old per-frame background: 600 draw.line calls plus 50 draw.circle calls"""
+    import pygame
+    import background
+    width, height = screen.get_size()
+    for y in range(height):
+        pygame.draw.line(screen, background.game_gradient(y / height), (0, y), (width, y))
+    ticks = pygame.time.get_ticks()
+    for i in range(50):
+        x = (i * 37 + ticks // 50) % width
+        y = (i * 23 + ticks // 100) % height
+        brightness = 50 + int((math.sin(ticks / 1000 + i) + 1) * 25)
+        pygame.draw.circle(screen, (brightness, brightness, brightness), (x, y), (i % 3) * 0.9)
+
+def bench_background(frames=300):
+    import background
+    game = open_game()
+    print("== Background ==")
+    screen = game.screen
+    before = report("per-line gradient (before)", time_frames(lambda: legacy_game_background(screen), frames))
+    background.clear_cache()
+    after = report("cached gradient + batched stars (after)", time_frames(game.draw_background, frames))
+    print(f"speedup: {before / after:.1f}x")
+
+def bench_particles(frames=300):
+    game = open_game()
+    print("== Particles ==")
+    peak = 0
+
+    def frame():
+        nonlocal peak
+        # A multi-ball combo breaking a few bricks every frame
+        for _ in range(4):
+            game.create_brick_particles(400, 100, 0)
+        game.update_particles()
+        peak = max(peak, sum(game.particle_counts().values()))
+
+    report("particle storm update + draw", time_frames(frame, frames))
+    print(f"peak live particles: {peak}  dropped: {game.brick_particles.dropped}")
+
+def bench_text(frames=300):
+    import pygame
+    import fonts
+    game = open_game()
+    print("== Text ==")
+    labels = ["PAUSE", "Score: 1230", "Play Again", "Restart", "Back to Menu"]
+
+    def uncached():
+        for label in labels:
+            game.screen.blit(pygame.font.SysFont(None, 28).render(label, True, game.WHITE), (0, 0))
+
+    def cached():
+        for label in labels:
+            game.screen.blit(fonts.render(label, fonts.get_font(None, 28), game.WHITE), (0, 0))
+
+    before = report("SysFont + render per call (before)", time_frames(uncached, frames))
+    after = report("font registry + text cache (after)", time_frames(cached, frames))
+    print(f"speedup: {before / after:.1f}x  {fonts.cache_stats()}")
+
+def make_wall(count):
+    """A wall of count bricks filling the top half of the playfield"""
+    cols = max(10, int(math.sqrt(count * 4)))
+    rows = math.ceil(count / cols)
+    width = (engine.WIDTH - 20) / cols
+    height = (engine.HEIGHT / 2) / rows
+    return Level("wall", cols, rows, (10, 10), (width, height), (width - 1, height - 1),
+                 [(0, 1, None)], bytes([1] * count + [0] * (cols * rows - count)))
+
+def list_scan(bricks, left, top, right, bottom):
+    """The old Rect.collidelist() style scan over every (x, y, width, height) brick"""
+    for i, (x, y, width, height) in enumerate(bricks):
+        if left < x + width and right > x and top < y + height and bottom > y:
+            return i
+    return -1
+
+def bench_collision(frames=300):
+    print("== Brick collision (20 balls per frame) ==")
+    rng = random.Random(4)
+    r = engine.BALL_RADIUS
+    for count in (50, 500, 5000):
+        grid = BrickGrid(make_wall(count))
+        bricks = [grid.rect(i) for i in grid]
+        balls = [(rng.uniform(r, engine.WIDTH - r), rng.uniform(r, engine.HEIGHT / 2))
+                 for _ in range(frames * 20)]
+
+        # Every ball is tested each frame but only one brick breaks per frame,
+        # and it is put back so the wall stays full
+        def scan_frame():
+            removed = False
+            for _ in range(20):
+                x, y = balls.pop()
+                hit = list_scan(bricks, x - r, y - r, x + r, y + r)
+                if hit != -1 and not removed:
+                    removed = True
+                    brick = bricks[hit]
+                    del bricks[hit]
+                    bricks.append(brick)
+
+        def grid_frame():
+            removed = False
+            for _ in range(20):
+                x, y = balls.pop()
+                hits = grid.query(x - r, y - r, x + r, y + r)
+                if hits and not removed:
+                    removed = True
+                    grid.remove(hits[0])
+                    grid.fill(hits[0])
+
+        saved = list(balls)
+        before = report(f"{count} bricks: list scan + del", time_frames(scan_frame, frames))
+        balls = saved
+        after = report(f"{count} bricks: grid query + remove", time_frames(grid_frame, frames))
+        print(f"speedup: {before / after:.1f}x")
+
+# Cost budget for moving one ball through one 1/60 s step, in microseconds
+PHYSICS_BUDGET_US = 50
+
+def spray_balls(rng, count, speed):
+    """Balls below the brick wall flying upward at random angles"""
+    balls = []
+    for _ in range(count):
+        angle = rng.uniform(math.pi * 0.3, math.pi * 0.7)
+        balls.append(engine.Ball(rng.uniform(50, engine.WIDTH - 50), rng.uniform(250, 450),
+                                 math.cos(angle) * speed, -math.sin(angle) * speed))
+    return balls
+
+def count_tunnels(continuous, speed, shots=100):
+    """Shoot balls at a single brick row and at the paddle, count those that pass through"""
+    rng = random.Random(5)
+    tunnels = 0
+    for _ in range(shots):
+        # Up through the bottom brick row
+        state = engine.GameState()
+        state.continuous = continuous
+        bricks = state.bricks
+        for i in list(bricks):
+            if i // bricks.cols != bricks.rows - 1:
+                bricks.remove(i)
+        state.balls = [engine.Ball(rng.uniform(40, engine.WIDTH - 40), 400, 0.01 * speed, -speed)]
+        for _ in range(60):
+            engine.move_balls(state, 1 / 60)
+            if state.score or not state.balls:
+                break
+        if state.score == 0:
+            tunnels += 1
+
+        # Down onto the middle of the paddle
+        state = engine.GameState()
+        state.continuous = continuous
+        paddle_x = state.paddle_x + state.paddle_width / 2
+        state.balls = [engine.Ball(paddle_x + rng.uniform(-30, 30), 300, 0.01 * speed, speed)]
+        for _ in range(60):
+            engine.move_balls(state, 1 / 60)
+            if not state.balls or state.balls[0].dy < 0:
+                break
+        if not state.balls:
+            tunnels += 1
+    return tunnels
+
+def bench_physics(frames=300):
+    print("== Ball physics (20 balls, 1/60 s steps) ==")
+    for continuous in (False, True):
+        mode = "swept" if continuous else "discrete"
+        for speed in (engine.BALL_SPEED, engine.BALL_SPEED * 10):
+            rng = random.Random(6)
+            state = engine.GameState()
+            state.continuous = continuous
+            elapsed = 0.0
+            ball_steps = 0
+            for _ in range(frames):
+                # Keep 20 balls and a full wall in play
+                state.balls += spray_balls(rng, 20 - len(state.balls), speed)
+                if len(state.bricks) < 25:
+                    state.bricks = engine.create_bricks()
+                ball_steps += len(state.balls)
+                start = time.perf_counter()
+                engine.move_balls(state, 1 / 60)
+                elapsed += time.perf_counter() - start
+            per_ball = elapsed / ball_steps * 1e6
+            verdict = "ok" if per_ball <= PHYSICS_BUDGET_US else "OVER BUDGET"
+            tunnels = count_tunnels(continuous, speed)
+            print(f"{mode:<8} {speed:5d} px/s  {per_ball:6.2f} us/ball/step ({verdict})  tunnelled {tunnels}/200")
+
+# Rows in the synthetic game_scores table; override with BENCH_STATS_ROWS
+STATS_ROWS = int(os.environ.get("BENCH_STATS_ROWS", 10_000_000))
+STATS_USERS = 100_000
+
+def legacy_player_stats(conn, user_id):
+    """The old get_player_stats: five separate queries"""
+    c = conn.cursor()
+    c.execute("SELECT username FROM users WHERE id = ?", (user_id,))
+    c.execute("SELECT MAX(score) FROM game_scores WHERE user_id = ?", (user_id,))
+    c.execute("SELECT AVG(score) FROM game_scores WHERE user_id = ?", (user_id,))
+    c.execute("SELECT COUNT(*) FROM game_scores WHERE user_id = ?", (user_id,))
+    c.execute("SELECT score FROM game_scores WHERE user_id = ? ORDER BY date_time DESC LIMIT 5", (user_id,))
+    c.fetchall()
+
+def legacy_global_stats(conn):
+    """The old get_global_stats and leaderboard: GROUP BY over every game, two
+    full scans, and a sort of the whole users table"""
+    c = conn.cursor()
+    c.execute("SELECT username, score FROM users ORDER BY score DESC LIMIT 10")
+    c.fetchall()
+    c.execute("""
+        SELECT u.username, MAX(g.score) as max_score
+        FROM game_scores g JOIN users u ON g.user_id = u.id
+        GROUP BY g.user_id ORDER BY max_score DESC LIMIT 1
+    """)
+    c.fetchone()
+    c.execute("SELECT AVG(score) FROM game_scores")
+    c.execute("SELECT COUNT(*) FROM game_scores")
+
+def fill_stats_db(path, rows):
+    """A database with STATS_USERS players and rows games spread over them"""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, "
+                 "password TEXT NOT NULL, score INTEGER DEFAULT 0)")
+    conn.execute("CREATE TABLE game_scores (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+                 "score INTEGER NOT NULL, date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP, "
+                 "FOREIGN KEY (user_id) REFERENCES users(id))")
+    # Generated inside SQLite, a Python loop would dominate the setup time
+    conn.execute("""
+        WITH RECURSIVE seq(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < ?)
+        INSERT INTO game_scores (user_id, score, date_time)
+        SELECT abs(random()) % ? + 1, abs(random()) % 5000,
+               datetime('2024-01-01', '+' || i || ' seconds')
+        FROM seq
+    """, (rows, STATS_USERS))
+    conn.execute("""
+        INSERT INTO users (id, username, password, score)
+        SELECT user_id, 'player' || user_id, '', MAX(score) FROM game_scores GROUP BY user_id
+    """)
+    conn.commit()
+    conn.close()
+
+def bench_stats(frames=300):
+    import Db
+    import leaderboard
+    rows = STATS_ROWS
+    print(f"== Dashboard stats ({rows:,} games, {STATS_USERS} players) ==")
+    repeats = max(1, min(frames, 5))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stats.db")
+        start = time.perf_counter()
+        fill_stats_db(path, rows)
+        print(f"built table in {time.perf_counter() - start:.1f} s")
+
+        saved_path = Db.DB_PATH
+        Db.close_all()
+        Db.DB_PATH = path
+        try:
+            conn = Db.get_connection()
+            users = [random.Random(9).randint(1, STATS_USERS) for _ in range(repeats)]
+            user_iter = iter(users)
+            before = report("9 queries, no indexes (before)", time_frames(
+                lambda: (legacy_player_stats(conn, next(user_iter)), legacy_global_stats(conn)), repeats))
+
+            start = time.perf_counter()
+            Db.init_db()
+            print(f"migration (index build) took {time.perf_counter() - start:.1f} s")
+
+            user_iter = iter(users)
+            after = report("indexed + materialized queries (after)", time_frames(
+                lambda: (leaderboard.get_player_stats(next(user_iter)), leaderboard.get_global_stats()), repeats))
+            print(f"speedup: {before / after:.1f}x")
+
+            # The leaderboard page on its own: it should cost the same whatever
+            # the number of players
+            report("top 10 players, plain JOIN (before)", time_frames(
+                lambda: conn.execute("SELECT u.username, l.score FROM leaderboard l JOIN users u ON u.id = l.user_id "
+                                     "ORDER BY l.score DESC, l.user_id LIMIT 10").fetchall(), repeats))
+            report("top 10 players, leaderboard index (after)", time_frames(
+                lambda: leaderboard.get_top_scores(10), max(repeats, 100)))
+            plan = conn.execute("EXPLAIN QUERY PLAN SELECT u.username, l.score FROM leaderboard l "
+                                "CROSS JOIN users u ON u.id = l.user_id ORDER BY l.score DESC, l.user_id LIMIT 10")
+            print("  plan: " + "; ".join(row[3] for row in plan))
+        finally:
+            Db.close_all()
+            Db.DB_PATH = saved_path
+
+# Frame budget at 60 FPS, in milliseconds
+FRAME_BUDGET_MS = 1000 / 60
+
+def bench_chaos(frames=300):
+    import balls
+    print(f"== Chaos mode (1/60 s steps, god mode, NumPy {'on' if balls.np is not None else 'off'}) ==")
+    for count in (500, 2000):
+        for mode in ("Ball objects", "ball store"):
+            state = engine.GameState(8)
+            state.god_mode = True  # Keep every ball in play
+            if mode == "ball store":
+                engine.add_swarm_balls(state, count)
+            else:
+                state.balls = spray_balls(random.Random(8), count, engine.BALL_SPEED)
+
+            def frame():
+                if len(state.bricks) < 25:
+                    state.bricks = engine.create_bricks()
+                state.events = []
+                engine.move_balls(state, 1 / 60)
+                engine.move_swarm(state, 1 / 60)
+
+            mean = report(f"{count} balls: {mode}", time_frames(frame, frames))
+            print(f"{'':<40} {mean / FRAME_BUDGET_MS:6.1%} of the frame budget")
+
+def bot_input(state):
+    """Paddle input of a bot that chases the lowest ball"""
+    if not state.balls:
+        return 0
+    ball = max(state.balls, key=lambda b: b.y)
+    center = state.paddle_x + state.paddle_width / 2
+    if ball.x < center - 10:
+        return engine.INPUT_LEFT
+    if ball.x > center + 10:
+        return engine.INPUT_RIGHT
+    return 0
+
+def frame_times(fps, seed=0):
+    """Endless real frame times of a display: steady at fps, or (fps None) uneven,
+    with jitter, dropped frames and the odd stall longer than MAX_FRAME_TIME"""
+    rng = random.Random(seed)
+    while True:
+        if fps is not None:
+            yield 1 / fps
+        elif rng.random() < 0.01:
+            yield rng.uniform(0.3, 0.6)  # Window drag, breakpoint
+        else:
+            yield rng.choice((1 / 144, 1 / 60, 1 / 30)) * rng.uniform(0.5, 2.5)
+
+def game_signature(state):
+    """Everything about a game's state the rules care about, for exact comparisons"""
+    return (state.score, state.level, state.time, state.paddle_x, bytes(state.bricks.hp),
+            tuple((ball.x, ball.y, ball.dx, ball.dy) for ball in state.balls),
+            tuple(sorted(state.powerups.active.items())))
+
+def play_at_frame_rate(seed, frames, steps):
+    """A bot game driven like game.start(), one frame per real frame time in frames.
+
+    Returns the game_signature() after exactly steps simulation steps, the
+    number of frames that took and the largest error seen in the timestep's
+    bookkeeping: simulated time plus alpha of a step must add up to the real
+    time fed in (each frame capped at MAX_FRAME_TIME).
+    """
+    from timestep import FixedTimestep, MAX_FRAME_TIME
+    state = engine.GameState(seed)
+    state.god_mode = True
+    state.powerups.activate(state, "score_boost")
+    simulation = FixedTimestep(engine.STEP_RATE)
+    dt = simulation.dt
+    done = 0
+    real_time = 0.0
+    worst = 0.0
+    for count, elapsed in enumerate(frames, 1):
+        real_time += min(elapsed, MAX_FRAME_TIME)
+        for _ in range(simulation.advance(elapsed)):
+            # The bot reads the state every step; game.start() reads the
+            # keyboard once a frame, which would make a bot's moves depend
+            # on the frame rate
+            engine.step(state, bot_input(state), dt)
+            done += 1
+            if done == steps:
+                return game_signature(state), count, worst
+        alpha = simulation.alpha
+        if not 0.0 <= alpha < 1.0:
+            worst = max(worst, abs(alpha))
+        worst = max(worst, abs((done + alpha) * dt - real_time))
+
+def bench_frame_rates(frames=300):
+    print("== Same game at different frame rates (60 s, score boost and god mode) ==")
+    steps = 60 * engine.STEP_RATE
+    results = {}
+    ok = True
+    for fps in (30, 60, 144, None):
+        start = time.perf_counter()
+        results[fps], count, worst = play_at_frame_rate(12, frame_times(fps), steps)
+        score, level, game_time = results[fps][:3]
+        label = f"{fps} FPS" if fps else "uneven"
+        # Rounding of the accumulated frame times is all that may be left
+        ok &= worst < 1e-6
+        print(f"{label:<7} {count:5d} frames  score {score:6d}  level {level}  game time {game_time:.3f} s  "
+              f"timestep error {worst:.1e} s  ({time.perf_counter() - start:.2f} s wall)")
+    same = len(set(results.values())) == 1
+    print("identical" if same else "RESULTS DIFFER")
+    return same and ok
+
+def stuck_ball_time(seed, steps):
+    """Game time at which a ball of a paddle bot game stopped moving for a second, or None"""
+    state = engine.GameState(seed)
+    still = 0
+    last = None
+    for _ in range(steps):
+        engine.step(state, bot_input(state), 1 / engine.STEP_RATE)
+        if state.game_over:
+            return None
+        positions = [(ball.x, ball.y) for ball in state.balls]
+        # Nothing moves during a level transition
+        still = still + 1 if positions == last and not state.level_cleared else 0
+        last = positions
+        if still >= engine.STEP_RATE:
+            return state.time
+    return None
+
+def bench_stuck(frames=300):
+    count = max(8, frames // 10)
+    print(f"== Stuck balls ({count} paddle bot games, 2 minutes each) ==")
+    # The bot keeps the paddle under the ball, which used to trap it inside
+    # the paddle, bouncing between the top and bottom faces at zero time
+    stuck = {}
+    for seed in range(count):
+        stuck_at = stuck_ball_time(seed, 2 * 60 * engine.STEP_RATE)
+        if stuck_at is not None:
+            stuck[seed] = stuck_at
+    for seed, stuck_at in stuck.items():
+        print(f"seed {seed}: ball stuck at {stuck_at:.1f} s")
+    print(f"stuck: {len(stuck)}/{count}")
+    return not stuck
+
+def bot_replay(seed, max_steps=60 * engine.STEP_RATE):
+    """Record a game played by the paddle bot"""
+    from replay import Replay
+    state = engine.GameState(seed)
+    replay = Replay(seed, engine.STEP_RATE)
+    for _ in range(max_steps):
+        inputs = bot_input(state)
+        replay.record(inputs)
+        engine.step(state, inputs, 1 / engine.STEP_RATE)
+        if state.game_over:
+            break
+    replay.score = state.score
+    return replay.to_bytes()
+
+def bench_verify(frames=300):
+    import verify
+    count = max(8, frames // 10)
+    print(f"== Replay verification ({count} one-minute replays) ==")
+    blobs = [bot_replay(seed) for seed in range(count)]
+    # One forged score, which must be rejected
+    from replay import Replay
+    forged = Replay.from_bytes(blobs[0])
+    forged.score += 1000
+    blobs[0] = forged.to_bytes()
+
+    start = time.perf_counter()
+    serial = [verify.check_replay(blob) for blob in blobs]
+    elapsed = time.perf_counter() - start
+    print(f"{'single process':<40} {count / elapsed:7.1f} replays/s")
+
+    start = time.perf_counter()
+    pooled = verify.verify_replays(blobs)
+    elapsed = time.perf_counter() - start
+    print(f"{f'process pool ({os.cpu_count()} workers)':<40} {count / elapsed:7.1f} replays/s")
+    rejected = sum(not ok for ok, _, _ in pooled)
+    print(f"rejected: {rejected} (expected 1)  results agree: {serial == pooled}")
+
+def bench_render(frames=300):
+    import pygame
+    game = open_game()
+    from dirty import DirtyRenderer
+    print("== Gameplay rendering (bot playing, 1/60 s steps) ==")
+    results = {}
+    for dirty in (False, True):
+        state = engine.GameState(10)
+        renderer = DirtyRenderer(game.screen, lambda surface: game.draw_static_layer(surface, state.bricks))
+        game.particles.clear()
+        game.brick_particles.clear()
+        game.special_effect_particles.clear()
+
+        def frame():
+            engine.step(state, bot_input(state), 1 / 60)
+            game.spawn_event_particles(state)
+            game.tick_particles(state)
+            if dirty:
+                rects = game.draw_frame_background(renderer, state.bricks)
+                rects += game.draw_game(state, bricks=False)
+                renderer.end(rects)
+            else:
+                game.draw_background()
+                game.draw_game(state)
+                pygame.display.flip()
+
+        name = "dirty rects + display.update" if dirty else "full redraw + flip (before)"
+        results[dirty] = report(name, time_frames(frame, frames))
+    stats = renderer.stats
+    print(f"speedup: {results[False] / results[True]:.1f}x  static rebuilds: {stats['rebuilds']}  "
+          f"full updates: {stats['full_frames']}/{stats['frames']}  "
+          f"rects per partial update: {stats['rects'] / max(1, stats['frames'] - stats['full_frames']):.1f}")
+
+def render_frame(dirty, menu):
+    """The first frame of a fresh game (menu: under the pause or game over card) as RGB bytes"""
+    import pygame
+    game = open_game()
+    state, renderer = new_game_renderer(7)
+    saved = game.dirty_rects
+    game.dirty_rects = dirty
+    try:
+        game.screen.fill(game.BLACK)
+        game.draw_frame_background(renderer, state.bricks, menu)
+        if not menu:
+            game.draw_game(state, bricks=not dirty)
+        return pygame.image.tobytes(game.screen, "RGB")
+    finally:
+        game.dirty_rects = saved
+
+def bench_render_modes(frames=300):
+    import pygame
+    print("== Dirty-rect and full-redraw frames ==")
+    get_ticks = pygame.time.get_ticks
+    pygame.time.get_ticks = lambda: 5000  # The same stars and pulses in both frames
+    same = True
+    try:
+        for name, menu in (("gameplay", False), ("pause / game over", True)):
+            match = render_frame(True, menu) == render_frame(False, menu)
+            same &= match
+            print(f"{name:<20} {'identical' if match else 'FRAMES DIFFER'}")
+    finally:
+        pygame.time.get_ticks = get_ticks
+    return same
+
+def bench_sprites(frames=300):
+    import pygame
+    game = open_game()
+    import sprites
+    print("== Bricks, paddle and 20 balls ==")
+    state = engine.GameState(11)
+    state.balls = spray_balls(random.Random(11), 20, engine.BALL_SPEED)
+    paddle = pygame.Rect(int(state.paddle_x), state.paddle_y, int(state.paddle_width), engine.PADDLE_HEIGHT)
+
+    def painted():
+        # What every frame used to do: paint each shape from scratch
+        for brick in state.bricks:
+            color = game.BRICK_COLORS[state.bricks.color[brick] % len(game.BRICK_COLORS)]
+            game.paint_brick(game.screen, pygame.Rect(state.bricks.rect(brick)), color)
+        game.paint_paddle(game.screen, paddle, game.PADDLE_GLOW)
+        for ball in state.balls:
+            game.paint_ball(game.screen, (int(ball.x), int(ball.y)))
+
+    def blitted():
+        game.draw_bricks(state.bricks)
+        game.draw_paddle(paddle)
+        for ball in state.balls:
+            game.draw_ball(ball.x, ball.y)
+
+    before = report("rects, circles and scanlines (before)", time_frames(painted, frames))
+    after = report("pre-rendered sprites (after)", time_frames(blitted, frames))
+    print(f"speedup: {before / after:.1f}x  {sprites.cache_stats()}")
+
+# Scripted scenarios for bench_scenarios. Each one sets up a game (or screen)
+# and returns the function that runs one frame of it, the way game.start()
+# would; they are set up afresh for the timing and the allocation passes.
+
+def percentile(values, p):
+    """The p-th percentile of values (nearest rank)"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+def game_frame(state, renderer, inputs=None):
+    """One 60 FPS frame of gameplay: simulation steps, particles, HUD and dirty-rect rendering"""
+    import pygame
+    import cheat
+    game = open_game()
+
+    def frame():
+        rects = game.draw_frame_background(renderer, state.bricks)
+        for _ in range(engine.STEP_RATE // 60):
+            engine.step(state, bot_input(state) if inputs is None else inputs(state), 1 / engine.STEP_RATE)
+            game.spawn_event_particles(state)
+        game.tick_particles(state)
+        score_bg = pygame.Rect(60, 10, 120, 30)
+        pygame.draw.rect(game.screen, (30, 30, 60, 180), score_bg, border_radius=7)
+        rects.append(score_bg)
+        rects.append(game.draw_text(f"Score: {state.score}", 120, 25, game.WHITE, 24))
+        rects += game.draw_game(state, bricks=False)
+        rects += cheat.draw_cheat_status(game.screen, game.small_font)
+        renderer.end(rects)
+    return frame
+
+def new_game_renderer(seed):
+    game = open_game()
+    from dirty import DirtyRenderer
+    state = engine.GameState(seed)
+    for pool in (game.particles, game.brick_particles, game.special_effect_particles):
+        pool.clear()
+    game.cosmetic.seed(seed)
+    return state, DirtyRenderer(game.screen, lambda surface: game.draw_static_layer(surface, state.bricks))
+
+def scenario_full_wall():
+    """A fresh level with every brick standing, played by the paddle bot"""
+    state, renderer = new_game_renderer(20)
+    frame = game_frame(state, renderer)
+
+    def full_wall():
+        if len(state.bricks) < len(engine.create_bricks()):
+            state.bricks = engine.create_bricks()
+        frame()
+    return full_wall
+
+def scenario_cheat_balls():
+    """Cheat mode with 20 balls in play and god mode on"""
+    state, renderer = new_game_renderer(21)
+    state.god_mode = True
+    engine.add_swarm_balls(state, 19)
+    return game_frame(state, renderer)
+
+def scenario_particle_storm():
+    """Every brick bursting at once, then the level clear celebration and refill"""
+    game = open_game()
+    state, renderer = new_game_renderer(22)
+    for brick in state.bricks:
+        game.create_brick_particles(*state.bricks.center(brick), state.bricks.color[brick])
+    state.bricks.clear()
+    return game_frame(state, renderer)
+
+def scenario_dashboard():
+    """The dashboard main menu with the player and global stats cards"""
+    import pygame
+    import dashboard
+    import leaderboard
+    screen = open_game().screen
+    width = screen.get_width()
+    user_stats = leaderboard.get_player_stats(1)
+    global_stats = leaderboard.get_global_stats()
+
+    def frame():
+        dashboard.menu_animation = (dashboard.menu_animation + 1) % 10000
+        screen.fill(dashboard.BLACK)
+        dashboard.draw_gradient_background(screen)
+        dashboard.draw_text(screen, "BRICK BREAKER", dashboard.font_title, dashboard.WHITE, width // 2, 100, False)
+        for i, label in enumerate(("Play Game", "Leaderboard", "My Profile", "Logout")):
+            dashboard.draw_button(screen, label, pygame.Rect(width // 2 - 120, 210 + i * 60, 240, 50), dashboard.BLUE)
+        dashboard.draw_card(screen, "Your Stats", [
+            f"Highest: {user_stats['highest_score']}",
+            f"Average: {user_stats['average_score']}",
+            f"Games: {user_stats['games_played']}",
+        ], pygame.Rect(50, 200, 220, 180))
+        dashboard.draw_card(screen, "Global Stats", [
+            f"Top Score: {global_stats['highest_score']}",
+            f"By: {global_stats['highest_player']}",
+            f"Games Played: {global_stats['total_games']}",
+        ], pygame.Rect(width - 270, 200, 220, 180))
+        pygame.display.flip()
+    return frame
+
+def measure_allocations(frame, frames):
+    """Run frame() under tracemalloc; return the KB allocated and blocks kept per frame"""
+    import tracemalloc
+    allocated, blocks = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            before_blocks = sys.getallocatedblocks()
+            frame()
+            _, peak = tracemalloc.get_traced_memory()
+            allocated.append((peak - before) / 1024)
+            blocks.append(sys.getallocatedblocks() - before_blocks)
+    finally:
+        tracemalloc.stop()
+    return allocated, blocks
+
+def game_particle_count():
+    import game
+    return sum(game.particle_counts().values())
+
+def run_scenario(name, setup, frames, particle_count=game_particle_count):
+    """Time a scenario, then re-run it for allocations and particle counts.
+
+    Returns the p99 frame time in milliseconds.
+    """
+    times = time_frames(setup(), frames)
+    frame = setup()
+    counts = []
+
+    def counted():
+        frame()
+        counts.append(particle_count())
+
+    allocated, blocks = measure_allocations(counted, frames)
+    p99 = percentile(times, 99)
+    print(f"{name:<20} p50 {percentile(times, 50):7.3f}  p95 {percentile(times, 95):7.3f}  "
+          f"p99 {p99:7.3f}  max {max(times):7.3f} ms{'  OVER BUDGET' if p99 > FRAME_BUDGET_MS else ''}")
+    print(f"{'':<20} alloc/frame mean {sum(allocated) / frames:7.1f} KB  p99 {percentile(allocated, 99):7.1f} KB  "
+          f"blocks kept {sum(blocks) / frames:+.1f}/frame  particles mean {sum(counts) / frames:.0f} "
+          f"peak {max(counts)}")
+    return p99
+
+def bench_scenarios(frames=300):
+    import Db
+    print(f"== Scenarios ({frames} frames, frame budget {FRAME_BUDGET_MS:.2f} ms) ==")
+    over = []
+    scenarios = [
+        ("full brick wall", scenario_full_wall),
+        ("20-ball cheat mode", scenario_cheat_balls),
+        ("particle storm", scenario_particle_storm),
+    ]
+    for name, setup in scenarios:
+        if run_scenario(name, setup, frames) > FRAME_BUDGET_MS:
+            over.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dashboard.db")
+        fill_stats_db(path, min(STATS_ROWS, 1_000_000))
+        saved_path = Db.DB_PATH
+        Db.close_all()
+        Db.DB_PATH = path
+        try:
+            Db.init_db()
+            import dashboard
+            import leaderboard
+            report("  dashboard stats load (once per visit)", time_frames(
+                lambda: (leaderboard.get_player_stats(1), leaderboard.get_global_stats()), 5))
+            if run_scenario("dashboard stats", scenario_dashboard, frames,
+                            lambda: len(dashboard.particles)) > FRAME_BUDGET_MS:
+                over.append("dashboard stats")
+        finally:
+            Db.close_all()
+            Db.DB_PATH = saved_path
+    if over:
+        print(f"p99 over the frame budget: {', '.join(over)}")
+    return not over
+
+BENCHES = {
+    "background": bench_background,
+    "particles": bench_particles,
+    "text": bench_text,
+    "collision": bench_collision,
+    "physics": bench_physics,
+    "stats": bench_stats,
+    "verify": bench_verify,
+    "chaos": bench_chaos,
+    "render": bench_render,
+    "modes": bench_render_modes,
+    "sprites": bench_sprites,
+    "scenarios": bench_scenarios,
+    "rates": bench_frame_rates,
+    "stuck": bench_stuck,
+}
+
+def main():
+    args = sys.argv[1:]
+    frames = int(args.pop(0)) if args and args[0].isdigit() else 300
+    failed = False
+    for name in args or BENCHES:
+        # Benches with a pass/fail check return False when it fails
+        failed |= BENCHES[name](frames) is False
+    if "pygame" in sys.modules:
+        sys.modules["pygame"].quit()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
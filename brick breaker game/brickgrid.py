@@ -0,0 +1,139 @@
+# Brick storage. A level's bricks sit on a regular grid (see levels.Level),
+# so instead of one object per brick the wall is kept as a few byte arrays
+# with one entry per grid cell: the brick type from the level, the hits it
+# has left (0 for an empty cell) and its color index. A 100x100 board is
+# 30 KB, looking up a brick's color or hit points is an array index, and the
+# grid doubles as the spatial index: the bricks near a ball are the cells its
+# box covers.
+#
+# A brick is named by its cell index (row * cols + col) everywhere.
+#
+# The arrays are bytearrays, indexed one brick at a time by the engine.
+# Whole-board work can wrap them as NumPy arrays without copying, e.g.
+# np.frombuffer(grid.hp, np.uint8).reshape(grid.rows, grid.cols).
+
+class BrickGrid:
+    """The bricks of one level, one byte per grid cell for type, hit points and color.
+
+    Bricks must not be bigger than their grid cells.
+    """
+
+    def __init__(self, level, max_rows=None, filled=True):
+        self.cols = level.cols
+        self.rows = level.rows if max_rows is None else min(level.rows, max_rows)
+        self.left, self.top = level.origin
+        self.cell_width, self.cell_height = level.cell
+        self.brick_width, self.brick_height = level.brick
+        self.types = level.types  # [(color, hp, drop)], kinds hold index + 1
+        size = self.cols * self.rows
+        self.kinds = bytes(level.cells[:size])  # The level layout, 0 for no brick
+        self.hp = bytearray(size)     # Hits left, 0 once destroyed or not placed yet
+        self.color = bytearray(size)  # Color index into the game's brick palette
+        # The per-type values, so a cell's are one table lookup
+        self.type_hp = bytes([0] + [min(255, hp) for _, hp, _ in self.types])
+        self.type_color = bytes([0] + [color % 256 for color, _, _ in self.types])
+        self.row_counts = [0] * self.rows  # Bricks standing per row
+        self.count = 0
+        self.version = 0   # Bumped on every change, so renderers know when to redraw
+        if filled:
+            self.fill_all()
+
+    def fill_all(self):
+        """Place every brick of the layout at full strength"""
+        self.version += 1
+        # bytes.translate maps every cell's type to its value in one pass
+        self.hp[:] = self.kinds.translate(self.type_hp.ljust(256, b"\0"))
+        self.color[:] = self.kinds.translate(self.type_color.ljust(256, b"\0"))
+        cols = self.cols
+        self.row_counts = [cols - self.hp.count(0, row * cols, (row + 1) * cols) for row in range(self.rows)]
+        self.count = sum(self.row_counts)
+
+    def layout_cells(self):
+        """Cells of the layout that hold a brick, row by row"""
+        return [i for i, kind in enumerate(self.kinds) if kind]
+
+    def fill(self, i):
+        """Place the layout's brick in cell i, e.g. during a level refill"""
+        kind = self.kinds[i]
+        if not kind or self.hp[i]:
+            return
+        self.version += 1
+        self.hp[i] = self.type_hp[kind]
+        self.color[i] = self.type_color[kind]
+        self.row_counts[i // self.cols] += 1
+        self.count += 1
+
+    def remove(self, i):
+        if not self.hp[i]:
+            return
+        self.version += 1
+        self.hp[i] = 0
+        self.row_counts[i // self.cols] -= 1
+        self.count -= 1
+
+    def hit(self, i):
+        """Take one hit off brick i, removing it on its last; returns the hits left"""
+        hp = self.hp[i] - 1
+        if hp > 0:
+            self.version += 1
+            self.hp[i] = hp
+        else:
+            self.remove(i)
+        return hp
+
+    def drop(self, i):
+        """The power-up brick i always releases, or None"""
+        return self.types[self.kinds[i] - 1][2]
+
+    def rect(self, i):
+        """(x, y, width, height) of brick i"""
+        row, col = divmod(i, self.cols)
+        return (self.left + col * self.cell_width, self.top + row * self.cell_height,
+                self.brick_width, self.brick_height)
+
+    def center(self, i):
+        row, col = divmod(i, self.cols)
+        return (self.left + col * self.cell_width + self.brick_width / 2,
+                self.top + row * self.cell_height + self.brick_height / 2)
+
+    def query(self, left, top, right, bottom):
+        """Bricks overlapping the box (left, top, right, bottom)"""
+        cell_width, cell_height = self.cell_width, self.cell_height
+        col0 = max(0, int((left - self.left) // cell_width))
+        col1 = min(self.cols - 1, int((right - 1e-9 - self.left) // cell_width))
+        row0 = max(0, int((top - self.top) // cell_height))
+        row1 = min(self.rows - 1, int((bottom - 1e-9 - self.top) // cell_height))
+        if col0 > col1 or row0 > row1:
+            return []
+        hp, cols = self.hp, self.cols
+        found = []
+        for row in range(row0, row1 + 1):
+            y = self.top + row * cell_height
+            if not (top < y + self.brick_height and bottom > y):
+                continue  # Only the gap below the bricks of this row
+            for i in range(row * cols + col0, row * cols + col1 + 1):
+                if hp[i]:
+                    x = self.left + (i - row * cols) * cell_width
+                    if left < x + self.brick_width and right > x:
+                        found.append(i)
+        return found
+
+    def bottom(self):
+        """Lower edge of the lowest row with a brick standing, 0 when there are none"""
+        for row in range(self.rows - 1, -1, -1):
+            if self.row_counts[row]:
+                return self.top + row * self.cell_height + self.brick_height
+        return 0
+
+    def clear(self):
+        self.version += 1
+        self.hp[:] = bytes(len(self.hp))
+        self.row_counts = [0] * self.rows
+        self.count = 0
+
+    def __iter__(self):
+        """Cells holding a brick, row by row"""
+        return (i for i, hp in enumerate(self.hp) if hp)
+
+    def __len__(self):
+        return self.count
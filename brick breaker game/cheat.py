@@ -1,6 +1,8 @@
 import pygame
-import random
-import math
+import engine
+import fonts
+import levels
+from brickgrid import BrickGrid
 
 # Cheat mode flags and variables
 CHEAT_ENABLED = False
@@ -9,9 +11,19 @@ CHEAT_KEYS = {
     'CLEAR_BRICKS': pygame.K_c,    # Press 'C' to clear all bricks
     'GOD_MODE': pygame.K_g,        # Press 'G' for infinite lives
     'LEVEL_UP': pygame.K_l,        # Press 'L' to force level up
+    'CHAOS': pygame.K_x,           # Press 'X' for chaos mode (hundreds of balls)
     'TOGGLE_CHEAT': pygame.K_F12   # Press F12 to toggle cheat mode
 }
 
+# Extra balls live in the engine's batched ball store, so hundreds of them
+# are fine; the cap only guards against holding a key down forever
+MAX_CHEAT_BALLS = 2000
+CHAOS_BALLS = 500
+
+def ball_speed(game_state):
+    """Launch speed of new balls on the current level"""
+    return engine.BALL_SPEED + (game_state.level - 1) * engine.LEVEL_SPEED_STEP
+
 # Notification variables
 notification_text = ""
 notification_start_time = 0
@@ -39,7 +51,7 @@ def handle_cheat_keys(event, game_state):
     
     Parameters:
     - event: pygame event
-    - game_state: dict containing game state variables
+    - game_state: engine.GameState of the running game
     
     Returns:
     - Modified game_state
@@ -57,109 +69,92 @@ def handle_cheat_keys(event, game_state):
     # Proceed only if cheat mode is enabled
     # Multiply balls
     if event.key == CHEAT_KEYS['MULTIPLY_BALLS']:
-        for _ in range(5):  # Add 5 more balls
-            if len(game_state['balls']) < 20:  # Limit to 20 balls to prevent performance issues
-                new_ball = pygame.Rect(
-                    game_state['paddle'].centerx, 
-                    game_state['paddle'].top - 20, 
-                    game_state['BALL_RADIUS']*2, 
-                    game_state['BALL_RADIUS']*2
-                )
-                
-                # Generate random velocity
-                angle = random.uniform(0.5, 2.5)  # Random angle in radians
-                speed = game_state['base_speed']
-                dx = speed * math.cos(angle)
-                dy = -speed * math.sin(angle)  # Negative because y increases downward in pygame
-                
-                game_state['balls'].append(new_ball)
-                game_state['ball_velocities'].append((dx, dy))
+        # Extra balls go into the engine's batched ball store
+        count = min(5, MAX_CHEAT_BALLS - len(game_state.swarm))  # Add 5 more balls
+        engine.add_swarm_balls(game_state, count, ball_speed(game_state))
+        
+        notification_text = f"ADDED BALLS! Total: {len(game_state.balls) + len(game_state.swarm)}"
+        notification_start_time = pygame.time.get_ticks()
+        print(f"Cheat: Added balls. Total: {len(game_state.balls) + len(game_state.swarm)}")
+    
+    # Chaos mode, hundreds of balls at once
+    elif event.key == CHEAT_KEYS['CHAOS']:
+        count = max(0, min(CHAOS_BALLS, MAX_CHEAT_BALLS - len(game_state.swarm)))
+        engine.add_swarm_balls(game_state, count, ball_speed(game_state))
         
-        notification_text = f"ADDED BALLS! Total: {len(game_state['balls'])}"
+        notification_text = f"CHAOS! {len(game_state.swarm)} extra balls"
         notification_start_time = pygame.time.get_ticks()
-        print(f"Cheat: Added balls. Total: {len(game_state['balls'])}")
+        print(f"Cheat: Chaos mode. {len(game_state.swarm)} extra balls")
     
     # Clear all bricks
     elif event.key == CHEAT_KEYS['CLEAR_BRICKS']:
         # Leave just one brick to break
-        if len(game_state['bricks']) > 1:
-            game_state['bricks'] = [game_state['bricks'][0]]
+        if len(game_state.bricks) > 1:
+            for brick in list(game_state.bricks)[1:]:
+                game_state.bricks.remove(brick)
             notification_text = "CLEARED BRICKS! Only one remains."
             notification_start_time = pygame.time.get_ticks()
         print("Cheat: Cleared bricks. Only one remains.")
     
-    # God mode (infinite lives)
+    # God mode (balls bounce off the bottom instead of being lost)
     elif event.key == CHEAT_KEYS['GOD_MODE']:
-        game_state['lives'] = 999
-        notification_text = "GOD MODE ENABLED! Lives set to 999."
+        game_state.god_mode = True
+        notification_text = "GOD MODE ENABLED! Balls can't be lost."
         notification_start_time = pygame.time.get_ticks()
-        print("Cheat: God mode enabled. Lives set to 999.")
+        print("Cheat: God mode enabled.")
     
     # Force level up
-    elif event.key == CHEAT_KEYS['LEVEL_UP']:
+    elif event.key == CHEAT_KEYS['LEVEL_UP'] and not game_state.level_cleared:
         # Set up for level transition
-        game_state['bricks'] = []  # Clear all bricks
-        game_state['level_cleared'] = True
-        game_state['level'] += 1
-        game_state['level_transition_message_time'] = pygame.time.get_ticks() + 2000
-        game_state['last_refill_time'] = pygame.time.get_ticks()
-        
-        # Set up new bricks for the next level
-        rows = min(10, 3 + game_state['level'])
-        cols = 10
+        game_state.bricks.clear()  # Clear all bricks
+        engine.start_level_transition(game_state)
         
-        brick_width = (game_state['WIDTH'] - 100) // cols
-        brick_height = 20
-        
-        # Generate new bricks with staggered appearance
-        new_bricks = []
-        for row in range(rows):
-            for col in range(cols):
-                brick = pygame.Rect(
-                    50 + col * brick_width,
-                    50 + row * (brick_height + 5),
-                    brick_width - 5,
-                    brick_height
-                )
-                new_bricks.append(brick)
+        # Set up new bricks for the next level: the first rows of the cheat level
+        rows = min(10, 3 + game_state.level)
+        game_state.bricks = BrickGrid(levels.load_level("cheat"), rows, filled=False)
+        new_bricks = game_state.bricks.layout_cells()
         
         # Randomize the order for a more interesting refill animation
-        random.shuffle(new_bricks)
-        game_state['new_bricks'] = new_bricks
+        game_state.rng.shuffle(new_bricks)
+        game_state.new_bricks = new_bricks
         
-        notification_text = f"LEVEL UP! Now at level {game_state['level']}"
+        notification_text = f"LEVEL UP! Now at level {game_state.level}"
         notification_start_time = pygame.time.get_ticks()
-        print(f"Cheat: Level up to level {game_state['level']}")
+        print(f"Cheat: Level up to level {game_state.level}")
     
     return game_state
 
 def draw_cheat_status(screen, font):
-    """Draw cheat mode status indicator and notifications"""
+    """Draw cheat mode status indicator and notifications, returning the regions drawn"""
     global notification_text, notification_start_time
     
     current_time = pygame.time.get_ticks()
+    rects = []
     
     if CHEAT_ENABLED:
         # Draw a small indicator that cheat mode is active
         pygame.draw.rect(screen, (255, 0, 0), (screen.get_width() - 20, 10, 10, 10))
         
         # Draw cheat commands
-        text = font.render("CHEAT MODE", True, (255, 100, 100))
+        text = fonts.render("CHEAT MODE", font, (255, 100, 100))
         screen.blit(text, (screen.get_width() - 120, 10))
         
         # Display available commands (small text)
-        small_font = pygame.font.SysFont(None, 18)
+        small_font = fonts.get_font(None, 18)
         commands = [
             "M: Multiply Balls",
             "C: Clear Bricks",
             "G: God Mode",
             "L: Level Up",
+            "X: Chaos Mode",
             "F12: Toggle Cheat"
         ]
         
         for i, cmd in enumerate(commands):
-            cmd_text = small_font.render(cmd, True, (200, 200, 200))
-            screen.blit(cmd_text, (screen.get_width() - 120, 30 + i * 15))
+            cmd_text = fonts.render(cmd, small_font, (200, 200, 200))
+            rects.append(screen.blit(cmd_text, (screen.get_width() - 120, 30 + i * 15)))
+        rects.append(pygame.Rect(screen.get_width() - 120, 10, 110, 10))
+        rects.append(pygame.Rect(screen.get_width() - 120, 10, text.get_width(), text.get_height()))
     
     # Display notification if it's active
     if notification_text and current_time - notification_start_time < notification_duration:
@@ -172,8 +167,8 @@ def draw_cheat_status(screen, font):
             alpha = max(0, min(255, alpha))  # Clamp between 0 and 255
         
         # Create semi-transparent notification box
-        notification_font = pygame.font.SysFont(None, 36)
-        notification_surface = notification_font.render(notification_text, True, (255, 255, 0))
+        notification_font = fonts.get_font(None, 36)
+        notification_surface = fonts.render(notification_text, notification_font, (255, 255, 0)).copy()
         text_width, text_height = notification_surface.get_size()
         
         # Position in center top of screen
@@ -193,3 +188,6 @@ def draw_cheat_status(screen, font):
         # Apply alpha to text
         notification_surface.set_alpha(int(alpha))
         screen.blit(notification_surface, (x, y))
+        rects.append(box_rect)
+    
+    return rects
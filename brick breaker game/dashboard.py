@@ -2,11 +2,13 @@ import pygame
 import game
 import sys
 import math
-import sqlite3
 from datetime import datetime
-from leaderboard import get_player_stats, get_global_stats
+from Db import get_connection
+from leaderboard import get_player_stats, get_global_stats, get_top_scores, pending_scores
 import random
 import auth
+import background
+import fonts
 
 # Colors
 WHITE = (255, 255, 255)
@@ -34,18 +36,11 @@ GAME_HISTORY = 4
 PROFILE = 5
 USERNAME_EDIT = 6
 
-# Initialize fonts
-try:
-    font_small = pygame.font.Font("freesansbold.ttf", 24)
-    font_medium = pygame.font.Font("freesansbold.ttf", 36)
-    font_large = pygame.font.Font("freesansbold.ttf", 48)
-    font_title = pygame.font.Font("freesansbold.ttf", 64)
-except:
-    # Fallback to default font if custom font not found
-    font_small = pygame.font.Font(None, 28)
-    font_medium = pygame.font.Font(None, 42)
-    font_large = pygame.font.Font(None, 56)
-    font_title = pygame.font.Font(None, 72)
+# Initialize fonts (the shared registry falls back to the default font)
+font_small = fonts.get_font("freesansbold.ttf", 24)
+font_medium = fonts.get_font("freesansbold.ttf", 36)
+font_large = fonts.get_font("freesansbold.ttf", 48)
+font_title = fonts.get_font("freesansbold.ttf", 64)
 
 # Animation variables
 menu_animation = 0
@@ -56,21 +51,20 @@ def get_username(user_id):
     if not user_id:
         return None
     
-    conn = sqlite3.connect('game.db')
+    conn = get_connection()
     c = conn.cursor()
     c.execute("SELECT username FROM users WHERE id=?", (user_id,))
     result = c.fetchone()
-    conn.close()
     
     return result[0] if result else None
 
 def draw_text(screen, text, font, color, x, y, shadow=False):
     if shadow:
-        shadow_surface = font.render(text, True, (30, 30, 30))
+        shadow_surface = fonts.render(text, font, (30, 30, 30))
         shadow_rect = shadow_surface.get_rect(center=(x+2, y+2))
         screen.blit(shadow_surface, shadow_rect)
     
-    text_surface = font.render(text, True, color)
+    text_surface = fonts.render(text, font, color)
     text_rect = text_surface.get_rect(center=(x, y))
     screen.blit(text_surface, text_rect)
 
@@ -134,15 +128,8 @@ def draw_button(screen, text, rect, color, hover_color=None, text_color=WHITE, s
     return rect
 
 def draw_gradient_background(screen):
-    # Create a more vibrant gradient background
-    for y in range(HEIGHT):
-        # Calculate colors for a more dynamic gradient
-        progress = y / HEIGHT
-        r = int(20 * (1 - progress))
-        g = int(30 * (1 - progress))
-        b = int(80 + 50 * (1 - progress))
-        color = (r, g, b)
-        pygame.draw.line(screen, color, (0, y), (WIDTH, y))
+    # Gradient is baked once into a cached surface
+    background.draw_gradient(screen, "dashboard")
     
     # Add animated stars/particles with varying sizes and brightness
     global menu_animation, particles
@@ -158,6 +145,7 @@ def draw_gradient_background(screen):
     particles = updated_particles
     
     # Add background stars
+    stars = []
     for i in range(100):
         x = (i * 37 + menu_animation // 3) % WIDTH
         y = (i * 23 + menu_animation // 2) % HEIGHT
@@ -168,17 +156,11 @@ def draw_gradient_background(screen):
         
         # Twinkle effect
         brightness = 100 + (math.sin(menu_animation / 30 + i * 0.3) + 1) * 77
-        pygame.draw.circle(screen, (brightness, brightness, brightness), (x, y), size)
+        stars.append((x, y, size, brightness))
+    background.draw_stars(screen, stars)
 
 def get_leaderboard():
-    conn = sqlite3.connect('game.db')
-    c = conn.cursor()
-    c.execute('''SELECT users.username, users.score
-                 FROM users
-                 ORDER BY users.score DESC LIMIT 10''')
-    leaderboard = c.fetchall()
-    conn.close()
-    return leaderboard
+    return get_top_scores(10)
 
 def draw_card(screen, title, content, rect, color=DARK_BLUE, title_color=WHITE, content_color=WHITE):
     """Draw a card with a title and content"""
@@ -245,14 +227,20 @@ def show_dashboard(screen, user_id):
     username = get_username(user_id) if user_id else None
     
     # Load user stats if logged in
+    def load_stats():
+        try:
+            return get_player_stats(user_id), get_global_stats()
+        except:
+            return None, None  # Handle case where stats aren't available
+    
     user_stats = None
     global_stats = None
+    stats_stale = False
     if user_id:
-        try:
-            user_stats = get_player_stats(user_id)
-            global_stats = get_global_stats()
-        except:
-            pass  # Handle case where stats aren't available
+        # The score of the game that just ended may still be verifying; the
+        # stats are shown now and loaded again once it has been saved
+        stats_stale = pending_scores() > 0
+        user_stats, global_stats = load_stats()
     
     # Initialize variables needed for new functionality
     active_input = False
@@ -275,6 +263,10 @@ def show_dashboard(screen, user_id):
         # Update animation
         menu_animation = (menu_animation + 1) % 10000
         
+        if stats_stale and pending_scores() == 0:
+            stats_stale = False
+            user_stats, global_stats = load_stats()
+        
         # Clear screen
         screen.fill(BLACK)
         
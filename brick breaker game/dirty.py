@@ -0,0 +1,62 @@
+import pygame
+
+# Dirty-rectangle rendering. The parts of a frame that rarely change (the
+# background gradient and the bricks) are baked into a static layer, which is
+# only re-rendered when its key changes, e.g. a brick was destroyed or
+# refilled. Each frame only the regions the moving parts covered last frame
+# are restored from that layer, and only those regions plus this frame's are
+# sent to the display with display.update(rects) instead of flip().
+
+# Past this many rectangles a plain full-screen update is cheaper
+MAX_DIRTY_RECTS = 256
+
+class DirtyRenderer:
+    """Static layer plus the screen regions to restore and update each frame"""
+
+    def __init__(self, screen, draw_static):
+        self.screen = screen
+        self.draw_static = draw_static  # draw_static(surface) paints the static layer
+        self.static = None
+        self.static_key = None
+        self.previous = []   # Regions drawn over last frame
+        self.full = True     # Next frame must restore and update the whole screen
+        self.stats = {"frames": 0, "full_frames": 0, "rebuilds": 0, "rects": 0}
+
+    def invalidate(self):
+        """Redraw and update the whole screen on the next frame"""
+        self.full = True
+
+    def begin(self, key, full=False):
+        """Start a frame: rebuild the static layer if key changed, then clear the old regions"""
+        if self.static is None or key != self.static_key:
+            if self.static is None or self.static.get_size() != self.screen.get_size():
+                self.static = pygame.Surface(self.screen.get_size()).convert()
+            self.draw_static(self.static)
+            self.static_key = key
+            self.stats["rebuilds"] += 1
+            # Only the bricks changed, so restoring and updating the whole
+            # screen once is simplest
+            full = True
+        self.full = self.full or full or len(self.previous) > MAX_DIRTY_RECTS
+
+        if self.full:
+            self.screen.blit(self.static, (0, 0))
+        else:
+            blit = self.screen.blit
+            static = self.static
+            for rect in self.previous:
+                blit(static, rect, rect)
+
+    def end(self, rects):
+        """Send this frame's changed regions (and last frame's) to the display"""
+        screen_rect = self.screen.get_rect()
+        rects = [screen_rect.clip(rect) for rect in rects]
+        self.stats["frames"] += 1
+        if self.full or len(rects) + len(self.previous) > MAX_DIRTY_RECTS:
+            pygame.display.flip()
+            self.stats["full_frames"] += 1
+        else:
+            pygame.display.update(self.previous + rects)
+            self.stats["rects"] += len(self.previous) + len(rects)
+        self.previous = rects
+        self.full = False
@@ -0,0 +1,631 @@
+import math
+import random
+import levels
+import levelgen
+from events import trigger_special_event
+from brickgrid import BrickGrid
+from powerups import PowerUps, register_effect, CAPSULE_WIDTH, CAPSULE_HEIGHT, CAPSULE_SPEED
+from balls import BallStore
+
+# Headless game rules for Brick Breaker. Nothing in here touches pygame, so a
+# GameState can be stepped by the interactive game, bots, tests or a server
+# as fast as the CPU allows. game.py only renders the state on top.
+
+# Playfield dimensions
+WIDTH, HEIGHT = 800, 600
+
+# Game objects
+PADDLE_WIDTH, PADDLE_HEIGHT = 100, 15
+BIG_PADDLE_WIDTH = 150
+BALL_RADIUS = 8
+BRICK_WIDTH, BRICK_HEIGHT = 70, 25
+BRICK_ROWS, BRICK_COLS = 5, 10
+
+# Simulation steps per second. The game runs the engine at this fixed rate
+# whatever the display's refresh rate, and replays are recorded at it
+STEP_RATE = 120
+
+# Speeds in pixels per second (the old per-frame values at 60 FPS)
+BALL_SPEED = 300
+LEVEL_SPEED_STEP = 30
+MULTI_BALL_SPEED = 360
+PADDLE_SPEED = 600
+
+# Points per second of simulation time while score boost runs (the old 5 per
+# frame at 60 FPS)
+SCORE_BOOST_RATE = 300
+
+# Timings in seconds of simulation time. Every timer in the rules runs on
+# state.time, never on frames or the wall clock, so a game scores the same at
+# any display refresh rate and when fast-forwarded headlessly
+REFILL_DELAY = 0.1
+# A level refill animation takes at most this many REFILL_DELAY ticks; big
+# boards refill several bricks per tick
+MAX_REFILL_TICKS = 50
+LEVEL_MESSAGE_TIME = 3.0
+PADDLE_COOLDOWN = 5 / 60
+BRICK_COOLDOWN = 3 / 60
+
+# Continuous collision: a ball never travels further than this in one sub-step,
+# and resolves at most MAX_BOUNCES impacts per sub-step
+MAX_SUBSTEP_DISTANCE = 4 * BALL_RADIUS
+MAX_BOUNCES = 8
+
+# Chaos mode swarm: dead slots are reclaimed once this many have piled up
+SWARM_COMPACT_THRESHOLD = 64
+
+# Paddle input bits
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+
+class Ball:
+    """A ball, positioned by its center, with velocity in pixels per second"""
+    __slots__ = ("x", "y", "dx", "dy")
+
+    def __init__(self, x, y, dx, dy):
+        self.x = x
+        self.y = y
+        self.dx = dx
+        self.dy = dy
+
+def create_bricks(level=1):
+    """The full brick wall of a level number from its level file"""
+    return BrickGrid(levels.level_for(level))
+
+def level_layout(seed, number):
+    """The levels.Level played as level number in the game with seed: the level files, then generated levels"""
+    if number <= len(levels.LEVEL_SEQUENCE):
+        return levels.level_for(number)
+    return levelgen.generate_level(seed, number)
+
+def new_seed():
+    """A fresh random session seed"""
+    return random.SystemRandom().randrange(2**32)
+
+class GameState:
+    """Everything needed to advance one game, without any rendering state.
+
+    All randomness in the rules comes from self.rng, seeded from the session
+    seed, so the same seed and inputs always replay the same game.
+    """
+
+    def __init__(self, seed=None):
+        self.seed = new_seed() if seed is None else seed
+        self.rng = random.Random(self.seed)
+
+        self.time = 0.0
+        self.score = 0
+        self.level = 1
+        self.game_over = False
+
+        # Paddle
+        self.paddle_x = WIDTH // 2 - PADDLE_WIDTH // 2
+        self.paddle_y = HEIGHT - 40
+        self.paddle_width = PADDLE_WIDTH
+
+        # Main ball and multiple balls support
+        self.balls = [Ball(WIDTH // 2 + BALL_RADIUS, HEIGHT // 2 + BALL_RADIUS, BALL_SPEED, -BALL_SPEED)]
+        self.bricks = create_bricks()
+
+        # Chaos mode: hundreds of extra balls moved in batches, see move_swarm()
+        self.swarm = BallStore(BALL_RADIUS)
+        self.god_mode = False  # The bottom edge bounces balls instead of losing them
+
+        # Falling capsules and running power-up effects
+        self.powerups = PowerUps()
+        self.score_boost_carry = 0.0  # Score boost points earned but not whole yet
+        self.collision_cooldown = 0.0
+
+        # Level transition
+        self.level_cleared = False
+        self.new_bricks = []  # Cells of state.bricks still to refill, from the end
+        self.refill_batch = 0
+        self.last_refill_time = 0.0
+        # level_source(seed, number) -> levels.Level; the game swaps in a
+        # levelgen.LevelPrefetcher
+        self.level_source = level_layout
+        self.level_message_until = 0.0
+
+        # Things that happened during the last step, for the renderer (particles, sounds)
+        self.events = []
+
+        # Swept time-of-impact collisions; False restores the old overlap test
+        # with its collision cooldown
+        self.continuous = True
+
+def apply_bounce_randomness(dx, dy, randomness=0.2, rng=random):
+    # Add a small random variation to the angle while preserving speed
+    speed = math.sqrt(dx**2 + dy**2)
+    angle = math.atan2(dy, dx)
+
+    # Add random angle variation (within limits)
+    angle_variation = rng.uniform(-randomness, randomness)
+    new_angle = angle + angle_variation
+
+    # Convert back to velocity components
+    new_dx = math.cos(new_angle) * speed
+    new_dy = math.sin(new_angle) * speed
+
+    return new_dx, new_dy
+
+def spawn_multi_balls(state, ball, count=2):
+    """Spawn additional balls for the multi-ball power-up"""
+    for i in range(count):
+        # Give the new ball a different velocity direction
+        angle = math.pi/4 + i * math.pi/2  # Spread the balls at different angles
+        dx = math.cos(angle) * MULTI_BALL_SPEED
+        dy = -math.sin(angle) * MULTI_BALL_SPEED  # Negative to go up
+        state.balls.append(Ball(ball.x, ball.y, dx, dy))
+        state.events.append(("multi_ball", ball.x, ball.y))
+
+# Power-up effects, see powerups.py
+
+def start_big_paddle(state):
+    state.paddle_width = BIG_PADDLE_WIDTH
+
+def end_big_paddle(state):
+    state.paddle_width = PADDLE_WIDTH
+
+def start_multi_ball(state):
+    # Every capsule caught spawns more balls; they stay when the effect ends
+    if state.balls:
+        spawn_multi_balls(state, state.balls[0])
+
+def tick_score_boost(state, dt):
+    # Points accrue with simulation time, the fraction carried to the next step
+    state.score_boost_carry += SCORE_BOOST_RATE * dt
+    points = int(state.score_boost_carry + 1e-9)
+    state.score_boost_carry -= points
+    state.score += points
+
+register_effect("big_paddle", start=start_big_paddle, end=end_big_paddle)
+register_effect("multi_ball", start=start_multi_ball)
+register_effect("score_boost", tick=tick_score_boost)
+
+def move_paddle(state, inputs, dt):
+    if inputs & INPUT_LEFT:
+        state.paddle_x -= PADDLE_SPEED * dt
+    if inputs & INPUT_RIGHT:
+        state.paddle_x += PADDLE_SPEED * dt
+    state.paddle_x = min(max(state.paddle_x, 0), WIDTH - state.paddle_width)
+
+def collide_paddle(state, ball):
+    paddle_left = state.paddle_x
+    paddle_top = state.paddle_y
+    paddle_bottom = state.paddle_y + PADDLE_HEIGHT
+
+    # Ensure the ball is above the paddle to prevent getting stuck inside
+    if ball.y < paddle_top:
+        ball.y = paddle_top - 1 - BALL_RADIUS  # Position ball just above paddle
+
+        # Angle the bounce based on where it hit the paddle
+        hit_pos = (ball.x - paddle_left) / state.paddle_width
+        angle = math.pi * (0.25 + 0.5 * hit_pos)  # Between pi/4 and 3pi/4
+        speed = math.sqrt(ball.dx**2 + ball.dy**2)
+        ball.dx, ball.dy = math.cos(angle) * speed, -math.sin(angle) * speed
+        state.events.append(("paddle", ball.x, ball.y))
+    # If ball hits from below (rare case), just send it downward
+    elif ball.y > paddle_bottom:
+        ball.y = paddle_bottom + 1 + BALL_RADIUS
+        ball.dy = abs(ball.dy)
+    # Side collision
+    else:
+        ball.dx = -ball.dx
+    state.collision_cooldown = PADDLE_COOLDOWN
+
+def collide_brick(state, ball, hit_brick):
+    # Determine collision direction and respond accordingly
+    left, right = ball.x - BALL_RADIUS, ball.x + BALL_RADIUS
+    top, bottom = ball.y - BALL_RADIUS, ball.y + BALL_RADIUS
+    brick_x, brick_y, brick_width, brick_height = state.bricks.rect(hit_brick)
+    brick_bottom = brick_y + brick_height
+    brick_right = brick_x + brick_width
+    if abs(bottom - brick_y) < 10 or abs(top - brick_bottom) < 10:
+        ball.dx, ball.dy = apply_bounce_randomness(ball.dx, -ball.dy, rng=state.rng)
+    elif abs(right - brick_x) < 10 or abs(left - brick_right) < 10:
+        ball.dx, ball.dy = apply_bounce_randomness(-ball.dx, ball.dy, rng=state.rng)
+    else:
+        # Corner collision or other cases, default to vertical bounce
+        ball.dx, ball.dy = apply_bounce_randomness(ball.dx, -ball.dy, rng=state.rng)
+
+    break_brick(state, hit_brick)
+    state.collision_cooldown = BRICK_COOLDOWN
+
+def break_brick(state, hit_brick):
+    """Hit the brick in cell hit_brick of state.bricks"""
+    bricks = state.bricks
+    x, y = bricks.center(hit_brick)
+    color = bricks.color[hit_brick]
+    # Multi-hit bricks only crack until their last hit
+    if bricks.hit(hit_brick) > 0:
+        state.events.append(("brick_hit", x, y, color))
+        return
+
+    state.events.append(("brick", x, y, color))
+    state.score += 10
+
+    # Drop bricks always release their power-up, others sometimes do
+    kind = bricks.drop(hit_brick) or trigger_special_event(state.rng)
+    if kind:
+        state.powerups.release(x, y, kind)
+        state.events.append(("capsule", x, y, kind))
+
+def nearest_brick(bricks, hits, x, y):
+    """The brick of hits whose center is closest to (x, y)"""
+    def distance(i):
+        center_x, center_y = bricks.center(i)
+        return (center_x - x)**2 + (center_y - y)**2
+    return min(hits, key=distance)
+
+def find_brick_hit(state, ball):
+    """The brick overlapping the ball closest to its center, or None"""
+    hits = state.bricks.query(ball.x - BALL_RADIUS, ball.y - BALL_RADIUS, ball.x + BALL_RADIUS, ball.y + BALL_RADIUS)
+    if not hits:
+        return None
+    return nearest_brick(state.bricks, hits, ball.x, ball.y)
+
+def move_balls(state, dt):
+    if state.continuous:
+        state.balls = [ball for ball in state.balls if sweep_ball(state, ball, dt)]
+        return
+
+    paddle_right = state.paddle_x + state.paddle_width
+    paddle_bottom = state.paddle_y + PADDLE_HEIGHT
+    surviving = []
+    for ball in state.balls:
+        ball.x += ball.dx * dt
+        ball.y += ball.dy * dt
+
+        # Collision with walls, always sending the ball back into the field
+        if ball.x - BALL_RADIUS <= 0 or ball.x + BALL_RADIUS >= WIDTH:
+            left_wall = ball.x - BALL_RADIUS <= 0
+            ball.x = min(max(ball.x, BALL_RADIUS), WIDTH - BALL_RADIUS)
+            dx, ball.dy = apply_bounce_randomness(-ball.dx, ball.dy, rng=state.rng)
+            ball.dx = abs(dx) if left_wall else -abs(dx)
+            state.events.append(("wall", ball.x, ball.y))
+
+        if ball.y - BALL_RADIUS <= 0:
+            ball.y = BALL_RADIUS
+            ball.dx, dy = apply_bounce_randomness(ball.dx, -ball.dy, rng=state.rng)
+            ball.dy = abs(dy)
+            state.events.append(("wall", ball.x, ball.y))
+
+        if ball.y + BALL_RADIUS >= HEIGHT and state.god_mode:
+            ball.y = HEIGHT - BALL_RADIUS
+            ball.dx, dy = apply_bounce_randomness(ball.dx, -ball.dy, rng=state.rng)
+            ball.dy = -abs(dy)
+            state.events.append(("wall", ball.x, ball.y))
+        elif ball.y + BALL_RADIUS >= HEIGHT:
+            # Ball missed the paddle - remove this ball
+            state.events.append(("ball_lost", ball.x, ball.y))
+            continue
+        surviving.append(ball)
+
+        # Collision with paddle
+        if (state.collision_cooldown <= 0
+                and ball.x - BALL_RADIUS < paddle_right and ball.x + BALL_RADIUS > state.paddle_x
+                and ball.y - BALL_RADIUS < paddle_bottom and ball.y + BALL_RADIUS > state.paddle_y):
+            collide_paddle(state, ball)
+
+        # Collision with bricks
+        if state.collision_cooldown <= 0:
+            hit_brick = find_brick_hit(state, ball)
+            if hit_brick is not None:
+                collide_brick(state, ball, hit_brick)
+    state.balls = surviving
+
+def time_of_impact(x, y, dx, dy, left, top, right, bottom, t_max):
+    """When a point moving by (dx, dy) per second enters a box within t_max.
+
+    Returns (t, axis) with axis "x" or "y" for the face that was crossed, or
+    None. A point already inside the box hits at t=0 on the axis with the
+    smallest penetration.
+    """
+    if dx != 0:
+        tx1 = (left - x) / dx
+        tx2 = (right - x) / dx
+        tx_near, tx_far = min(tx1, tx2), max(tx1, tx2)
+    elif left < x < right:
+        tx_near, tx_far = -math.inf, math.inf
+    else:
+        return None
+    if dy != 0:
+        ty1 = (top - y) / dy
+        ty2 = (bottom - y) / dy
+        ty_near, ty_far = min(ty1, ty2), max(ty1, ty2)
+    elif top < y < bottom:
+        ty_near, ty_far = -math.inf, math.inf
+    else:
+        return None
+
+    t_near = max(tx_near, ty_near)
+    t_far = min(tx_far, ty_far)
+    if t_near > t_far or t_far <= 1e-9 or t_near > t_max:
+        return None
+    if t_near < 0:
+        # Already overlapping, push out along the shallowest axis
+        penetration_x = min(x - left, right - x)
+        penetration_y = min(y - top, bottom - y)
+        return 0.0, "x" if penetration_x < penetration_y else "y"
+    return t_near, "x" if tx_near > ty_near else "y"
+
+def reflect(dx, dy, axis, rng=None):
+    """Bounce a velocity off a face on the given axis, always away from it.
+
+    With an rng the new angle gets the usual small random variation.
+    """
+    new_dx, new_dy = apply_bounce_randomness(dx, dy, rng=rng) if rng is not None else (dx, dy)
+    if axis == "x":
+        return (-abs(new_dx) if dx > 0 else abs(new_dx)), new_dy
+    return new_dx, (-abs(new_dy) if dy > 0 else abs(new_dy))
+
+def earliest_impact(state, ball, t_max):
+    """The first thing the ball hits within t_max seconds, as (t, kind, target, axis)"""
+    r = BALL_RADIUS
+    x, y, dx, dy = ball.x, ball.y, ball.dx, ball.dy
+    best = None
+
+    # Walls and the bottom edge
+    if dx < 0:
+        best = ((r - x) / dx, "wall", None, "x")
+    elif dx > 0:
+        best = ((WIDTH - r - x) / dx, "wall", None, "x")
+    if dy < 0:
+        t = (r - y) / dy
+        if best is None or t < best[0]:
+            best = (t, "wall", None, "y")
+    elif dy > 0:
+        t = (HEIGHT - r - y) / dy
+        if best is None or t < best[0]:
+            best = (t, "wall" if state.god_mode else "lost", None, "y")
+    if best is not None and best[0] > t_max:
+        best = None
+    if best is not None and best[0] < 0:
+        best = (0.0,) + best[1:]
+
+    # Paddle, as a box grown by the ball radius
+    hit = time_of_impact(x, y, dx, dy,
+                         state.paddle_x - r, state.paddle_y - r,
+                         state.paddle_x + state.paddle_width + r, state.paddle_y + PADDLE_HEIGHT + r, t_max)
+    if hit is not None and (best is None or hit[0] < best[0]):
+        best = (hit[0], "paddle", None, hit[1])
+
+    # Bricks near the swept path
+    end_x, end_y = x + dx * t_max, y + dy * t_max
+    bricks = state.bricks
+    for brick in bricks.query(min(x, end_x) - r, min(y, end_y) - r, max(x, end_x) + r, max(y, end_y) + r):
+        left, top, width, height = bricks.rect(brick)
+        hit = time_of_impact(x, y, dx, dy, left - r, top - r, left + width + r, top + height + r, t_max)
+        if hit is not None and (best is None or hit[0] < best[0]):
+            best = (hit[0], "brick", brick, hit[1])
+    return best
+
+def paddle_face(state, ball, axis, overlapping):
+    """The paddle face a ball bounces off: "top", "bottom", "left" or "right".
+
+    A ball already inside the radius-grown paddle box, e.g. because the
+    paddle moved into it, is pushed out through that face. It leaves through
+    a side only if there is room for it before the wall, otherwise through
+    the top or bottom, whichever the ball center is nearer to. Choosing by
+    penetration alone could send it back in from the other face every time.
+    """
+    r = BALL_RADIUS
+    left, right = state.paddle_x, state.paddle_x + state.paddle_width
+    top, bottom = state.paddle_y, state.paddle_y + PADDLE_HEIGHT
+    side = "left" if ball.x < (left + right) / 2 else "right"
+    if not overlapping:
+        if axis == "x":
+            return side
+        return "top" if ball.dy > 0 else "bottom"
+
+    if axis == "x" and (left >= 2 * r if side == "left" else right <= WIDTH - 2 * r):
+        ball.x = left - r if side == "left" else right + r
+        return side
+    if ball.y < (top + bottom) / 2:
+        ball.y = top - r
+        return "top"
+    ball.y = bottom + r
+    return "bottom"
+
+def sweep_ball(state, ball, dt):
+    """Move a ball through dt seconds, resolving every impact at its exact time.
+
+    Returns False if the ball fell out of the bottom of the playfield.
+    """
+    speed = math.sqrt(ball.dx**2 + ball.dy**2)
+    substeps = max(1, math.ceil(speed * dt / MAX_SUBSTEP_DISTANCE))
+    for _ in range(substeps):
+        remaining = dt / substeps
+        for _ in range(MAX_BOUNCES):
+            impact = earliest_impact(state, ball, remaining)
+            if impact is None:
+                ball.x += ball.dx * remaining
+                ball.y += ball.dy * remaining
+                break
+            t, kind, target, axis = impact
+            ball.x += ball.dx * t
+            ball.y += ball.dy * t
+            remaining -= t
+
+            if kind == "lost":
+                # Ball missed the paddle - remove this ball
+                state.events.append(("ball_lost", ball.x, ball.y))
+                return False
+            if kind == "wall":
+                ball.dx, ball.dy = reflect(ball.dx, ball.dy, axis, state.rng)
+                state.events.append(("wall", ball.x, ball.y))
+            elif kind == "paddle":
+                face = paddle_face(state, ball, axis, overlapping=t == 0)
+                if face == "top":
+                    if ball.dy >= 0:
+                        # Angle the bounce based on where it hit the paddle
+                        hit_pos = min(max((ball.x - state.paddle_x) / state.paddle_width, 0), 1)
+                        angle = math.pi * (0.25 + 0.5 * hit_pos)  # Between pi/4 and 3pi/4
+                        ball.dx, ball.dy = math.cos(angle) * speed, -math.sin(angle) * speed
+                        state.events.append(("paddle", ball.x, ball.y))
+                elif face == "bottom":
+                    ball.dy = abs(ball.dy)  # Hit from below, send it downward
+                elif face == "left":
+                    ball.dx = -abs(ball.dx)
+                else:
+                    ball.dx = abs(ball.dx)
+            else:
+                ball.dx, ball.dy = reflect(ball.dx, ball.dy, axis, state.rng)
+                break_brick(state, target)
+    return True
+
+def add_swarm_balls(state, count, speed=BALL_SPEED):
+    """Launch count chaos mode balls upward from the paddle at random angles"""
+    x = state.paddle_x + state.paddle_width / 2
+    y = state.paddle_y - 20
+    for _ in range(count):
+        angle = state.rng.uniform(0.5, 2.5)
+        state.swarm.add(x, y, math.cos(angle) * speed, -math.sin(angle) * speed)
+
+def move_swarm(state, dt):
+    """Move the chaos mode balls.
+
+    Walls, floor and paddle are handled for the whole swarm at once by the
+    ball store; only the few balls up among the bricks are checked one by one.
+    Sub-steps keep every ball within MAX_SUBSTEP_DISTANCE per overlap test.
+    """
+    swarm = state.swarm
+    r = BALL_RADIUS
+    substeps = max(1, math.ceil(swarm.max_speed() * dt / MAX_SUBSTEP_DISTANCE))
+    for _ in range(substeps):
+        swarm.move(dt / substeps)
+
+        bounced, lost = swarm.bounce_walls(WIDTH, HEIGHT, state.rng, floor=state.god_mode)
+        for i in bounced:
+            state.events.append(("wall",) + swarm.get(i)[:2])
+        for i in lost:
+            state.events.append(("ball_lost",) + swarm.get(i)[:2])
+        swarm.kill(lost)
+
+        for i in swarm.bounce_paddle(state.paddle_x, state.paddle_y, state.paddle_width, PADDLE_HEIGHT):
+            state.events.append(("paddle",) + swarm.get(i)[:2])
+
+        # Bricks, only for balls that reach up into the rows of the wall
+        for i in swarm.above(state.bricks.bottom()):
+            x, y, dx, dy = swarm.get(i)
+            hits = state.bricks.query(x - r, y - r, x + r, y + r)
+            if not hits:
+                continue
+            brick = nearest_brick(state.bricks, hits, x, y)
+            # Bounce off the face the ball overlaps least
+            left, top, width, height = state.bricks.rect(brick)
+            overlap_x = min(x + r - left, left + width - (x - r))
+            overlap_y = min(y + r - top, top + height - (y - r))
+            swarm.set_velocity(i, *reflect(dx, dy, "x" if overlap_x < overlap_y else "y", state.rng))
+            break_brick(state, brick)
+
+    if swarm.count - swarm.live >= SWARM_COMPACT_THRESHOLD:
+        swarm.compact()
+
+def move_capsules(state, dt):
+    """Let power-up capsules fall, starting the effect of those the paddle catches"""
+    powerups = state.powerups
+    if not powerups.capsules:
+        return
+    paddle_left, paddle_right = state.paddle_x, state.paddle_x + state.paddle_width
+    paddle_top, paddle_bottom = state.paddle_y, state.paddle_y + PADDLE_HEIGHT
+    falling = []
+    for capsule in powerups.capsules:
+        capsule.y += CAPSULE_SPEED * dt
+        if (capsule.x + CAPSULE_WIDTH / 2 > paddle_left and capsule.x - CAPSULE_WIDTH / 2 < paddle_right
+                and capsule.y + CAPSULE_HEIGHT / 2 > paddle_top and capsule.y - CAPSULE_HEIGHT / 2 < paddle_bottom):
+            powerups.activate(state, capsule.kind)
+            state.events.append(("special", capsule.x, capsule.y, capsule.kind))
+        elif capsule.y - CAPSULE_HEIGHT / 2 < HEIGHT:
+            falling.append(capsule)
+    powerups.capsules = falling
+
+def apply_powerups(state, dt):
+    move_capsules(state, dt)
+    state.powerups.tick(state, dt)
+    state.powerups.expire(state)
+
+def start_level_transition(state):
+    state.level_cleared = True
+    state.level += 1
+    # The new level's grid starts empty and is filled in by the refill
+    state.bricks = BrickGrid(state.level_source(state.seed, state.level), filled=False)
+    state.new_bricks = state.bricks.layout_cells()[::-1]
+    state.refill_batch = 0
+    state.last_refill_time = state.time
+
+    # Freeze ball and paddle at their starting positions during the refill
+    state.balls = [Ball(WIDTH // 2 + BALL_RADIUS, HEIGHT - 100 + BALL_RADIUS, BALL_SPEED, -BALL_SPEED)]
+    state.swarm.clear()
+    state.powerups.capsules = []
+    state.paddle_x = WIDTH // 2 - PADDLE_WIDTH // 2
+
+    # Running power-ups are kept across the transition
+    state.level_message_until = state.time + LEVEL_MESSAGE_TIME
+    state.events.append(("level_cleared",))
+
+def step_level_transition(state):
+    # Power-ups keep running out during the level transition
+    state.powerups.expire(state)
+
+    # Gradually add new bricks with animation
+    if state.new_bricks and state.time - state.last_refill_time > REFILL_DELAY:
+        if not state.refill_batch:
+            state.refill_batch = -(-len(state.new_bricks) // MAX_REFILL_TICKS)
+        for _ in range(min(state.refill_batch, len(state.new_bricks))):
+            brick = state.new_bricks.pop()
+            state.bricks.fill(brick)
+            state.events.append(("refill",) + state.bricks.center(brick))
+        state.last_refill_time = state.time
+
+    # When all bricks are refilled, resume normal gameplay
+    if not state.new_bricks:
+        state.level_cleared = False
+
+        # Keep only one ball, slightly faster for higher levels
+        ball = state.balls[0]
+        base_speed = BALL_SPEED + (state.level - 1) * LEVEL_SPEED_STEP
+        state.balls = [Ball(ball.x, ball.y, base_speed, -base_speed)]
+
+        # Add bonus points for completing a level
+        state.score += state.level * 50
+
+        # Shrink paddle slightly for added difficulty (but not too much)
+        if state.paddle_width > PADDLE_WIDTH * 0.7 and not state.powerups.active:
+            state.paddle_width = max(PADDLE_WIDTH * 0.9, state.paddle_width - 5)
+        elif "big_paddle" in state.powerups:
+            # Ensure the paddle remains big if power-up is active
+            state.paddle_width = BIG_PADDLE_WIDTH
+
+def step(state, inputs, dt):
+    """Advance the game by dt seconds with the given paddle input bits"""
+    state.events = []
+    if state.game_over:
+        return state
+    state.time += dt
+
+    # No paddle or ball movement during the level transition
+    if state.level_cleared:
+        step_level_transition(state)
+        return state
+
+    move_paddle(state, inputs, dt)
+    move_balls(state, dt)
+    if state.swarm:
+        move_swarm(state, dt)
+
+    # Game over if all balls are lost
+    if not state.balls and not state.swarm:
+        state.game_over = True
+        state.events.append(("game_over",))
+        return state
+
+    if state.collision_cooldown > 0:
+        state.collision_cooldown -= dt
+
+    apply_powerups(state, dt)
+
+    # Win condition
+    if not state.bricks:
+        start_level_transition(state)
+    return state
@@ -0,0 +1,242 @@
+import time
+from array import array
+import engine
+
+try:
+    import numpy as np
+except ImportError:  # Observations are plain arrays instead
+    np = None
+
+# Reinforcement learning environments over the headless engine, with the
+# gym/gymnasium interface (reset() -> (obs, info), step(action) ->
+# (obs, reward, terminated, truncated, info)) but without depending on gym.
+# No pygame is involved, so a process can run many of them side by side.
+#
+# Actions: 0 stay, 1 left, 2 right. Each step holds the action for
+# frame_skip engine steps at engine.STEP_RATE.
+#
+# Observation vector (float32, everything scaled to about -1..1):
+#   paddle x, then MAX_BALLS x (x, y, dx, dy, present) lowest ball first,
+#   then the brick bitmap: BITMAP_ROWS x BITMAP_COLS cells over the brick
+#   area, row by row, 1 where a brick's center lies in the cell. The cells
+#   match the slots of the classic level; generated levels come in other
+#   sizes, so this is their coarse outline.
+# With pixels=True the observation is a PIXEL_HEIGHT x PIXEL_WIDTH uint8
+# image instead: bricks 100, balls 200, paddle 255.
+#
+# Reward is the score gained during the step, minus LOSS_PENALTY when the
+# last ball is lost.
+
+ACTIONS = (0, engine.INPUT_LEFT, engine.INPUT_RIGHT)
+MAX_BALLS = 3
+# Velocities are divided by this, the speed of a ball on about level 10
+SPEED_SCALE = 600
+LOSS_PENALTY = 100
+
+PIXEL_SCALE = 10
+PIXEL_WIDTH, PIXEL_HEIGHT = engine.WIDTH // PIXEL_SCALE, engine.HEIGHT // PIXEL_SCALE
+
+# Brick bitmap cells: the whole width, and the brick area from BITMAP_TOP down
+BITMAP_COLS, BITMAP_ROWS = 10, 9
+BITMAP_TOP = 35
+CELL_WIDTH, CELL_HEIGHT = engine.WIDTH / BITMAP_COLS, engine.BRICK_HEIGHT + 5
+
+OBSERVATION_SIZE = 1 + MAX_BALLS * 5 + BITMAP_ROWS * BITMAP_COLS
+
+def brick_bitmap(bricks):
+    """1 for every bitmap cell holding a brick's center, row by row, for a brickgrid.BrickGrid"""
+    if np is not None:
+        # The whole board at once, straight from the grid's hit point bytes
+        rows, cols = np.divmod(np.flatnonzero(np.frombuffer(bricks.hp, dtype=np.uint8)), bricks.cols)
+        x = bricks.left + cols * bricks.cell_width + bricks.brick_width / 2
+        y = bricks.top + rows * bricks.cell_height + bricks.brick_height / 2
+        col = (x // CELL_WIDTH).astype(np.intp)
+        row = ((y - BITMAP_TOP) // CELL_HEIGHT).astype(np.intp)
+        inside = (col >= 0) & (col < BITMAP_COLS) & (row >= 0) & (row < BITMAP_ROWS)
+        bitmap = np.zeros(BITMAP_ROWS * BITMAP_COLS, dtype=np.float32)
+        bitmap[row[inside] * BITMAP_COLS + col[inside]] = 1.0
+        return bitmap
+
+    bitmap = [0.0] * (BITMAP_ROWS * BITMAP_COLS)
+    for brick in bricks:
+        x, y = bricks.center(brick)
+        col = int(x // CELL_WIDTH)
+        row = int((y - BITMAP_TOP) // CELL_HEIGHT)
+        if 0 <= col < BITMAP_COLS and 0 <= row < BITMAP_ROWS:
+            bitmap[row * BITMAP_COLS + col] = 1.0
+    return bitmap
+
+def vector_observation(state):
+    values = [state.paddle_x / engine.WIDTH]
+    balls = sorted(state.balls, key=lambda ball: -ball.y)[:MAX_BALLS]
+    for ball in balls:
+        values += (ball.x / engine.WIDTH, ball.y / engine.HEIGHT,
+                   ball.dx / SPEED_SCALE, ball.dy / SPEED_SCALE, 1.0)
+    values += [0.0] * (5 * (MAX_BALLS - len(balls)))
+    if np is not None:
+        return np.concatenate((np.array(values, dtype=np.float32), brick_bitmap(state.bricks)))
+    return array("f", values + brick_bitmap(state.bricks))
+
+def fill_box(pixels, left, top, right, bottom, value):
+    """Set the pixels of a box given in playfield coordinates"""
+    x0 = max(0, int(left // PIXEL_SCALE))
+    x1 = min(PIXEL_WIDTH, int(right // PIXEL_SCALE) + 1)
+    y0 = max(0, int(top // PIXEL_SCALE))
+    y1 = min(PIXEL_HEIGHT, int(bottom // PIXEL_SCALE) + 1)
+    if x0 >= x1:
+        return
+    row = bytes([value]) * (x1 - x0)
+    for y in range(y0, y1):
+        start = y * PIXEL_WIDTH + x0
+        pixels[start:start + x1 - x0] = row
+
+def brick_pixels(bricks):
+    pixels = bytearray(PIXEL_WIDTH * PIXEL_HEIGHT)
+    for brick in bricks:
+        x, y, width, height = bricks.rect(brick)
+        fill_box(pixels, x, y, x + width - 1, y + height - 1, 100)
+    return bytes(pixels)
+
+def pixel_observation(state, bricks=None):
+    """Low resolution image of a state; bricks is its brick_pixels(), if already known"""
+    pixels = bytearray(bricks or brick_pixels(state.bricks))
+    r = engine.BALL_RADIUS
+    for ball in state.balls:
+        fill_box(pixels, ball.x - r, ball.y - r, ball.x + r - 1, ball.y + r - 1, 200)
+    fill_box(pixels, state.paddle_x, state.paddle_y, state.paddle_x + state.paddle_width - 1,
+             state.paddle_y + engine.PADDLE_HEIGHT - 1, 255)
+    if np is not None:
+        return np.frombuffer(pixels, dtype=np.uint8).reshape(PIXEL_HEIGHT, PIXEL_WIDTH)
+    return pixels
+
+class BrickBreakerEnv:
+    """One game as a gym-style environment"""
+
+    def __init__(self, seed=None, frame_skip=4, max_steps=None, pixels=False):
+        self.frame_skip = frame_skip
+        self.dt = 1 / engine.STEP_RATE
+        # Episodes are cut off after five minutes of game time by default
+        self.max_steps = max_steps or 5 * 60 * engine.STEP_RATE // frame_skip
+        self.pixels = pixels
+        self.observation_shape = (PIXEL_HEIGHT, PIXEL_WIDTH) if pixels else (OBSERVATION_SIZE,)
+        self.action_count = len(ACTIONS)
+        self.next_seed = seed
+        self.state = None
+        self.steps = 0
+        # Bricks rarely change, so their pixels are only redrawn when they do
+        self.brick_pixels = None
+        self.brick_key = None
+
+    def observe(self):
+        state = self.state
+        if not self.pixels:
+            return vector_observation(state)
+        key = (id(state.bricks), state.bricks.version)
+        if key != self.brick_key:
+            self.brick_pixels = brick_pixels(state.bricks)
+            self.brick_key = key
+        return pixel_observation(state, self.brick_pixels)
+
+    def reset(self, seed=None):
+        """Start a new game, returning (observation, info)"""
+        if seed is None:
+            seed = self.next_seed
+        # Consecutive episodes of a seeded env play consecutive seeds
+        self.next_seed = None if seed is None else (seed + 1) % 2**32
+        self.state = engine.GameState(seed)
+        self.steps = 0
+        self.brick_key = None
+        return self.observe(), self.info()
+
+    def info(self):
+        state = self.state
+        return {"seed": state.seed, "score": state.score, "level": state.level, "bricks": len(state.bricks)}
+
+    def step(self, action):
+        """Hold an action for frame_skip engine steps.
+
+        Returns (observation, reward, terminated, truncated, info).
+        """
+        state = self.state
+        inputs = ACTIONS[action]
+        score = state.score
+        step = engine.step
+        for _ in range(self.frame_skip):
+            step(state, inputs, self.dt)
+            if state.game_over:
+                break
+        self.steps += 1
+        reward = state.score - score
+        if state.game_over:
+            reward -= LOSS_PENALTY
+        truncated = not state.game_over and self.steps >= self.max_steps
+        return self.observe(), reward, state.game_over, truncated, self.info()
+
+class VectorEnv:
+    """Many environments in one process, stepped together.
+
+    Finished episodes are reset right away, as in gym's vector envs; the
+    final observation and info of the finished episode go into the info
+    under "final_observation" and "final_info".
+    """
+
+    def __init__(self, count, seed=0, **kwargs):
+        # Episodes play seeds seed, seed + 1, ... in the order they start, so
+        # no two share one
+        self.envs = [BrickBreakerEnv(**kwargs) for _ in range(count)]
+        self.seed = seed
+        self.episodes = 0
+
+    def __len__(self):
+        return len(self.envs)
+
+    def next_seed(self):
+        seed = None if self.seed is None else (self.seed + self.episodes) % 2**32
+        self.episodes += 1
+        return seed
+
+    def stack(self, observations):
+        if np is not None:
+            return np.stack(observations)
+        return observations
+
+    def reset(self):
+        results = [env.reset(self.next_seed()) for env in self.envs]
+        return self.stack([obs for obs, _ in results]), [info for _, info in results]
+
+    def step(self, actions):
+        """Step every env with its action; returns stacked observations plus lists"""
+        observations, rewards, terminated, truncated, infos = [], [], [], [], []
+        for env, action in zip(self.envs, actions):
+            obs, reward, done, cut, info = env.step(action)
+            if done or cut:
+                info = dict(info, final_observation=obs, final_info=info)
+                obs, _ = env.reset(self.next_seed())
+            observations.append(obs)
+            rewards.append(reward)
+            terminated.append(done)
+            truncated.append(cut)
+            infos.append(info)
+        return self.stack(observations), rewards, terminated, truncated, infos
+
+def main():
+    # Usage: python env.py [envs] [steps]   random policy throughput check
+    import random
+    import sys
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = random.Random(0)
+    for pixels in (False, True):
+        envs = VectorEnv(count, seed=0, pixels=pixels)
+        envs.reset()
+        start = time.perf_counter()
+        for _ in range(steps // count):
+            envs.step([rng.randrange(len(ACTIONS)) for _ in range(count)])
+        elapsed = time.perf_counter() - start
+        done = steps // count * count
+        print(f"{count} envs, {'pixel' if pixels else 'vector'} observations: "
+              f"{done / elapsed:,.0f} env steps/s ({done * envs.envs[0].frame_skip / elapsed:,.0f} engine steps/s), "
+              f"{envs.episodes - count} episodes finished")
+
+if __name__ == "__main__":
+    main()
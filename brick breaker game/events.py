@@ -1,7 +1,7 @@
 import random
 
-def trigger_special_event():
+def trigger_special_event(rng=random):
     # Misalnya 1 dari 10 chance muncul power-up
-    if random.randint(1, 10) == 1:
-        return random.choice(["multi_ball", "big_paddle", "score_boost"])
+    if rng.randint(1, 10) == 1:
+        return rng.choice(["multi_ball", "big_paddle", "score_boost"])
     return None
@@ -0,0 +1,63 @@
+import pygame
+from collections import OrderedDict
+
+# Shared font registry and rendered-text cache for every screen. Building a
+# Font means a filesystem lookup and parsing the font file, and rendering text
+# is not free either, so both are done once and reused across frames.
+
+TEXT_CACHE_SIZE = 512
+
+_fonts = {}
+_text_cache = OrderedDict()
+stats = {"font_hits": 0, "font_misses": 0, "text_hits": 0, "text_misses": 0}
+
+def get_font(name, size):
+    """Get the font for (name, size), loading it on first use.
+
+    name is a font file such as "freesansbold.ttf", or None for pygame's
+    default font. Fonts that fail to load fall back to the default font.
+    """
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is not None:
+        stats["font_hits"] += 1
+        return font
+
+    stats["font_misses"] += 1
+    if not pygame.font.get_init():
+        pygame.font.init()
+    try:
+        font = pygame.font.Font(name, size)
+    except:
+        font = pygame.font.Font(None, size)
+    _fonts[key] = font
+    return font
+
+def render(text, font, color, antialias=True):
+    """Render text with a font, reusing the surface if it was rendered recently.
+
+    The returned surface is shared; copy it before changing its alpha.
+    """
+    key = (text, font, color, antialias)
+    surface = _text_cache.get(key)
+    if surface is not None:
+        stats["text_hits"] += 1
+        _text_cache.move_to_end(key)
+        return surface
+
+    stats["text_misses"] += 1
+    surface = font.render(text, antialias, color)
+    _text_cache[key] = surface
+    if len(_text_cache) > TEXT_CACHE_SIZE:
+        _text_cache.popitem(last=False)
+    return surface
+
+def cache_stats():
+    """Hit/miss counters plus current cache sizes"""
+    return dict(stats, fonts=len(_fonts), texts=len(_text_cache))
+
+def clear_cache():
+    _fonts.clear()
+    _text_cache.clear()
+    for key in stats:
+        stats[key] = 0
@@ -1,17 +1,40 @@
 import pygame
 import random
 import math
-import time
-import sys
-from leaderboard import update_score
-from events import trigger_special_event
+import os
+import logging
+import engine
+import background
+import cheat
+import fonts
+import profiler
+import sprites
+from dirty import DirtyRenderer
+from levelgen import LevelPrefetcher
+from particles import ParticlePool
+from replay import Replay
+from timestep import FixedTimestep
+from engine import WIDTH, HEIGHT, PADDLE_HEIGHT, BALL_RADIUS
+from powerups import CAPSULE_WIDTH, CAPSULE_HEIGHT
+from leaderboard import submit_score
+
+# Frame rate cap for rendering; the simulation runs at engine.STEP_RATE
+# regardless. F8 toggles uncapped rendering, e.g. for benchmarking.
+FPS = 60
+max_fps = FPS
 
-# Initialize pygame
-pygame.init()
+# Particle and ball trail updates per second. Their speeds and lifetimes are
+# counted in updates, tuned for 60 per second.
+PARTICLE_RATE = 60
 
-# Screen dimensions
-WIDTH, HEIGHT = 800, 600
-FPS = 60
+# Replays of finished games, for verification and bug reproduction
+REPLAY_DIR = "replays"
+
+log = logging.getLogger(__name__)
+
+# Dirty-rectangle rendering: only regions that changed are redrawn and sent to
+# the display. False redraws everything and flips every frame (F9 toggles).
+dirty_rects = True
 
 # Enhanced color palette
 WHITE = (255, 255, 255)
@@ -34,33 +57,50 @@ BLUE = (60, 130, 200)
 PURPLE = (150, 70, 200)
 GRAY = (150, 150, 150)
 
-# Game objects
-PADDLE_WIDTH, PADDLE_HEIGHT = 100, 15
-BALL_RADIUS = 8
-BRICK_WIDTH, BRICK_HEIGHT = 70, 25
+# Power-up colors for capsules, effects and indicators
+POWERUP_COLORS = {
+    "big_paddle": (100, 220, 100),   # Green
+    "score_boost": (220, 180, 100),  # Orange
+    "multi_ball": (100, 180, 220),   # Blue
+}
+POWERUP_DEFAULT_COLOR = (220, 220, 120)  # Yellow
 
-# Initialize screen
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Brick Breaker")
+# The game window, opened by init_display() rather than on import, so a
+# process that only imports this module (such as the replay verifier) opens
+# no window
+screen = None
 
 # Better fonts
-try:
-    font = pygame.font.Font("freesansbold.ttf", 36)
-    small_font = pygame.font.Font("freesansbold.ttf", 24)
-except:
-    font = pygame.font.SysFont(None, 36)
-    small_font = pygame.font.SysFont(None, 24)
+font = fonts.get_font("freesansbold.ttf", 36)
+small_font = fonts.get_font("freesansbold.ttf", 24)
+
+# Cosmetic random stream for particles and stars. It is reseeded from each
+# session's seed but kept apart from the engine's simulation stream, so effects
+# never change how a game plays out.
+cosmetic = random.Random()
 
 # Particle system
-particles = []
-brick_particles = []
-special_effect_particles = []
+particles = ParticlePool(2048, shrink=0.95, rng=cosmetic)          # Ball trails and sparks
+brick_particles = ParticlePool(2048, gravity=0.1, rng=cosmetic)    # Brick explosions
+special_effect_particles = ParticlePool(1024, rng=cosmetic)        # Power-ups and level clear
+
+def init_display():
+    """Open the game window, or take over the one main.py already opened"""
+    global screen
+    if screen is None:
+        pygame.init()
+        screen = pygame.display.get_surface()
+        if screen is None:
+            screen = pygame.display.set_mode((WIDTH, HEIGHT))
+            pygame.display.set_caption("Brick Breaker")
+    return screen
 
 def draw_text(text, x, y, color=WHITE, font_size=None):
-    text_font = font if font_size is None else pygame.font.SysFont(None, font_size)
-    text_surface = text_font.render(text, True, color)
+    text_font = font if font_size is None else fonts.get_font(None, font_size)
+    text_surface = fonts.render(text, text_font, color)
     text_rect = text_surface.get_rect(center=(x, y))
     screen.blit(text_surface, text_rect)
+    return text_rect
 
 def create_button(rect, text, text_color=WHITE, button_color=BLUE, hover_color=GREEN):
     mouse_pos = pygame.mouse.get_pos()
@@ -74,213 +114,304 @@ def create_button(rect, text, text_color=WHITE, button_color=BLUE, hover_color=G
     
     # Center text on button
     font_size = 28
-    text_surface = pygame.font.SysFont(None, font_size).render(text, True, text_color)
+    text_surface = fonts.render(text, fonts.get_font(None, font_size), text_color)
     text_rect = text_surface.get_rect(center=rect.center)
     screen.blit(text_surface, text_rect)
     
     return rect.collidepoint(mouse_pos) and pygame.mouse.get_pressed()[0]
 
 def draw_background():
-    # Create a gradient background
-    for y in range(HEIGHT):
-        # Calculate colors for a more dynamic gradient
-        progress = y / HEIGHT
-        r = int(15 * (1 - progress*0.7))
-        g = int(20 * (1 - progress*0.7))
-        b = int(35 + 20 * (1 - progress*0.7))
-        color = (r, g, b)
-        pygame.draw.line(screen, color, (0, y), (WIDTH, y))
-    
-    # Add some subtle stars in the background
+    # Gradient is baked once into a cached surface
+    background.draw_gradient(screen, "game")
+    draw_star_field()
+
+def draw_frame_background(renderer, bricks, menu=False):
+    """Start a frame with the background, returning the regions drawn on it.
+
+    With dirty rects it comes from the renderer's static layer, which holds
+    the bricks. The pause and game over screens (menu) show no bricks, so
+    they always get the plain background and look the same in both modes.
+    """
+    if dirty_rects and not menu:
+        renderer.begin((id(bricks), bricks.version))
+        rects = draw_star_field()
+        # Stars belong behind the bricks, as in a full redraw: paint a brick
+        # again over any star that landed on it (its rounded corners still
+        # let the star through)
+        width, height = int(bricks.brick_width), int(bricks.brick_height)
+        wall_bottom = bricks.bottom()
+        for rect in rects:
+            if rect.top >= wall_bottom:
+                continue
+            for brick in bricks.query(rect.left, rect.top, rect.right, rect.bottom):
+                x, y = brick_position(bricks, brick)
+                area = rect.move(-x, -y).clip(0, 0, width, height)
+                sprite = brick_sprite(bricks.color[brick], bricks.hp[brick], width, height)
+                screen.blit(sprite, (x + area.x, y + area.y), area)
+        return rects
+    draw_background()
+    return []
+
+def draw_star_field():
+    """Add some subtle stars in the background, returning the regions they cover"""
+    ticks = pygame.time.get_ticks()
+    stars = []
+    rects = []
     for i in range(50):
-        x = (i * 37 + pygame.time.get_ticks() // 50) % WIDTH
-        y = (i * 23 + pygame.time.get_ticks() // 100) % HEIGHT
-        size = random.random() * 2
-        brightness = 50 + int((math.sin(pygame.time.get_ticks() / 1000 + i) + 1) * 25)
-        pygame.draw.circle(screen, (brightness, brightness, brightness), (x, y), size)
-
-def create_particle(x, y, color, speed=1, size=3, life=30):
-    angle = random.uniform(0, math.pi * 2)
-    speed_x = math.cos(angle) * speed
-    speed_y = math.sin(angle) * speed
+        x = (i * 37 + ticks // 50) % WIDTH
+        y = (i * 23 + ticks // 100) % HEIGHT
+        size = cosmetic.random() * 2
+        brightness = 50 + int((math.sin(ticks / 1000 + i) + 1) * 25)
+        stars.append((x, y, size, brightness))
+        rects.append(pygame.Rect(x - 2, y - 2, 5, 5))
+    background.draw_stars(screen, stars)
+    return rects
+
+def draw_static_layer(surface, bricks):
+    """The parts of the game screen that only change when a brick does"""
+    surface.blit(background.get_gradient("game", surface.get_size()), (0, 0))
+    draw_bricks(bricks, surface)
+
+def draw_particle_pool(pool, pulse=False):
+    ticks = pygame.time.get_ticks()
+    x, y, size, life, color = pool.x, pool.y, pool.size, pool.life, pool.color
+    for i in range(pool.count):
+        alpha = min(255, int(life[i]) * 8)
+        radius = size[i]
+        if pulse:
+            radius *= 1 + math.sin(ticks / 200 + i) * 0.2
+        pygame.draw.circle(screen, color[i] + (alpha,), (int(x[i]), int(y[i])), radius)
+
+def particle_pool_rect(pool):
+    """One rectangle around every live particle of a pool, or None"""
+    n = pool.count
+    if not n:
+        return None
+    xs, ys = pool.x[:n], pool.y[:n]
+    margin = max(pool.size[:n]) * 1.2 + 2  # Pulsing particles grow by up to 20%
+    left, top = min(xs) - margin, min(ys) - margin
+    return pygame.Rect(int(left), int(top), int(max(xs) + margin - left) + 1, int(max(ys) + margin - top) + 1)
+
+@profiler.timed("particles")
+def update_particles():
+    # Update ball trail, brick explosion and special effect particles
+    particles.update()
+    brick_particles.update()
+    special_effect_particles.update()
+    return draw_particles()
+
+@profiler.timed("particles")
+def tick_particles(state, ticks=1):
+    """Run ticks particle updates (PARTICLE_RATE per second), ball trails included"""
+    for _ in range(ticks):
+        emit_ball_trails(state)
+        particles.update()
+        brick_particles.update()
+        special_effect_particles.update()
+
+@profiler.timed("particles")
+def draw_particles():
+    # Draw particles
+    draw_particle_pool(particles)
+    draw_particle_pool(brick_particles)
+    draw_particle_pool(special_effect_particles, pulse=True)
+    
+    rects = (particle_pool_rect(particles), particle_pool_rect(brick_particles),
+             particle_pool_rect(special_effect_particles))
+    return [rect for rect in rects if rect is not None]
+
+def particle_counts():
+    """Live particles per pool after the last update"""
     return {
-        'x': x, 
-        'y': y,
-        'speed_x': speed_x,
-        'speed_y': speed_y,
-        'size': size,
-        'color': color,
-        'life': life
+        'trail': particles.count,
+        'brick': brick_particles.count,
+        'special': special_effect_particles.count,
     }
 
-def update_particles():
-    # Update ball trail particles
-    for i, p in enumerate(particles[:]):
-        p['life'] -= 1
-        if p['life'] <= 0:
-            particles.remove(p)
-            continue
-        
-        p['x'] += p['speed_x']
-        p['y'] += p['speed_y']
-        p['size'] *= 0.95
-        
-        # Draw particle
-        alpha = min(255, p['life'] * 8)
-        pygame.draw.circle(screen, p['color'] + (alpha,), (int(p['x']), int(p['y'])), p['size'])
-    
-    # Update brick explosion particles
-    for i, p in enumerate(brick_particles[:]):
-        p['life'] -= 1
-        if p['life'] <= 0:
-            brick_particles.remove(p)
-            continue
-        
-        p['x'] += p['speed_x']
-        p['y'] += p['speed_y']
-        p['speed_y'] += 0.1  # Add gravity
-        
-        # Draw particle
-        alpha = min(255, p['life'] * 8)
-        pygame.draw.circle(screen, p['color'] + (alpha,), (int(p['x']), int(p['y'])), p['size'])
-    
-    # Update special effect particles
-    for i, p in enumerate(special_effect_particles[:]):
-        p['life'] -= 1
-        if p['life'] <= 0:
-            special_effect_particles.remove(p)
-            continue
-        
-        p['x'] += p['speed_x']
-        p['y'] += p['speed_y']
-        
-        # Draw particle
-        alpha = min(255, p['life'] * 8)
-        size = p['size'] * (1 + math.sin(pygame.time.get_ticks() / 200 + i) * 0.2)
-        pygame.draw.circle(screen, p['color'] + (alpha,), (int(p['x']), int(p['y'])), size)
-
-def draw_paddle(paddle, special_active):
+def paint_paddle(surface, paddle, glow_color):
     # Create a glow effect for the paddle
     glow_rect = pygame.Rect(paddle.x - 5, paddle.y - 5, paddle.width + 10, paddle.height + 10)
     
-    # Different glow for special powers
-    glow_color = PADDLE_GLOW
-    if special_active == "big_paddle":
-        glow_color = (180, 220, 120)  # Green glow for big paddle
-    elif special_active:
-        glow_color = (220, 180, 120)  # Orange glow for other specials
-    
     # Draw multiple layers for glow effect
     for i in range(3):
         g_rect = pygame.Rect(glow_rect.x + i, glow_rect.y + i, glow_rect.width - i*2, glow_rect.height - i*2)
-        pygame.draw.rect(screen, glow_color + (100 - i*30,), g_rect, border_radius=8)
+        pygame.draw.rect(surface, glow_color + (100 - i*30,), g_rect, border_radius=8)
     
     # Draw the main paddle
-    pygame.draw.rect(screen, PADDLE_COLOR, paddle, border_radius=7)
+    pygame.draw.rect(surface, PADDLE_COLOR, paddle, border_radius=7)
     
     # Add a shine effect
     shine_height = paddle.height // 2
-    shine_rect = pygame.Rect(paddle.x, paddle.y, paddle.width, shine_height)
     
     for i in range(shine_height):
         progress = i / shine_height
         alpha = int(80 * (1 - progress))
-        pygame.draw.line(screen, (255, 255, 255, alpha), 
+        pygame.draw.line(surface, (255, 255, 255, alpha), 
                          (paddle.x, paddle.y + i), 
                          (paddle.x + paddle.width, paddle.y + i))
 
-def draw_ball(ball, ball_dx, ball_dy):
+def draw_paddle(paddle, effects=()):
+    # Different glow for special powers
+    glow_color = PADDLE_GLOW
+    if "big_paddle" in effects:
+        glow_color = (180, 220, 120)  # Green glow for big paddle
+    elif effects:
+        glow_color = (220, 180, 120)  # Orange glow for other specials
+    
+    # Paddle plus its glow, pre-rendered once per width and glow color
+    size = (paddle.width + 10, paddle.height + 10)
+    sprite = sprites.get_sprite(("paddle", paddle.width, paddle.height, glow_color), size,
+                                lambda surface: paint_paddle(surface, pygame.Rect(5, 5, paddle.width, paddle.height), glow_color))
+    return screen.blit(sprite, (paddle.x - 5, paddle.y - 5))
+
+# Ball glow radius, and the size of the square ball sprite around it
+BALL_GLOW_RADIUS = BALL_RADIUS * 1.5
+BALL_SPRITE_SIZE = int(BALL_GLOW_RADIUS) * 2 + 1
+
+def paint_ball(surface, center):
     # Ball glow
-    glow_radius = BALL_RADIUS * 1.5
     for i in range(3):
-        size = glow_radius - i
+        size = BALL_GLOW_RADIUS - i
         alpha = 150 - i*40
-        pygame.draw.circle(screen, BALL_GLOW + (alpha,), ball.center, size)
+        pygame.draw.circle(surface, BALL_GLOW + (alpha,), center, size)
     
     # Main ball
-    pygame.draw.circle(screen, BALL_COLOR, ball.center, BALL_RADIUS)
+    pygame.draw.circle(surface, BALL_COLOR, center, BALL_RADIUS)
     
     # Ball shine
-    shine_pos = (ball.centerx - BALL_RADIUS//3, ball.centery - BALL_RADIUS//3)
-    pygame.draw.circle(screen, (255, 255, 255), shine_pos, BALL_RADIUS//3)
-    
-    # Add particle trail
-    if random.random() < 0.3:
-        particles.append(create_particle(
-            ball.centerx, ball.centery,
-            BALL_COLOR, 
-            speed=0.5,
-            size=BALL_RADIUS * 0.7,
-            life=15
-        ))
-
-def draw_bricks(bricks):
-    for i, brick in enumerate(bricks):
-        # Vary brick colors by row
-        row = i // 10
-        color = BRICK_COLORS[row % len(BRICK_COLORS)]
-        
-        # Draw brick with gradient
-        pygame.draw.rect(screen, color, brick, border_radius=4)
-        
-        # Add highlight to top edge
-        highlight_rect = pygame.Rect(brick.x, brick.y, brick.width, 5)
-        pygame.draw.rect(screen, (255, 255, 255, 100), highlight_rect, border_radius=4)
-        
-        # Add shadow to bottom edge
-        shadow_rect = pygame.Rect(brick.x, brick.y + brick.height - 5, brick.width, 5)
-        pygame.draw.rect(screen, (0, 0, 0, 100), shadow_rect, border_radius=4)
+    shine_pos = (center[0] - BALL_RADIUS//3, center[1] - BALL_RADIUS//3)
+    pygame.draw.circle(surface, (255, 255, 255), shine_pos, BALL_RADIUS//3)
+
+def get_ball_sprite():
+    half = BALL_SPRITE_SIZE // 2
+    return sprites.get_sprite("ball", (BALL_SPRITE_SIZE, BALL_SPRITE_SIZE),
+                              lambda surface: paint_ball(surface, (half, half)))
 
-def create_brick_particles(brick):
-    color = BRICK_COLORS[(brick.y // BRICK_HEIGHT) % len(BRICK_COLORS)]
+def draw_ball(x, y):
+    half = BALL_SPRITE_SIZE // 2
+    return screen.blit(get_ball_sprite(), (int(x) - half, int(y) - half))
+
+def emit_ball_trails(state):
+    # Add particle trail
+    for ball in state.balls:
+        if cosmetic.random() < 0.3:
+            particles.emit(
+                ball.x, ball.y,
+                BALL_COLOR, 
+                speed=0.5,
+                size=BALL_RADIUS * 0.7,
+                life=15
+            )
+
+def draw_swarm(swarm):
+    # Hundreds of balls: one batched blit call, no per-ball trail particles
+    sprite = get_ball_sprite()
+    half = BALL_SPRITE_SIZE // 2
+    positions = swarm.positions()
+    screen.blits([(sprite, (int(x) - half, int(y) - half)) for x, y in positions], False)
+    
+    # One rectangle around the whole swarm
+    xs = [int(x) for x, _ in positions]
+    ys = [int(y) for _, y in positions]
+    left, top = min(xs) - half, min(ys) - half
+    return pygame.Rect(left, top, max(xs) - min(xs) + BALL_SPRITE_SIZE, max(ys) - min(ys) + BALL_SPRITE_SIZE)
+
+def paint_brick(surface, rect, color, hp=1):
+    # Draw brick with gradient
+    pygame.draw.rect(surface, color, rect, border_radius=4)
+    
+    # Add highlight to top edge
+    highlight_rect = pygame.Rect(rect.x, rect.y, rect.width, 5)
+    pygame.draw.rect(surface, (255, 255, 255, 100), highlight_rect, border_radius=4)
+    
+    # Add shadow to bottom edge
+    shadow_rect = pygame.Rect(rect.x, rect.y + rect.height - 5, rect.width, 5)
+    pygame.draw.rect(surface, (0, 0, 0, 100), shadow_rect, border_radius=4)
+    
+    # One pip per hit left on multi-hit bricks
+    if hp > 1:
+        pygame.draw.rect(surface, (255, 255, 255), rect.inflate(-6, -6), 1, border_radius=3)
+        for i in range(hp):
+            pip_x = rect.centerx + (i - (hp - 1) / 2) * 8
+            pygame.draw.circle(surface, (255, 255, 255), (int(pip_x), rect.centery), 2)
+
+def brick_sprite(color_index, hp, width, height):
+    color = BRICK_COLORS[color_index % len(BRICK_COLORS)]
+    return sprites.get_sprite(("brick", color, width, height, hp), (width, height),
+                              lambda sprite: paint_brick(sprite, pygame.Rect(0, 0, width, height), color, hp))
+
+def brick_position(bricks, i):
+    """Screen position of brick i's sprite"""
+    row, col = divmod(i, bricks.cols)
+    return int(bricks.left + col * bricks.cell_width), int(bricks.top + row * bricks.cell_height)
+
+def draw_bricks(bricks, surface=None):
+    surface = screen if surface is None else surface
+    width, height = int(bricks.brick_width), int(bricks.brick_height)
+    hp, colors, cols = bricks.hp, bricks.color, bricks.cols
+    left, top, cell_width, cell_height = bricks.left, bricks.top, bricks.cell_width, bricks.cell_height
+    # Every brick of a level has the same size, so a sprite per (color, hp)
+    level_sprites = {}
+    batch = []
+    for i in bricks:
+        key = (colors[i], hp[i])
+        sprite = level_sprites.get(key)
+        if sprite is None:
+            sprite = level_sprites[key] = brick_sprite(key[0], key[1], width, height)
+        row, col = divmod(i, cols)
+        batch.append((sprite, (int(left + col * cell_width), int(top + row * cell_height))))
+    surface.blits(batch, False)
+
+def create_brick_particles(x, y, color_index):
+    color = BRICK_COLORS[color_index % len(BRICK_COLORS)]
     for _ in range(10):
-        brick_particles.append(create_particle(
-            brick.centerx, brick.centery,
+        brick_particles.emit(
+            x, y,
             color, 
-            speed=random.uniform(1, 3),
-            size=random.uniform(2, 5),
-            life=random.randint(20, 40)
-        ))
+            speed=cosmetic.uniform(1, 3),
+            size=cosmetic.uniform(2, 5),
+            life=cosmetic.randint(20, 40)
+        )
 
 def create_special_effect(x, y, special_type):
-    color = (220, 220, 120)  # Default yellow
-    if special_type == "big_paddle":
-        color = (100, 220, 100)  # Green
-    elif special_type == "score_boost":
-        color = (220, 180, 100)  # Orange
-    elif special_type == "multi_ball":
-        color = (100, 180, 220)  # Blue
-    
+    color = POWERUP_COLORS.get(special_type, POWERUP_DEFAULT_COLOR)
     for _ in range(20):
-        angle = random.uniform(0, math.pi * 2)
-        speed = random.uniform(0.5, 2)
-        speed_x = math.cos(angle) * speed
-        speed_y = math.sin(angle) * speed
-        
-        special_effect_particles.append({
-            'x': x,
-            'y': y,
-            'speed_x': speed_x,
-            'speed_y': speed_y,
-            'size': random.uniform(3, 7),
-            'color': color,
-            'life': random.randint(30, 60)
-        })
-
-def draw_special_indicator(special_active, special_timer):
-    if not special_active:
-        return
-    
+        special_effect_particles.emit(
+            x, y,
+            color,
+            speed=cosmetic.uniform(0.5, 2),
+            size=cosmetic.uniform(3, 7),
+            life=cosmetic.randint(30, 60)
+        )
+
+def paint_capsule(surface, rect, color):
+    pygame.draw.rect(surface, color, rect, border_radius=rect.height // 2)
+    # Highlight along the top and a white rim
+    pygame.draw.line(surface, (255, 255, 255), (rect.x + 6, rect.y + 3), (rect.right - 7, rect.y + 3))
+    pygame.draw.rect(surface, WHITE, rect, width=1, border_radius=rect.height // 2)
+
+def draw_capsules(state):
+    """Draw the falling power-up capsules, returning the regions drawn into"""
+    rects = []
+    for capsule in state.powerups.capsules:
+        color = POWERUP_COLORS.get(capsule.kind, POWERUP_DEFAULT_COLOR)
+        sprite = sprites.get_sprite(("capsule", color), (CAPSULE_WIDTH, CAPSULE_HEIGHT),
+                                    lambda surface: paint_capsule(surface, surface.get_rect(), color))
+        rects.append(screen.blit(sprite, (int(capsule.x - CAPSULE_WIDTH / 2), int(capsule.y - CAPSULE_HEIGHT / 2))))
+    return rects
+
+def draw_powerup_indicators(state):
+    """One bar per running power-up, stacked in the top-right corner"""
+    return [draw_special_indicator(state, name, 50 + i * 30) for i, name in enumerate(state.powerups.active)]
+
+def draw_special_indicator(state, special_active, y):
     # Calculate remaining time
-    elapsed = pygame.time.get_ticks() - special_timer
-    remaining = max(0, 5000 - elapsed)
-    progress = remaining / 5000
+    _, progress = state.powerups.remaining(special_active, state.time)
     
-    # Draw indicator in top-right corner
+    # Draw indicator in the top-right corner
     indicator_width = 150
     indicator_height = 25
     x = WIDTH - indicator_width - 10
-    y = 50
     
     # Draw background
     pygame.draw.rect(screen, (50, 50, 70, 200), 
@@ -291,13 +422,7 @@ def draw_special_indicator(special_active, special_timer):
     progress_width = int(indicator_width * progress)
     
     # Choose color based on special type
-    bar_color = (220, 220, 120)  # Default yellow
-    if special_active == "big_paddle":
-        bar_color = (100, 220, 100)  # Green
-    elif special_active == "score_boost":
-        bar_color = (220, 180, 100)  # Orange
-    elif special_active == "multi_ball":
-        bar_color = (100, 180, 220)  # Blue
+    bar_color = POWERUP_COLORS.get(special_active, POWERUP_DEFAULT_COLOR)
     
     pygame.draw.rect(screen, bar_color, 
                      pygame.Rect(x, y, progress_width, indicator_height), 
@@ -311,95 +436,188 @@ def draw_special_indicator(special_active, special_timer):
     # Draw text
     special_name = special_active.replace("_", " ").title()
     draw_text(special_name, x + indicator_width//2, y + indicator_height//2, WHITE, 20)
-
-def apply_bounce_randomness(dx, dy, randomness=0.2):
-    # Add a small random variation to the angle while preserving speed
-    speed = math.sqrt(dx**2 + dy**2)
-    angle = math.atan2(dy, dx)
-    
-    # Add random angle variation (within limits)
-    angle_variation = random.uniform(-randomness, randomness)
-    new_angle = angle + angle_variation
-    
-    # Convert back to velocity components
-    new_dx = math.cos(new_angle) * speed
-    new_dy = math.sin(new_angle) * speed
     
-    return new_dx, new_dy
+    return pygame.Rect(x, y, indicator_width, indicator_height)
+
+@profiler.timed("particles")
+def spawn_event_particles(state):
+    """Turn the events of the last simulation step into particle effects"""
+    for event in state.events:
+        kind = event[0]
+        if kind == "wall":
+            for _ in range(5):
+                particles.emit(event[1], event[2], BALL_COLOR, speed=cosmetic.uniform(1, 2), life=15)
+        elif kind == "ball_lost":
+            for _ in range(10):
+                particles.emit(event[1], event[2], RED, speed=cosmetic.uniform(2, 3), life=20)
+        elif kind == "paddle":
+            for _ in range(8):
+                particles.emit(event[1], event[2], PADDLE_COLOR, speed=cosmetic.uniform(1, 2), life=15)
+        elif kind == "brick":
+            create_brick_particles(event[1], event[2], event[3])
+        elif kind == "brick_hit":
+            # A multi-hit brick cracked: a few chips instead of a burst
+            color = BRICK_COLORS[event[3] % len(BRICK_COLORS)]
+            for _ in range(4):
+                brick_particles.emit(event[1], event[2], color, speed=cosmetic.uniform(1, 2), size=2, life=15)
+        elif kind == "special":
+            create_special_effect(event[1], event[2], event[3])
+        elif kind == "multi_ball":
+            for _ in range(10):
+                particles.emit(event[1], event[2], BALL_COLOR, speed=cosmetic.uniform(1, 2.5), life=30)
+        elif kind == "refill":
+            # Special appearance effect for the new brick
+            for _ in range(5):
+                particles.emit(
+                    event[1], 
+                    event[2], 
+                    BRICK_COLORS[min(4, state.level-1) % len(BRICK_COLORS)], 
+                    speed=cosmetic.uniform(0.5, 1.5), 
+                    size=cosmetic.uniform(2, 4), 
+                    life=30
+                )
+        elif kind == "level_cleared":
+            # Create celebratory particles
+            for _ in range(30):
+                x = cosmetic.randint(0, WIDTH)
+                y = cosmetic.randint(0, HEIGHT//2)
+                color = cosmetic.choice(BRICK_COLORS)
+                speed = cosmetic.uniform(1, 3)
+                special_effect_particles.emit(x, y, color, speed, size=cosmetic.uniform(3, 6), life=60)
+
+def snapshot_positions(state):
+    """Paddle and ball positions of a state, to interpolate drawing from"""
+    return state.paddle_x, {ball: (ball.x, ball.y) for ball in state.balls}
+
+def draw_game(state, bricks=True, previous=None, alpha=1.0):
+    """Draw the paddle, balls, bricks, capsules, particles and power-up indicators of a game state.
+
+    With previous (a snapshot_positions() of the state one step earlier), the
+    paddle and balls are drawn alpha of the way from there to where they are
+    now. Returns the regions drawn into; the bricks are left out with
+    bricks=False (the dirty-rect renderer keeps them in its static layer).
+    """
+    rects = []
+    paddle_x = state.paddle_x
+    previous_balls = {}
+    if previous is not None:
+        previous_x, previous_balls = previous
+        paddle_x = previous_x + (paddle_x - previous_x) * alpha
+    paddle = pygame.Rect(int(paddle_x), state.paddle_y, int(state.paddle_width), PADDLE_HEIGHT)
+    rects.append(draw_paddle(paddle, state.powerups.active))
+    # Draw all balls
+    for ball in state.balls:
+        x, y = ball.x, ball.y
+        start = previous_balls.get(ball)
+        if start is not None:
+            x = start[0] + (x - start[0]) * alpha
+            y = start[1] + (y - start[1]) * alpha
+        rects.append(draw_ball(x, y))
+    if state.swarm:
+        rects.append(draw_swarm(state.swarm))
+    if bricks:
+        draw_bricks(state.bricks)
+    rects += draw_capsules(state)
+    rects += draw_particles()
+
+    # Draw power-up indicators
+    rects += draw_powerup_indicators(state)
+    return rects
+
+# Short confirmation shown when a key changes a setting, whether or not the
+# profiler overlay is on
+NOTICE_DURATION = 1500  # Milliseconds
+notice_text = ""
+notice_until = 0
+
+def show_notice(text):
+    global notice_text, notice_until
+    notice_text = text
+    notice_until = pygame.time.get_ticks() + NOTICE_DURATION
+
+def draw_notice():
+    """Draw the current notice, if any, returning the regions drawn"""
+    if not notice_text or pygame.time.get_ticks() >= notice_until:
+        return []
+    return [draw_text(notice_text, WIDTH // 2, 25, WHITE, 22)]
+
+def show_uncapped():
+    profiler.set_status("fps cap", max_fps or "off")
+
+def toggle_uncapped():
+    global max_fps
+    max_fps = 0 if max_fps else FPS
+    show_uncapped()
+    show_notice(f"Frame rate {'uncapped' if not max_fps else f'capped at {FPS} FPS'}")
+
+show_uncapped()
+
+def show_dirty_rects():
+    profiler.set_status("render", "dirty rects" if dirty_rects else "full redraw")
+
+def toggle_dirty_rects():
+    global dirty_rects
+    dirty_rects = not dirty_rects
+    show_dirty_rects()
+    show_notice(f"Dirty-rect rendering {'on' if dirty_rects else 'off'}")
+
+show_dirty_rects()
+
+# Builds the next level on a background thread while the current one is played
+level_prefetcher = LevelPrefetcher(engine.level_layout)
+
+def new_session():
+    """A fresh game state and the replay recording it"""
+    state = engine.GameState()
+    state.level_source = level_prefetcher
+    level_prefetcher.prefetch(state.seed, state.level + 1)
+    cosmetic.seed(f"cosmetic:{state.seed}")
+    return state, Replay(state.seed, engine.STEP_RATE)
+
+@profiler.timed("db")
+def submit_game(user_id, state, replay):
+    """Save the replay and queue the score, which is saved only if the replay verifies.
+
+    Returns whether the replay file was written.
+    """
+    replay.score = state.score
+    saved = save_replay(replay, user_id)
+    submit_score(user_id, state.score, replay.to_bytes())
+    return saved
+
+def save_replay(replay, user_id):
+    try:
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        replay.save(os.path.join(REPLAY_DIR, f"{user_id}_{replay.seed}.bbr"))
+        return True
+    except OSError as e:
+        log.warning("Could not save replay: %s", e)
+        return False
 
 def start(user_id):
+    init_display()
     clock = pygame.time.Clock()
 
-    # Paddle
-    paddle = pygame.Rect(WIDTH // 2 - PADDLE_WIDTH // 2, HEIGHT - 40, PADDLE_WIDTH, PADDLE_HEIGHT)
-    
-    # Main ball and multiple balls support
-    main_ball = pygame.Rect(WIDTH // 2, HEIGHT // 2, BALL_RADIUS*2, BALL_RADIUS*2)
-    balls = [main_ball]  # List to store all active balls
-    ball_velocities = [(5, -5)]  # List of (dx, dy) for each ball
-    
-    # Bricks
-    bricks = []
-    for i in range(5):
-        for j in range(10):
-            bricks.append(pygame.Rect(j * (BRICK_WIDTH + 5) + 35, i * (BRICK_HEIGHT + 5) + 35, BRICK_WIDTH, BRICK_HEIGHT))
+    # All game rules live in the headless engine; this loop only handles input and rendering
+    state, replay = new_session()
 
     running = True
     game_over = False
     paused = False
-    score = 0
-    special_active = None
-    special_timer = 0
     return_to_menu = False
-    collision_cooldown = 0  # Add collision cooldown counter
-    
-    # New variables for level transition
-    level = 1
-    level_cleared = False
-    refill_timer = 0
-    refill_delay = 100  # Time between adding each brick (ms)
-    last_refill_time = 0
-    new_bricks = []
-    level_transition_message_time = 0
-    starting_ball_pos = (WIDTH // 2, HEIGHT // 2)
-    starting_paddle_pos = WIDTH // 2 - PADDLE_WIDTH // 2
-    
-    # Multi-ball variables
-    multi_ball_spawned = False
-    multi_ball_spawn_time = 0
+    replay_saved = True
     
     # Function to reset game state
     def reset_game_state():
-        nonlocal balls, ball_velocities, paddle, bricks, score, special_active, special_timer, collision_cooldown, multi_ball_spawned
-        score = 0
-        
-        # Reset to single ball
-        balls = [pygame.Rect(WIDTH // 2, HEIGHT // 2, BALL_RADIUS*2, BALL_RADIUS*2)]
-        ball_velocities = [(5, -5)]
-        
-        paddle.x = WIDTH // 2 - PADDLE_WIDTH // 2
-        paddle.width = PADDLE_WIDTH  # Reset paddle size
-        # Reset bricks
-        bricks.clear()
-        for i in range(5):
-            for j in range(10):
-                bricks.append(pygame.Rect(j * (BRICK_WIDTH + 5) + 35, i * (BRICK_HEIGHT + 5) + 35, BRICK_WIDTH, BRICK_HEIGHT))
-        special_active = None
-        special_timer = 0
-        collision_cooldown = 0  # Reset collision cooldown when game resets
-        multi_ball_spawned = False  # Reset multi-ball state
+        nonlocal state, replay, previous, replay_saved
+        state, replay = new_session()
+        replay_saved = True
+        simulation.reset()
+        previous = None
         # Clear particles
         particles.clear()
         brick_particles.clear()
         special_effect_particles.clear()
-        
-    # Function to create new bricks for the next level
-    def create_new_bricks():
-        new_bricks = []
-        for i in range(5):
-            for j in range(10):
-                new_bricks.append(pygame.Rect(j * (BRICK_WIDTH + 5) + 35, i * (BRICK_HEIGHT + 5) + 35, BRICK_WIDTH, BRICK_HEIGHT))
-        return new_bricks
 
     # Pause button
     pause_button = pygame.Rect(WIDTH - 120, 10, 110, 30)
@@ -412,44 +630,22 @@ def start(user_id):
     # Track button clicks for better detection
     button_pressed = False
     
-    # Helper function to spawn additional balls for multi-ball power-up
-    def spawn_multi_balls(ball, count=2):
-        nonlocal balls, ball_velocities, multi_ball_spawned
-        
-        # Only spawn new balls if we haven't already for this power-up
-        if not multi_ball_spawned:
-            multi_ball_spawned = True
-            
-            # Create the additional balls
-            for i in range(count):
-                # Create a new ball at the same position as the current ball
-                new_ball = pygame.Rect(ball.x, ball.y, BALL_RADIUS*2, BALL_RADIUS*2)
-                
-                # Give the new ball a different velocity direction
-                angle = math.pi/4 + i * math.pi/2  # Spread the balls at different angles
-                speed = 6  # Slightly faster than normal
-                dx = math.cos(angle) * speed
-                dy = -math.sin(angle) * speed  # Negative to go up
-                
-                # Add the new ball and its velocity
-                balls.append(new_ball)
-                ball_velocities.append((dx, dy))
-                
-                # Create particle effect for the new ball
-                for _ in range(10):
-                    particles.append(create_particle(
-                        new_ball.centerx, 
-                        new_ball.centery, 
-                        BALL_COLOR, 
-                        speed=random.uniform(1, 2.5),
-                        life=30
-                    ))
+    # Static background and bricks for dirty-rect rendering, redrawn whenever
+    # the brick index changes
+    renderer = DirtyRenderer(screen, lambda surface: draw_static_layer(surface, state.bricks))
+
+    # Fixed-rate simulation and particle updates, fed with real frame times
+    simulation = FixedTimestep(engine.STEP_RATE)
+    particle_clock = FixedTimestep(PARTICLE_RATE)
+    previous = None  # Positions one step before the current state
     
     while running:
-        clock.tick(FPS)
+        frame_time = clock.tick(max_fps) / 1000
+        profiler.begin_frame()
         
         # Draw the background
-        draw_background()
+        with profiler.section("background"):
+            frame_rects = draw_frame_background(renderer, state.bricks, menu=paused or game_over)
         
         # Reset button_pressed state on new frame
         if not pygame.mouse.get_pressed()[0]:
@@ -460,6 +656,19 @@ def start(user_id):
             if event.type == pygame.QUIT:
                 running = False
             
+            if event.type == pygame.KEYDOWN and not game_over:
+                cheat.handle_cheat_keys(event, state)
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F8:
+                toggle_uncapped()
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                toggle_dirty_rects()
+                renderer.invalidate()
+
+            if event.type == pygame.KEYDOWN:
+                profiler.handle_profiler_keys(event)
+
             if event.type == pygame.KEYDOWN:
                 # Spacebar or P key to pause/unpause
                 if (event.key == pygame.K_SPACE or event.key == pygame.K_p) and not game_over:
@@ -489,12 +698,14 @@ def start(user_id):
             pygame.draw.rect(screen, WHITE, pause_button, 1, border_radius=7)
             # Center text in pause button
             draw_text("PAUSE" if not paused else "RESUME", pause_button.centerx, pause_button.centery, WHITE, 24)
+            frame_rects.append(pause_button)
 
         # Draw score
         score_bg = pygame.Rect(60, 10, 120, 30)
         pygame.draw.rect(screen, (30, 30, 60, 180), score_bg, border_radius=7)
         pygame.draw.rect(screen, WHITE, score_bg, 1, border_radius=7)
-        draw_text(f"Score: {score}", 120, 25, WHITE, 24)
+        frame_rects.append(score_bg)
+        frame_rects.append(draw_text(f"Score: {state.score}", 120, 25, WHITE, 24))
 
         if game_over:
             # Game over screen with improved visuals
@@ -510,7 +721,9 @@ def start(user_id):
             
             # Game over text with glow
             draw_text("GAME OVER", WIDTH // 2, HEIGHT // 2 - 150, RED, 48)
-            draw_text(f"Final Score: {score}", WIDTH // 2, HEIGHT // 2 - 100, WHITE)
+            draw_text(f"Final Score: {state.score}", WIDTH // 2, HEIGHT // 2 - 100, WHITE)
+            if not replay_saved:
+                draw_text("Replay could not be saved", WIDTH // 2, HEIGHT // 2 - 65, RED, 20)
             
             # Draw buttons for Game Over screen
             if create_button(play_again_button, "Play Again"):
@@ -527,6 +740,7 @@ def start(user_id):
                 running = False
             
             pygame.display.flip()
+            renderer.invalidate()
             continue
 
         if paused:
@@ -558,292 +772,65 @@ def start(user_id):
                 running = False
             
             pygame.display.flip()
+            renderer.invalidate()
             continue
 
-        # Handle level transition and block refill animation
-        if level_cleared:
-            current_time = pygame.time.get_ticks()
-            
-            # Check if power-up expires during level transition
-            if special_active and current_time - special_timer > 5000:
-                special_active = None
-                paddle.width = PADDLE_WIDTH
-                multi_ball_spawned = False
-            
-            # Show level completion message
-            if current_time < level_transition_message_time:
-                # Semi-transparent message box
-                msg_rect = pygame.Rect(WIDTH//2 - 200, HEIGHT//2 - 50, 400, 100)
-                pygame.draw.rect(screen, (30, 30, 60, 200), msg_rect, border_radius=15)
-                pygame.draw.rect(screen, (60, 200, 100), msg_rect, 2, border_radius=15)
-                
-                # Level completion text
-                draw_text(f"LEVEL {level-1} COMPLETED!", WIDTH // 2, HEIGHT // 2 - 20, GREEN, 36)
-                draw_text(f"Level {level} starting...", WIDTH // 2, HEIGHT // 2 + 20, WHITE, 28)
-            
-            # No paddle movement during transition - paddle stays centered
-            
-            # Gradually add new bricks with animation
-            if new_bricks and current_time - last_refill_time > refill_delay:
-                # Add a new brick from the prepared list
-                brick = new_bricks.pop(0)
-                bricks.append(brick)
-                last_refill_time = current_time
-                
-                # Create special appearance effect for the new brick
-                for _ in range(5):
-                    particles.append(create_particle(
-                        brick.centerx, 
-                        brick.centery, 
-                        BRICK_COLORS[min(4, level-1) % len(BRICK_COLORS)], 
-                        speed=random.uniform(0.5, 1.5), 
-                        size=random.uniform(2, 4), 
-                        life=30
-                    ))
-            
-            # When all bricks are refilled, resume normal gameplay
-            if not new_bricks:
-                level_cleared = False
-                
-                # Reset ball and paddle to starting positions
-                # For multi-ball, keep only the first ball
-                balls = [pygame.Rect(starting_ball_pos[0], starting_ball_pos[1], BALL_RADIUS*2, BALL_RADIUS*2)]
-                ball_velocities = [(5, -5)]
-                
-                paddle.x = starting_paddle_pos
-                
-                # Reset ball velocity (with slightly increased speed for higher levels)
-                base_speed = 5 + (level - 1) * 0.5  # Increase speed with each level
-                ball_velocities[0] = (base_speed, -base_speed)
-                
-                # Add bonus points for completing a level
-                score += level * 50
-                
-                # Shrink paddle slightly for added difficulty (but not too much)
-                if paddle.width > PADDLE_WIDTH * 0.7 and not special_active:
-                    paddle.width = max(PADDLE_WIDTH * 0.9, paddle.width - 5)
-                elif special_active == "big_paddle":
-                    # Ensure the paddle remains big if power-up is active
-                    paddle.width = 150
-            
-            # Draw the current state of bricks being filled
-            draw_paddle(paddle, special_active)
-            # Draw all balls
-            for ball in balls:
-                draw_ball(ball, 0, 0)  # Show ball but don't indicate movement
-            draw_bricks(bricks)
-            update_particles()
-            
-            # Always show power-up indicator during level transition if active
-            if special_active:
-                draw_special_indicator(special_active, special_timer)
-            
-            # Continue to next frame, skipping normal ball movement
-            pygame.display.flip()
-            continue
-            
-        # Move paddle - ONLY if not in level transition
+        # Read paddle input (ignored by the engine during a level transition)
         keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT] and paddle.left > 0:
-            paddle.move_ip(-10, 0)
-        if keys[pygame.K_RIGHT] and paddle.right < WIDTH:
-            paddle.move_ip(10, 0)
-
-        # Move and handle collision for all balls
-        balls_to_remove = []
-        for i, ball in enumerate(balls):
-            ball_dx, ball_dy = ball_velocities[i]
-            
-            # Move ball
-            ball.x += ball_dx
-            ball.y += ball_dy
-
-            # Collision with walls
-            if ball.left <= 0 or ball.right >= WIDTH:
-                # Reverse x direction with slight randomization
-                new_dx, new_dy = apply_bounce_randomness(-ball_dx, ball_dy)
-                ball_velocities[i] = (new_dx, new_dy)
-                
-                # Add collision particles
-                for _ in range(5):
-                    particles.append(create_particle(ball.centerx, ball.centery, BALL_COLOR, 
-                                                   speed=random.uniform(1, 2), life=15))
-                    
-            if ball.top <= 0:
-                # Reverse y direction with slight randomization
-                new_dx, new_dy = apply_bounce_randomness(ball_dx, -ball_dy)
-                ball_velocities[i] = (new_dx, new_dy)
-                
-                # Add collision particles
-                for _ in range(5):
-                    particles.append(create_particle(ball.centerx, ball.centery, BALL_COLOR, 
-                                                   speed=random.uniform(1, 2), life=15))
-                    
-            if ball.bottom >= HEIGHT:
-                # Ball missed the paddle - remove this ball
-                balls_to_remove.append(i)
-                # Add explosion effect
-                for _ in range(10):
-                    particles.append(create_particle(ball.centerx, ball.centery, RED, 
-                                                   speed=random.uniform(2, 3), life=20))
-                continue  # Skip rest of processing for this ball
-
-            # Collision with paddle
-            if ball.colliderect(paddle) and collision_cooldown == 0:
-                # Ensure the ball is above the paddle to prevent getting stuck inside
-                if ball.centery < paddle.top:
-                    ball.bottom = paddle.top - 1  # Position ball just above paddle
-                    
-                    # Angle the bounce based on where it hit the paddle
-                    hit_pos = (ball.centerx - paddle.left) / paddle.width
-                    angle = math.pi * (0.25 + 0.5 * hit_pos)  # Between pi/4 and 3pi/4
-                    speed = math.sqrt(ball_dx**2 + ball_dy**2)
-                    ball_velocities[i] = (math.cos(angle) * speed, -math.sin(angle) * speed)
-                    
-                    collision_cooldown = 5  # Set cooldown to prevent multiple collisions
-                    
-                    # Add collision particles
-                    for _ in range(8):
-                        particles.append(create_particle(ball.centerx, ball.centery, PADDLE_COLOR, 
-                                                      speed=random.uniform(1, 2), life=15))
-                        
-                # If ball hits from below or sides (rare case), just reverse direction
-                elif ball.centery > paddle.bottom:
-                    ball.top = paddle.bottom + 1  # Position ball just below paddle
-                    ball_velocities[i] = (ball_dx, abs(ball_dy))  # Ensure ball goes downward
-                    collision_cooldown = 5
-                    
-                # Side collision
-                else:
-                    ball_velocities[i] = (-ball_dx, ball_dy)  # Reverse horizontal direction for side hits
-                    collision_cooldown = 5
-
-            # Collision with bricks
-            hit_index = ball.collidelist(bricks)
-            if hit_index != -1 and collision_cooldown == 0:
-                # Get the brick that was hit
-                hit_brick = bricks[hit_index]
-                
-                # Create particle effect for brick breaking
-                create_brick_particles(hit_brick)
-                
-                # Determine collision direction and respond accordingly
-                # Top or bottom collision
-                if abs(ball.bottom - hit_brick.top) < 10 or abs(ball.top - hit_brick.bottom) < 10:
-                    # Reverse y direction with randomization
-                    new_dx, new_dy = apply_bounce_randomness(ball_dx, -ball_dy)
-                    ball_velocities[i] = (new_dx, new_dy)
-                # Side collision
-                elif abs(ball.right - hit_brick.left) < 10 or abs(ball.left - hit_brick.right) < 10:
-                    # Reverse x direction with randomization
-                    new_dx, new_dy = apply_bounce_randomness(-ball_dx, ball_dy)
-                    ball_velocities[i] = (new_dx, new_dy)
-                # Corner collision or other cases
-                else:
-                    # Default to vertical bounce with randomization
-                    new_dx, new_dy = apply_bounce_randomness(ball_dx, -ball_dy)
-                    ball_velocities[i] = (new_dx, new_dy)
-                
-                # Remove brick and add score
-                del bricks[hit_index]
-                score += 10
-                collision_cooldown = 3  # Add cooldown after brick collision too
-                
-                # Special event trigger - ONLY if no power-up is currently active
-                if not special_active:
-                    new_special = trigger_special_event()
-                    if new_special:
-                        special_active = new_special
-                        special_timer = pygame.time.get_ticks()
-                        multi_ball_spawned = False  # Reset so we can spawn more balls if we get multi-ball again
-                        # Create special effect particles
-                        create_special_effect(hit_brick.centerx, hit_brick.centery, special_active)
-
-        # Remove any balls that went out of bounds (bottom of screen)
-        for i in sorted(balls_to_remove, reverse=True):
-            if i < len(balls):
-                balls.pop(i)
-                ball_velocities.pop(i)
-        
-        # Game over if all balls are lost
-        if not balls:
-            game_over = True
-            # Save score to database
-            update_score(user_id, score)
-            
-        # Update collision cooldown
-        if collision_cooldown > 0:
-            collision_cooldown -= 1
-
-        # Apply special events
-        if special_active:
-            if special_active == "big_paddle":
-                paddle.width = 150
-            elif special_active == "score_boost":
-                score += 5
-            elif special_active == "multi_ball":
-                # Spawn additional balls if not already spawned for this power-up
-                if not multi_ball_spawned:
-                    spawn_multi_balls(balls[0])
-                    multi_ball_spawn_time = pygame.time.get_ticks()
-
-            # Check if power-up has expired
-            current_time = pygame.time.get_ticks()
-            if current_time - special_timer > 5000:
-                special_active = None
-                paddle.width = PADDLE_WIDTH
-                # We don't remove the extra balls when the power-up expires
-                # Just reset the flag so a new multi-ball power-up can spawn more balls
-                multi_ball_spawned = False
-
-        # Win condition
-        if not bricks and not level_cleared:
-            level_cleared = True
-            level += 1
-            refill_timer = pygame.time.get_ticks()
-            new_bricks = create_new_bricks()
-            last_refill_time = pygame.time.get_ticks()
-            
-            # Store original positions to restore later
-            starting_ball_pos = (WIDTH // 2, HEIGHT - 100)
-            starting_paddle_pos = WIDTH // 2 - PADDLE_WIDTH // 2
-            
-            # Freeze ball and paddle position (no movement during transition)
-            balls = [pygame.Rect(starting_ball_pos[0], starting_ball_pos[1], BALL_RADIUS*2, BALL_RADIUS*2)]
-            ball_velocities = [(5, -5)]
-            
-            paddle.x = starting_paddle_pos
-            
-            # Keep track of current power-up state before transition
-            # (Don't reset power-ups just because level is cleared)
-            
-            # Set the level transition message time
-            level_transition_message_time = pygame.time.get_ticks() + 3000  # Show for 3 seconds
-            
-            # Create celebratory particles
-            for _ in range(30):
-                x = random.randint(0, WIDTH)
-                y = random.randint(0, HEIGHT//2)
-                color = random.choice(BRICK_COLORS)
-                speed = random.uniform(1, 3)
-                special_effect_particles.append(create_particle(x, y, color, speed, size=random.uniform(3, 6), life=60))
+        inputs = 0
+        if keys[pygame.K_LEFT]:
+            inputs |= engine.INPUT_LEFT
+        if keys[pygame.K_RIGHT]:
+            inputs |= engine.INPUT_RIGHT
+
+        # Advance the simulation by as many fixed steps as the frame took
+        steps = simulation.advance(frame_time)
+        for i in range(steps):
+            if i == steps - 1:
+                previous = snapshot_positions(state)
+            replay.record(inputs)
+            with profiler.section("physics"):
+                engine.step(state, inputs, simulation.dt)
+            spawn_event_particles(state)
+            
+            # Game over if all balls are lost
+            if state.game_over:
+                game_over = True
+                # Save score to database on the background writer thread
+                replay_saved = submit_game(user_id, state, replay)
+                break
+        tick_particles(state, particle_clock.advance(frame_time))
+
+        # Show level completion message
+        if state.level_cleared and state.time < state.level_message_until:
+            # Semi-transparent message box
+            msg_rect = pygame.Rect(WIDTH//2 - 200, HEIGHT//2 - 50, 400, 100)
+            pygame.draw.rect(screen, (30, 30, 60, 200), msg_rect, border_radius=15)
+            pygame.draw.rect(screen, (60, 200, 100), msg_rect, 2, border_radius=15)
+            
+            # Level completion text
+            draw_text(f"LEVEL {state.level-1} COMPLETED!", WIDTH // 2, HEIGHT // 2 - 20, GREEN, 36)
+            draw_text(f"Level {state.level} starting...", WIDTH // 2, HEIGHT // 2 + 20, WHITE, 28)
+            frame_rects.append(msg_rect)
             
         # Draw game elements
-        draw_paddle(paddle, special_active)
-        # Draw all balls
-        for i, ball in enumerate(balls):
-            ball_dx, ball_dy = ball_velocities[i]
-            draw_ball(ball, ball_dx, ball_dy)
-        draw_bricks(bricks)
-        update_particles()
-
-        # Draw power-up indicator
-        if special_active:
-            draw_special_indicator(special_active, special_timer)
+        with profiler.section("draw"):
+            frame_rects += draw_game(state, bricks=not dirty_rects, previous=previous, alpha=simulation.alpha)
+        with profiler.section("hud"):
+            frame_rects += cheat.draw_cheat_status(screen, small_font)
+            frame_rects += draw_notice()
+        with profiler.section("overlay"):
+            frame_rects += profiler.draw_overlay(screen, fonts.get_font(None, 20))
         
-        pygame.display.flip()
+        with profiler.section("present"):
+            if dirty_rects:
+                renderer.end(frame_rects)
+            else:
+                pygame.display.flip()
+        profiler.end_frame(balls=len(state.balls) + len(state.swarm), bricks=len(state.bricks),
+                           particles=sum(particle_counts().values()))
 
     if not game_over:  # If game ended normally (quit, not game over)
-        update_score(user_id, score)
+        submit_game(user_id, state, replay)
         
     return return_to_menu
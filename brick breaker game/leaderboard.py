@@ -1,36 +1,271 @@
-from Db import get_connection
-import datetime
+from Db import get_connection, init_db, LEADERBOARD_SIZE
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from verify import check_replay
 
-def update_score(user_id, score):
+# Scores are written by a background thread so game over never waits on the
+# disk. submit_score() queues a score and returns at once; the writer saves
+# everything queued so far in one transaction. Scores submitted with a replay
+# are re-simulated first and only saved if the replay ends on that score.
+# The simulation runs in a separate verifier process, so it never competes
+# with the game's render loop for the interpreter.
+WRITE_BATCH_SIZE = 64
+
+log = logging.getLogger(__name__)
+
+_schema_ready = False
+_score_queue = queue.Queue()
+_writer_thread = None
+_writer_lock = threading.Lock()
+_verifier = None  # Started by the writer on the first replay
+_pending = 0
+_idle = threading.Condition()
+write_stats = {"written": 0, "batches": 0, "errors": 0, "rejected": 0,
+               "last_latency_ms": 0.0, "max_latency_ms": 0.0, "total_latency_ms": 0.0}
+
+def ensure_schema():
+    """Make sure the tables exist, once per process"""
+    global _schema_ready
+    if not _schema_ready:
+        init_db()
+        _schema_ready = True
+
+def save_scores(scores):
+    """Save a batch of (user_id, score) or (user_id, score, level) game results in one transaction"""
+    ensure_schema()
     conn = get_connection()
     c = conn.cursor()
+    rows = [(entry[0], entry[1], entry[2] if len(entry) > 2 else None) for entry in scores]
+    scores = [(user_id, score) for user_id, score, _ in rows]
     
-    # First, make sure the game_scores table exists
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS game_scores (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        score INTEGER NOT NULL,
-        date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    )
-    ''')
-    
-    # Update highest score in users table (for backwards compatibility)
-    c.execute("UPDATE users SET score = MAX(score, ?) WHERE id = ?", (score, user_id))
+    with conn:
+        # Update highest score in users table (for backwards compatibility)
+        c.executemany("UPDATE users SET score = MAX(score, ?) WHERE id = ?",
+                      [(score, user_id) for user_id, score in scores])
+        
+        # Add these game sessions to game_scores table
+        c.executemany("INSERT INTO game_scores (user_id, score, level) VALUES (?, ?, ?)", rows)
+        
+        # Keep the materialized leaderboard and running totals in step
+        update_leaderboard(c, scores)
+
+def update_leaderboard(c, scores):
+    """Fold a batch of (user_id, score) results into the leaderboard and totals"""
+    # Players re-enter with their (only ever growing) best score, then the
+    # table is cut back to the top LEADERBOARD_SIZE
+    c.executemany("""
+        INSERT INTO leaderboard (user_id, score)
+        SELECT id, score FROM users WHERE id = ? AND score > 0
+        ON CONFLICT(user_id) DO UPDATE SET score = excluded.score
+    """, [(user_id,) for user_id in {user_id for user_id, _ in scores}])
+    trim_leaderboard(c)
     
-    # Add this game session to game_scores table
-    c.execute("INSERT INTO game_scores (user_id, score) VALUES (?, ?)", (user_id, score))
+    best_user, best_score = max(scores, key=lambda entry: entry[1])
+    c.execute("UPDATE score_totals SET games = games + ?, total = total + ?",
+              (len(scores), sum(score for _, score in scores)))
+    c.execute("""
+        UPDATE score_totals SET best_score = ?, best_user_id = ?
+        WHERE best_score IS NULL OR best_score < ?
+    """, (best_score, best_user, best_score))
+
+def trim_leaderboard(c):
+    c.execute("""
+        DELETE FROM leaderboard WHERE user_id IN
+            (SELECT user_id FROM leaderboard ORDER BY score DESC, user_id LIMIT -1 OFFSET ?)
+    """, (LEADERBOARD_SIZE,))
+
+def remove_player(c, user_id):
+    """Take a player out of the leaderboard and totals.
+
+    Call inside the transaction that deletes the player, before their games
+    are deleted.
+    """
+    c.execute("""
+        UPDATE score_totals SET
+            games = games - (SELECT COUNT(*) FROM game_scores WHERE user_id = ?),
+            total = total - (SELECT IFNULL(SUM(score), 0) FROM game_scores WHERE user_id = ?)
+    """, (user_id, user_id))
+    c.execute("""
+        UPDATE score_totals SET (best_score, best_user_id) =
+            (SELECT score, user_id FROM game_scores WHERE user_id != ? ORDER BY score DESC LIMIT 1)
+        WHERE best_user_id = ?
+    """, (user_id, user_id))
     
-    conn.commit()
-    conn.close()
+    # The next best players move up into the freed place
+    c.execute("DELETE FROM leaderboard WHERE user_id = ?", (user_id,))
+    c.execute("""
+        INSERT OR IGNORE INTO leaderboard (user_id, score)
+        SELECT id, score FROM users WHERE score > 0 AND id != ? ORDER BY score DESC LIMIT ?
+    """, (user_id, LEADERBOARD_SIZE))
+    trim_leaderboard(c)
+
+def update_score(user_id, score):
+    """Save one game result right away, on the calling thread"""
+    save_scores([(user_id, score)])
+
+def submit_score(user_id, score, replay=None, level=None):
+    """Queue a game result for the background writer and return immediately.
+
+    With replay bytes the score is only saved once the replay verifies, and
+    the level saved is the one its simulation reached, not level.
+    """
+    global _pending
+    start_writer()
+    with _idle:
+        _pending += 1
+    _score_queue.put((user_id, score, time.perf_counter(), replay, level))
+
+def is_verified(score, result):
+    """Whether a check_replay() result confirms the submitted score"""
+    ok, simulated, _ = result
+    return ok and simulated == score
+
+def _get_verifier():
+    global _verifier
+    if _verifier is None:
+        _verifier = ProcessPoolExecutor(max_workers=1)
+    return _verifier
+
+def _drop_verifier(wait=False):
+    """Shut down the verifier process; the next batch starts a new one"""
+    global _verifier
+    verifier, _verifier = _verifier, None
+    if verifier is not None:
+        verifier.shutdown(wait=wait)
+
+def _check_replays(replays):
+    """check_replay() results for a batch of replays, None where there is no replay.
+
+    They are checked in the verifier process. If it cannot take them, e.g.
+    it broke or was shut down by concurrent.futures at interpreter exit
+    (before stop_writer() runs), they are checked on this thread instead.
+    """
+    try:
+        verifier = _get_verifier()
+        checks = [verifier.submit(check_replay, replay) if replay is not None else None for replay in replays]
+        return [check.result() if check is not None else None for check in checks]
+    except RuntimeError:  # Shut down, or BrokenProcessPool
+        _drop_verifier()
+    return [check_replay(replay) if replay is not None else None for replay in replays]
+
+def start_writer():
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="score-writer", daemon=True)
+            _writer_thread.start()
+
+def _writer_loop():
+    global _pending
+    while True:
+        item = _score_queue.get()
+        if item is None:
+            return
+
+        # Take whatever else is already waiting, up to one batch
+        batch = [item]
+        stop = False
+        while len(batch) < WRITE_BATCH_SIZE:
+            try:
+                item = _score_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+
+        # A failed batch must not stop the writer, or every later score and
+        # anyone waiting in flush_scores() would hang
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            write_stats["errors"] += 1
+            log.error("Failed to save %d score(s): %s", len(batch), e)
+        finally:
+            with _idle:
+                _pending -= len(batch)
+                if _pending == 0:
+                    _idle.notify_all()
+        if stop:
+            return
+
+def _write_batch(batch):
+    """Verify and save one batch of queued scores"""
+    # Drop scores whose replay does not hold up. The writer only waits on the
+    # verifier process here, it does not simulate anything itself
+    results = _check_replays([entry[3] for entry in batch])
+    verified = []
+    for entry, result in zip(batch, results):
+        user_id, score, submitted, _, level = entry
+        if result is None:
+            verified.append((user_id, score, submitted, level))
+        elif is_verified(score, result):
+            verified.append((user_id, score, submitted, result[2]))  # The simulated level
+        else:
+            write_stats["rejected"] += 1
+            log.warning("Rejected score %d for user %s: replay does not match", score, user_id)
+    if not verified:
+        return
+
+    save_scores([(user_id, score, level) for user_id, score, _, level in verified])
+    now = time.perf_counter()
+    for _, _, submitted, _ in verified:
+        latency = (now - submitted) * 1000
+        write_stats["total_latency_ms"] += latency
+        write_stats["max_latency_ms"] = max(write_stats["max_latency_ms"], latency)
+        write_stats["last_latency_ms"] = latency
+    write_stats["written"] += len(verified)
+    write_stats["batches"] += 1
+
+def flush_scores(timeout=None):
+    """Wait until every submitted score has been written; False on timeout"""
+    with _idle:
+        return _idle.wait_for(lambda: _pending == 0, timeout)
+
+def pending_scores():
+    """Scores submitted but not yet verified and written"""
+    return _pending
+
+def stop_writer():
+    """Write everything still queued and stop the writer thread and verifier process"""
+    global _writer_thread
+    with _writer_lock:
+        thread = _writer_thread
+        _writer_thread = None
+    if thread is not None and thread.is_alive():
+        _score_queue.put(None)
+        thread.join()
+    _drop_verifier(wait=True)
+
+def get_write_stats():
+    """Writer counters plus the average submit-to-commit latency"""
+    stats = dict(write_stats, pending=_pending)
+    stats["avg_latency_ms"] = stats["total_latency_ms"] / stats["written"] if stats["written"] else 0.0
+    return stats
+
+# Never lose a queued score when the game exits
+atexit.register(stop_writer)
 
 def get_top_scores(limit=5):
+    """Best players from the materialized leaderboard (at most LEADERBOARD_SIZE)"""
     conn = get_connection()
     c = conn.cursor()
-    c.execute("SELECT username, score FROM users ORDER BY score DESC LIMIT ?", (limit,))
+    # CROSS JOIN keeps leaderboard as the outer loop: SQLite walks
+    # idx_leaderboard_score for the first rows and looks each user up by id,
+    # instead of scanning every player
+    c.execute("""
+        SELECT u.username, l.score
+        FROM leaderboard l
+        CROSS JOIN users u ON u.id = l.user_id
+        ORDER BY l.score DESC, l.user_id
+        LIMIT ?
+    """, (limit,))
     result = c.fetchall()
-    conn.close()
     return result
 
 def get_player_history(user_id, limit=10):
@@ -45,7 +280,6 @@ def get_player_history(user_id, limit=10):
         LIMIT ?
     """, (user_id, limit))
     result = c.fetchall()
-    conn.close()
     return result
 
 def get_player_stats(user_id):
@@ -53,23 +287,17 @@ def get_player_stats(user_id):
     conn = get_connection()
     c = conn.cursor()
     
-    # Get username
-    c.execute("SELECT username FROM users WHERE id = ?", (user_id,))
-    username = c.fetchone()[0]
-    
-    # Get highest score
-    c.execute("SELECT MAX(score) FROM game_scores WHERE user_id = ?", (user_id,))
-    highest_score = c.fetchone()[0] or 0
-    
-    # Get average score
-    c.execute("SELECT AVG(score) FROM game_scores WHERE user_id = ?", (user_id,))
-    avg_score = c.fetchone()[0] or 0
-    
-    # Get total games played
-    c.execute("SELECT COUNT(*) FROM game_scores WHERE user_id = ?", (user_id,))
-    games_played = c.fetchone()[0] or 0
+    # Username, highest, average and games played in one pass over the
+    # player's entries in idx_game_scores_user_date
+    c.execute("""
+        SELECT u.username, MAX(g.score), AVG(g.score), COUNT(g.score)
+        FROM users u
+        LEFT JOIN game_scores g ON g.user_id = u.id
+        WHERE u.id = ?
+    """, (user_id,))
+    username, highest_score, avg_score, games_played = c.fetchone()
     
-    # Get score progression (last 5 games)
+    # Get score progression (last 5 games), read backwards from the same index
     c.execute("""
         SELECT score FROM game_scores 
         WHERE user_id = ? 
@@ -78,13 +306,11 @@ def get_player_stats(user_id):
     """, (user_id,))
     recent_scores = [row[0] for row in c.fetchall()]
     
-    conn.close()
-    
     return {
         "username": username,
-        "highest_score": highest_score,
-        "average_score": round(avg_score, 1),
-        "games_played": games_played,
+        "highest_score": highest_score or 0,
+        "average_score": round(avg_score or 0, 1),
+        "games_played": games_played or 0,
         "recent_scores": recent_scores
     }
 
@@ -93,32 +319,18 @@ def get_global_stats():
     conn = get_connection()
     c = conn.cursor()
     
-    # Get highest score ever
+    # Running totals kept by save_scores(), a single row
     c.execute("""
-        SELECT u.username, MAX(g.score) as max_score
-        FROM game_scores g
-        JOIN users u ON g.user_id = u.id
-        GROUP BY g.user_id
-        ORDER BY max_score DESC
-        LIMIT 1
+        SELECT u.username, t.best_score, t.total, t.games
+        FROM score_totals t
+        LEFT JOIN users u ON u.id = t.best_user_id
     """)
-    highest_result = c.fetchone()
-    highest_player = highest_result[0] if highest_result else "None"
-    highest_score = highest_result[1] if highest_result else 0
-    
-    # Get average score across all games
-    c.execute("SELECT AVG(score) FROM game_scores")
-    avg_score = c.fetchone()[0] or 0
-    
-    # Get total games played
-    c.execute("SELECT COUNT(*) FROM game_scores")
-    total_games = c.fetchone()[0] or 0
-    
-    conn.close()
+    highest_player, highest_score, score_sum, total_games = c.fetchone()
+    avg_score = score_sum / total_games if total_games else 0
     
     return {
-        "highest_player": highest_player,
-        "highest_score": highest_score,
-        "average_score": round(avg_score, 1),
-        "total_games": total_games
+        "highest_player": highest_player or "None",
+        "highest_score": highest_score or 0,
+        "average_score": round(avg_score or 0, 1),
+        "total_games": total_games or 0
     }
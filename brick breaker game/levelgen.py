@@ -0,0 +1,129 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from levels import Level
+
+# Procedural levels. Once the hand-made level files (levels.LEVEL_SEQUENCE)
+# have been played, every further level is generated from the game seed and
+# the level number, so a replay regenerates exactly the same walls.
+#
+# Each level picks a pattern, then scales with the level number: more rows
+# and columns, fewer holes, more multi-hit bricks with more hit points, and
+# the odd brick that always drops a power-up.
+#
+# Generating a big board and building its bricks takes a while, so the game
+# asks a LevelPrefetcher for its levels: while level N is played, level N + 1
+# is already being generated on a background thread.
+
+# Playfield area the bricks are laid out in
+LEFT, TOP = 35, 40
+AREA_WIDTH, AREA_HEIGHT = 730, 260
+MAX_GAP = 5
+
+PATTERNS = ("full", "checker", "pyramid", "diamond", "stripes", "columns", "frame", "noise")
+COLORS = 5  # Size of the game's brick palette
+DROPS = ("multi_ball", "big_paddle", "score_boost")
+
+def board_size(number):
+    """(cols, rows) of generated level number, growing every few levels"""
+    return min(100, 10 + (number - 2) // 4 * 2), min(100, 5 + number // 3)
+
+def pattern_mask(pattern, cols, rows, rng):
+    """Which cells of a cols x rows board hold a brick, row by row"""
+    mid_col, mid_row = (cols - 1) / 2, (rows - 1) / 2
+    if pattern == "checker":
+        return [(row + col) % 2 == 0 for row in range(rows) for col in range(cols)]
+    if pattern == "pyramid":
+        return [abs(col - mid_col) <= (row + 1) * cols / (2 * rows) for row in range(rows) for col in range(cols)]
+    if pattern == "diamond":
+        return [abs(col - mid_col) / max(mid_col, 1) + abs(row - mid_row) / max(mid_row, 1) <= 1
+                for row in range(rows) for col in range(cols)]
+    if pattern == "stripes":
+        return [row % 3 != 2 for row in range(rows) for col in range(cols)]
+    if pattern == "columns":
+        return [col % 3 != 2 for row in range(rows) for col in range(cols)]
+    if pattern == "frame":
+        return [row in (0, rows - 1) or col in (0, cols - 1) or (row % 2 == 0 and col % 2 == 0)
+                for row in range(rows) for col in range(cols)]
+    if pattern == "noise":
+        return [rng.random() < 0.7 for _ in range(rows * cols)]
+    return [True] * (rows * cols)
+
+def generate_level(seed, number, cols=None, rows=None):
+    """The generated Level for level number of the game with seed"""
+    rng = random.Random(f"level:{seed}:{number}")
+    default_cols, default_rows = board_size(number)
+    cols, rows = cols or default_cols, rows or default_rows
+    pattern = rng.choice(PATTERNS)
+
+    # Difficulty grows with the level number
+    density = min(0.98, 0.75 + 0.02 * number)       # Chance a pattern cell is kept
+    multi_hit = min(0.5, 0.04 * number)             # Chance a brick takes several hits
+    max_hp = min(5, 2 + number // 4)
+    drop_chance = 0.02
+
+    cell_width = AREA_WIDTH // cols
+    cell_height = max(2, min(30, AREA_HEIGHT // rows))
+    gap_x = min(MAX_GAP, max(1, cell_width // 15))
+    gap_y = min(MAX_GAP, max(1, cell_height // 6))
+
+    types = []
+    type_index = {}
+    cells = bytearray(cols * rows)
+    random_value = rng.random
+    for i, keep in enumerate(pattern_mask(pattern, cols, rows, rng)):
+        if not keep or random_value() >= density:
+            continue
+        row = i // cols
+        color = row * COLORS // rows if rows > COLORS else row % COLORS
+        hp = rng.randint(2, max_hp) if random_value() < multi_hit else 1
+        drop = rng.choice(DROPS) if random_value() < drop_chance else None
+        kind = (color, hp, drop)
+        index = type_index.get(kind)
+        if index is None:
+            types.append(kind)
+            index = type_index[kind] = len(types)
+        cells[i] = index
+
+    # Center the board horizontally
+    left = LEFT + (AREA_WIDTH - cols * cell_width) // 2
+    return Level(f"Level {number} ({pattern})", cols, rows, (left, TOP), (cell_width, cell_height),
+                 (cell_width - gap_x, cell_height - gap_y), types, bytes(cells))
+
+class LevelPrefetcher:
+    """Level source for engine.GameState that builds the next level in the background.
+
+    Call it like engine.level_layout(seed, number). Each call returns that
+    level (generated ahead of time if it was prefetched) and starts on the
+    next one.
+    """
+
+    def __init__(self, build):
+        self.build = build  # build(seed, number) -> levels.Level, e.g. engine.level_layout
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="levelgen")
+        self.pending = {}   # (seed, number) -> Future
+        self.lock = threading.Lock()
+        self.stats = {"ready": 0, "waited": 0, "missed": 0}
+
+    def prefetch(self, seed, number):
+        """Start building a level, dropping any prefetched for other games"""
+        with self.lock:
+            for key in [key for key in self.pending if key[0] != seed]:
+                self.pending.pop(key).cancel()
+            if (seed, number) not in self.pending:
+                self.pending[(seed, number)] = self.executor.submit(self.build, seed, number)
+
+    def __call__(self, seed, number):
+        with self.lock:
+            future = self.pending.pop((seed, number), None)
+        if future is None:
+            self.stats["missed"] += 1
+            level = self.build(seed, number)
+        else:
+            self.stats["ready" if future.done() else "waited"] += 1
+            level = future.result()
+        self.prefetch(seed, number + 1)
+        return level
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import struct
+
+# Brick layouts live in level files (levels/*.lvl) instead of code:
+#
+#     # comment
+#     name = Classic
+#     origin = 35 35        top-left corner of the grid, in pixels
+#     cell = 75 30          grid spacing (brick size plus the gap)
+#     brick = 70 25         brick size
+#
+#     [types]
+#     # char = color hp [drop]
+#     r = 0 1
+#     S = 4 3 multi_ball    three hits, always drops multi-ball
+#
+#     [grid]
+#     rrrrrrrrrr
+#     ..SSSSSS..            '.' is an empty cell
+#
+# color indexes the game's brick palette, hp is the number of hits a brick
+# takes and drop is a power-up it always releases when destroyed.
+#
+# A level file is parsed once, then compiled to a small binary (header, type
+# table and one byte per cell) cached under levels/.cache by the hash of the
+# file. Later runs load the binary instead of parsing, and loaded levels stay
+# in memory, so switching level is a dictionary lookup.
+
+LEVEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+CACHE_DIR = os.path.join(LEVEL_DIR, ".cache")
+
+# Hand-made levels, played first; the levels after them are generated (see
+# levelgen.py). level_for(N) plays LEVEL_SEQUENCE[(N - 1) % len].
+LEVEL_SEQUENCE = ("classic",)
+
+DROPS = (None, "multi_ball", "big_paddle", "score_boost")
+
+MAGIC = b"BBLV"
+FORMAT_VERSION = 1
+# magic, version, cols, rows, origin x/y, cell w/h, brick w/h, type count, name length
+HEADER = struct.Struct("<4sBHHHHHHHHBB")
+TYPE = struct.Struct("<BBB")  # color, hp, drop index
+
+class Level:
+    """A compiled level: layout geometry, brick types and one type byte per cell"""
+
+    def __init__(self, name, cols, rows, origin, cell, brick, types, cells):
+        self.name = name
+        self.cols = cols
+        self.rows = rows
+        self.origin = origin   # (x, y)
+        self.cell = cell       # (width, height) of a grid cell
+        self.brick = brick     # (width, height) of a brick
+        self.types = types     # [(color, hp, drop)], cells hold index + 1
+        self.cells = cells     # bytes, row by row, 0 for empty
+
+    def __len__(self):
+        return self.cols * self.rows - self.cells.count(0)
+
+    def to_bytes(self):
+        name = self.name.encode()[:255]
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, self.cols, self.rows, *self.origin, *self.cell,
+                             *self.brick, len(self.types), len(name))
+        types = b"".join(TYPE.pack(color, hp, DROPS.index(drop)) for color, hp, drop in self.types)
+        return header + name + types + bytes(self.cells)
+
+    @classmethod
+    def from_bytes(cls, data):
+        (magic, version, cols, rows, origin_x, origin_y, cell_width, cell_height,
+         brick_width, brick_height, type_count, name_length) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("not a compiled level of this version")
+        offset = HEADER.size
+        name = data[offset:offset + name_length].decode()
+        offset += name_length
+        types = []
+        for _ in range(type_count):
+            color, hp, drop = TYPE.unpack_from(data, offset)
+            types.append((color, hp, DROPS[drop]))
+            offset += TYPE.size
+        cells = bytes(data[offset:offset + cols * rows])
+        if len(cells) != cols * rows:
+            raise ValueError("compiled level is truncated")
+        return cls(name, cols, rows, (origin_x, origin_y), (cell_width, cell_height),
+                   (brick_width, brick_height), types, cells)
+
+def parse_level(text, source="<level>"):
+    """Compile level file text into a Level"""
+    settings = {}
+    types = {}
+    grid = []
+    section = None
+    for number, line in enumerate(text.splitlines(), start=1):
+        stripped = line.strip()
+        if section != "grid" and (not stripped or stripped.startswith("#")):
+            continue
+        if stripped.startswith("[") and stripped.endswith("]"):
+            section = stripped[1:-1].strip()
+            continue
+        if section == "grid":
+            if stripped and not stripped.startswith("#"):
+                grid.append(line.rstrip())
+            continue
+        key, sep, value = (part.strip() for part in line.partition("="))
+        if not sep:
+            raise ValueError(f"{source}:{number}: expected 'key = value'")
+        if section is None:
+            settings[key] = value
+        elif section == "types":
+            fields = value.split()
+            if len(key) != 1 or key in ". " or len(fields) not in (2, 3):
+                raise ValueError(f"{source}:{number}: expected 'char = color hp [drop]'")
+            drop = fields[2] if len(fields) == 3 else None
+            if drop not in DROPS:
+                raise ValueError(f"{source}:{number}: unknown drop {drop!r}")
+            types[key] = (int(fields[0]), int(fields[1]), drop)
+        else:
+            raise ValueError(f"{source}:{number}: unknown section [{section}]")
+
+    def pair(key):
+        try:
+            x, y = (int(v) for v in settings[key].split())
+        except (KeyError, ValueError):
+            raise ValueError(f"{source}: '{key}' must be two integers")
+        return x, y
+
+    chars = list(types)
+    cols = max((len(line) for line in grid), default=0)
+    cells = bytearray(cols * len(grid))
+    for row, line in enumerate(grid):
+        for col, char in enumerate(line):
+            if char in ". ":  # Spaces are empty too, e.g. short rows
+                continue
+            if char not in types:
+                raise ValueError(f"{source}: grid row {row + 1} uses undefined brick type {char!r}")
+            cells[row * cols + col] = chars.index(char) + 1
+    return Level(settings.get("name", source), cols, len(grid), pair("origin"), pair("cell"),
+                 pair("brick"), [types[char] for char in chars], bytes(cells))
+
+_loaded = {}  # Path -> Level
+
+def load_level(name, reload=False):
+    """The compiled Level of levels/<name>.lvl (or a path), compiling it if needed.
+
+    Each file is read once per process; reload=True picks up edits.
+    """
+    path = name if os.path.sep in name or name.endswith(".lvl") else os.path.join(LEVEL_DIR, name + ".lvl")
+    level = _loaded.get(path)
+    if level is not None and not reload:
+        return level
+
+    with open(path, "rb") as f:
+        source = f.read()
+    key = hashlib.sha1(bytes([FORMAT_VERSION]) + source).hexdigest()
+
+    cache_path = os.path.join(CACHE_DIR, key + ".bin")
+    try:
+        with open(cache_path, "rb") as f:
+            level = Level.from_bytes(f.read())
+    except (OSError, ValueError, struct.error):
+        level = parse_level(source.decode(), path)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_path, "wb") as f:
+                f.write(level.to_bytes())
+        except OSError:
+            pass  # A read-only install just compiles every run
+    _loaded[path] = level
+    return level
+
+def level_for(number):
+    """The Level played as level number (1 for the first)"""
+    return load_level(LEVEL_SEQUENCE[(number - 1) % len(LEVEL_SEQUENCE)])
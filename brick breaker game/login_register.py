@@ -3,6 +3,9 @@ import hashlib
 import sqlite3
 import random
 import math 
+from Db import get_connection
+import background
+import fonts
 
 # Colors - Subtle, elegant color palette
 WHITE = (255, 255, 255)
@@ -23,16 +26,10 @@ LOGIN = 1
 REGISTER = 2
 MENU = 0
 
-# Initialize fonts
-try:
-    font_small = pygame.font.Font("freesansbold.ttf", 20)
-    font_medium = pygame.font.Font("freesansbold.ttf", 28)
-    font_large = pygame.font.Font("freesansbold.ttf", 36)
-except:
-    # Fallback to default font
-    font_small = pygame.font.Font(None, 24)
-    font_medium = pygame.font.Font(None, 32)
-    font_large = pygame.font.Font(None, 40)
+# Initialize fonts (the shared registry falls back to the default font)
+font_small = fonts.get_font("freesansbold.ttf", 20)
+font_medium = fonts.get_font("freesansbold.ttf", 28)
+font_large = fonts.get_font("freesansbold.ttf", 36)
 
 # Input boxes
 WIDTH, HEIGHT = 800, 600
@@ -84,7 +81,7 @@ def create_eye_icon(show_password=False):
     return icon
 
 def draw_text(screen, text, font, color, x, y, centered=True):
-    text_surface = font.render(text, True, color)
+    text_surface = fonts.render(text, font, color)
     if centered:
         text_rect = text_surface.get_rect(center=(x, y))
     else:
@@ -115,12 +112,11 @@ def register_user(username, password):
         return False, "Username and password cannot be empty"
     
     try:
-        conn = sqlite3.connect('game.db')
+        conn = get_connection()
         c = conn.cursor()
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", 
-                 (username, hash_password(password)))
-        conn.commit()
-        conn.close()
+        with conn:
+            c.execute("INSERT INTO users (username, password) VALUES (?, ?)", 
+                     (username, hash_password(password)))
         return True, "Registration successful!"
     except sqlite3.IntegrityError:
         return False, "Username already exists"
@@ -129,12 +125,11 @@ def login_user(username, password):
     if not username or not password:
         return None, "Username and password cannot be empty"
     
-    conn = sqlite3.connect('game.db')
+    conn = get_connection()
     c = conn.cursor()
     c.execute("SELECT id FROM users WHERE username=? AND password=?", 
              (username, hash_password(password)))
     user = c.fetchone()
-    conn.close()
     
     if user:
         return user[0], "Login successful!"
@@ -142,23 +137,17 @@ def login_user(username, password):
         return None, "Invalid username or password"
 
 def draw_background(screen):
-    # Simple gradient background
-    for y in range(HEIGHT):
-        r = int(10 + (30 - 10) * (1 - y / HEIGHT))
-        g = int(20 + (50 - 20) * (1 - y / HEIGHT))
-        b = int(40 + (80 - 40) * (1 - y / HEIGHT))
-        pygame.draw.line(screen, (r, g, b), (0, y), (WIDTH, y))
-    
-    # Draw and update existing particles
+    # Simple gradient background, baked once into a cached surface
+    background.draw_gradient(screen, "login")
+    
+    # Draw existing particles in one batch
+    background.draw_stars(screen, [
+        (particle['x'], particle['y'], particle['size'], particle['brightness'])
+        for particle in particles
+    ])
+    
+    # Update existing particles
     for particle in particles:
-        # Draw the particle
-        pygame.draw.circle(
-            screen, 
-            (particle['brightness'], particle['brightness'], particle['brightness']), 
-            (int(particle['x']), int(particle['y'])), 
-            particle['size']
-        )
-        
         # Move the particle very slowly (10x slower)
         particle['y'] += particle['speed']
         
@@ -181,10 +170,10 @@ def draw_input_field(screen, rect, text, active, placeholder="", is_password=Fal
     
     # Draw text or placeholder
     if display_text:
-        text_surface = font_small.render(display_text, True, BLACK)
+        text_surface = fonts.render(display_text, font_small, BLACK)
         screen.blit(text_surface, (rect.x + 10, rect.y + (rect.height - text_surface.get_height()) // 2))
     elif not active:
-        placeholder_surface = font_small.render(placeholder, True, GRAY)
+        placeholder_surface = fonts.render(placeholder, font_small, GRAY)
         screen.blit(placeholder_surface, (rect.x + 10, rect.y + (rect.height - placeholder_surface.get_height()) // 2))
     
     # Draw cursor if field is active
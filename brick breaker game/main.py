@@ -1,17 +1,14 @@
 import pygame
 import sys
-import sqlite3
+import logging
 import game
+import Db
+import leaderboard
 from login_register import handle_login_screen, handle_register_screen, LOGIN, REGISTER, MENU
 from dashboard import show_dashboard
 
-# Initialize Pygame
-pygame.init()
-
 # Screen setup
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Break-Breaker Pro")
 
 # Colors
 WHITE = (255, 255, 255)
@@ -23,40 +20,18 @@ PURPLE = (128, 0, 128)
 LIGHT_BLUE = (173, 216, 230)
 GRAY = (100, 100, 100)
 
-# Database setup
-def init_db():
-    conn = sqlite3.connect('breakbreaker.db')
-    c = conn.cursor()
-    
-    # Users table
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  username TEXT UNIQUE,
-                  password TEXT)''')
-    
-    # Scores table
-    c.execute('''CREATE TABLE IF NOT EXISTS scores
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER,
-                  score INTEGER,
-                  date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY(user_id) REFERENCES users(id))''')
-    
-    # Game scores table for tracking player progress
-    c.execute('''CREATE TABLE IF NOT EXISTS game_scores
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER NOT NULL,
-                  score INTEGER NOT NULL,
-                  date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY(user_id) REFERENCES users(id))''')
-    
-    conn.commit()
-    conn.close()
+def main():
+    # Show what the game modules log (score writer, replays, profiler)
+    logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
 
-# Initialize database
-init_db()
+    # Initialize Pygame and the database (game.db, shared by every screen
+    # through Db) here rather than on import, so the replay verifier process,
+    # which may re-import this module, does not open a second window
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Break-Breaker Pro")
+    Db.init_db()
 
-def main():
     # Initialize variables
     current_state = LOGIN  # Start with login screen
     active_input = None
@@ -129,7 +104,9 @@ def main():
         # Update display
         pygame.display.flip()
     
-    # Quit pygame
+    # Save any queued scores, close database connections and quit pygame
+    leaderboard.stop_writer()
+    Db.close_all()
     pygame.quit()
     sys.exit()
 
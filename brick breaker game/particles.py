@@ -0,0 +1,86 @@
+import math
+import random
+from array import array
+from itertools import repeat
+from operator import add, sub, mul
+
+# Structure-of-arrays particle pools. Each pool keeps its live particles packed
+# in the first `count` slots of fixed-size arrays, updates them with whole-slice
+# operations and removes dead particles by swapping the last live one into
+# their slot, so a frame costs O(live particles) no matter how many die.
+
+class ParticlePool:
+    """Fixed-capacity pool of particles sharing the same motion rules"""
+
+    def __init__(self, capacity, gravity=0.0, shrink=1.0, rng=random):
+        self.capacity = capacity
+        self.rng = rng          # Source of random directions
+        self.gravity = gravity  # Added to speed_y every frame
+        self.shrink = shrink    # Size multiplier applied every frame
+        self.count = 0
+        self.dropped = 0        # Emits refused because the pool was full
+
+        self.x = array('d', bytes(8 * capacity))
+        self.y = array('d', bytes(8 * capacity))
+        self.speed_x = array('d', bytes(8 * capacity))
+        self.speed_y = array('d', bytes(8 * capacity))
+        self.size = array('d', bytes(8 * capacity))
+        self.life = array('d', bytes(8 * capacity))
+        self.color = [None] * capacity
+
+    def emit(self, x, y, color, speed=1, size=3, life=30, angle=None):
+        """Add one particle flying off in a random (or given) direction"""
+        i = self.count
+        if i >= self.capacity:
+            self.dropped += 1
+            return False
+        if angle is None:
+            angle = self.rng.uniform(0, math.pi * 2)
+        self.x[i] = x
+        self.y[i] = y
+        self.speed_x[i] = math.cos(angle) * speed
+        self.speed_y[i] = math.sin(angle) * speed
+        self.size[i] = size
+        self.life[i] = life
+        self.color[i] = color
+        self.count = i + 1
+        return True
+
+    def update(self):
+        """Advance every live particle by one frame and drop the dead ones"""
+        n = self.count
+        if n == 0:
+            return
+
+        # Batched updates over the live slice
+        life = self.life
+        life[:n] = array('d', map(sub, life[:n], repeat(1.0, n)))
+        self.x[:n] = array('d', map(add, self.x[:n], self.speed_x[:n]))
+        self.y[:n] = array('d', map(add, self.y[:n], self.speed_y[:n]))
+        if self.gravity:
+            self.speed_y[:n] = array('d', map(add, self.speed_y[:n], repeat(self.gravity, n)))
+        if self.shrink != 1.0:
+            self.size[:n] = array('d', map(mul, self.size[:n], repeat(self.shrink, n)))
+
+        # Swap-remove dead particles, highest index first so every slot we
+        # fill from the end of the live range holds a live particle
+        dead = [i for i in range(n) if life[i] <= 0]
+        for i in reversed(dead):
+            n -= 1
+            if i != n:
+                self.x[i] = self.x[n]
+                self.y[i] = self.y[n]
+                self.speed_x[i] = self.speed_x[n]
+                self.speed_y[i] = self.speed_y[n]
+                self.size[i] = self.size[n]
+                life[i] = life[n]
+                self.color[i] = self.color[n]
+            self.color[n] = None
+        self.count = n
+
+    def clear(self):
+        self.count = 0
+        self.color = [None] * self.capacity
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,108 @@
+import heapq
+
+# Power-ups. A destroyed brick can release a capsule, which falls toward the
+# paddle; catching it starts that power-up's effect. Any number of effects can
+# run at once, each with its own expiry time, and catching one that is
+# already running stacks another full duration on top of what is left.
+#
+# What an effect does lives in handlers registered with register_effect():
+# start(state) when a capsule is caught, tick(state, dt) every simulation step
+# while it runs and end(state) when it runs out. The engine registers the
+# built-in ones; adding a power-up is one more registration plus a drop name.
+#
+# Running effects are kept in a dict (name -> start and expiry) for the
+# per-step ticks, so a step costs O(active effects), and their expiry times in
+# a heap, so finding and ending the ones that ran out is O(log n) each
+# instead of a scan. Stacking pushes the new expiry and leaves the old heap
+# entry behind; it is skipped when it comes up.
+
+EFFECT_DURATION = 5.0  # Seconds of simulation time
+
+# Capsules, positioned by their center
+CAPSULE_WIDTH, CAPSULE_HEIGHT = 30, 14
+CAPSULE_SPEED = 150  # Pixels per second
+
+class Effect:
+    """Handlers and duration of one kind of power-up"""
+    __slots__ = ("name", "duration", "start", "tick", "end")
+
+    def __init__(self, name, duration, start, tick, end):
+        self.name = name
+        self.duration = duration
+        self.start = start
+        self.tick = tick
+        self.end = end
+
+EFFECTS = {}  # Name -> Effect
+
+def register_effect(name, start=None, tick=None, end=None, duration=EFFECT_DURATION):
+    """Define what the power-up called name does; any handler may be left out"""
+    EFFECTS[name] = Effect(name, duration, start, tick, end)
+
+class Capsule:
+    """A falling power-up capsule"""
+    __slots__ = ("x", "y", "kind")
+
+    def __init__(self, x, y, kind):
+        self.x = x
+        self.y = y
+        self.kind = kind
+
+class PowerUps:
+    """Falling capsules and running effects of one game"""
+
+    def __init__(self):
+        self.capsules = []
+        self.active = {}  # Name -> (started, expires), in the order they started
+        self.expiry = []  # Heap of (expires, name)
+
+    def release(self, x, y, kind):
+        """Drop a capsule from (x, y)"""
+        self.capsules.append(Capsule(x, y, kind))
+
+    def activate(self, state, name):
+        """Start an effect, or stack another duration onto it if it is running"""
+        effect = EFFECTS[name]
+        started, expires = self.active.get(name, (state.time, state.time))
+        expires = max(expires, state.time) + effect.duration
+        self.active[name] = (started, expires)
+        heapq.heappush(self.expiry, (expires, name))
+        if effect.start:
+            effect.start(state)
+
+    def tick(self, state, dt):
+        """Run the tick handlers of every active effect for the step that just ended at state.time.
+
+        Each handler gets only the part of dt its effect was running for, so
+        an effect lasts exactly its duration whatever the step length.
+        """
+        now = state.time
+        for name, (started, expires) in self.active.items():
+            tick = EFFECTS[name].tick
+            if tick:
+                tick(state, max(0.0, min(now, expires) - max(now - dt, started)))
+
+    def expire(self, state):
+        """End every effect whose time ran out, returning their names"""
+        ended = []
+        expiry = self.expiry
+        while expiry and expiry[0][0] <= state.time:
+            expires, name = heapq.heappop(expiry)
+            entry = self.active.get(name)
+            if entry is None or entry[1] != expires:
+                continue  # Left behind by a stacked effect
+            del self.active[name]
+            end = EFFECTS[name].end
+            if end:
+                end(state)
+            ended.append(name)
+        return ended
+
+    def remaining(self, name, now):
+        """(seconds left, fraction of the whole run left) of an active effect"""
+        started, expires = self.active[name]
+        left = max(0.0, expires - now)
+        return left, left / (expires - started)
+
+    def __contains__(self, name):
+        return name in self.active
@@ -0,0 +1,261 @@
+import json
+import logging
+import os
+import time
+from collections import deque
+from functools import wraps
+
+# Frame profiler. The game loop marks each frame with begin_frame() and
+# end_frame(), and wraps its subsystems in sections:
+#
+#     with profiler.section("physics"):
+#         engine.step(state, inputs, dt)
+#
+# Section times are exclusive: a section nested inside another is only counted
+# once, under its own name. Sections cost nothing while neither the overlay
+# nor a trace is running.
+#
+# F10 toggles the in-game overlay (timings, counts and a frame time graph).
+# F11 starts and stops a trace; stopping writes it to TRACE_DIR in the Chrome
+# trace event format, which chrome://tracing and ui.perfetto.dev open.
+
+# Frames kept for the overlay averages and graph
+HISTORY = 120
+# The overlay is repainted this often, in frames, so it stays readable
+OVERLAY_REFRESH = 15
+# Longest trace, in frames, before it is written out on its own (one minute)
+MAX_TRACE_FRAMES = 60 * 60
+TRACE_DIR = "traces"
+# Frame time graph scale: the 60 FPS budget line sits halfway up
+BUDGET_MS = 1000 / 60
+
+log = logging.getLogger(__name__)
+
+overlay_enabled = False
+tracing = False
+history = deque(maxlen=HISTORY)
+status = {}  # Settings shown at the bottom of the overlay, name -> value
+
+_stack = []          # [name, start, time spent in child sections] per open section
+_sections = {}       # Exclusive seconds per section in the current frame
+_frame_start = None
+_trace = []          # Chrome trace events of the running trace
+_trace_frames = 0
+_trace_origin = 0.0
+_sections_cache = {}
+_overlay_surface = None
+_overlay_age = OVERLAY_REFRESH
+
+def is_active():
+    """True while anything is collecting timings"""
+    return overlay_enabled or tracing
+
+class _Section:
+    """Times the code inside a with block under a section name"""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        _stack.append([self.name, time.perf_counter(), 0.0])
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        name, start, children = _stack.pop()
+        duration = end - start
+        _sections[name] = _sections.get(name, 0.0) + duration - children
+        if _stack:
+            _stack[-1][2] += duration
+        if tracing:
+            _trace.append({"name": name, "ph": "X", "pid": 0, "tid": 0,
+                           "ts": (start - _trace_origin) * 1e6, "dur": duration * 1e6})
+
+class _NoSection:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+_NO_SECTION = _NoSection()
+
+def section(name):
+    """Context manager timing its block as section name"""
+    if not (overlay_enabled or tracing):
+        return _NO_SECTION
+    timer = _sections_cache.get(name)
+    if timer is None:
+        timer = _sections_cache[name] = _Section(name)
+    return timer
+
+def timed(name):
+    """Decorator timing every call of a function as section name"""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with section(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def begin_frame():
+    """Start timing a frame; sections until end_frame() belong to it"""
+    global _frame_start
+    _sections.clear()
+    _stack.clear()
+    _frame_start = time.perf_counter() if (overlay_enabled or tracing) else None
+
+def end_frame(**counts):
+    """Finish the frame, recording its timings and counts (balls=3, bricks=40, ...)"""
+    global _frame_start, _trace_frames
+    if _frame_start is None:
+        return
+    end = time.perf_counter()
+    frame = {
+        "start": _frame_start,
+        "ms": (end - _frame_start) * 1000,
+        "sections": {name: seconds * 1000 for name, seconds in _sections.items()},
+        "counts": counts,
+    }
+    history.append(frame)
+    if tracing:
+        _trace.append({"name": "frame", "ph": "X", "pid": 0, "tid": 0,
+                       "ts": (_frame_start - _trace_origin) * 1e6, "dur": (end - _frame_start) * 1e6})
+        if counts:
+            _trace.append({"name": "counts", "ph": "C", "pid": 0, "tid": 0,
+                           "ts": (end - _trace_origin) * 1e6, "args": counts})
+        _trace_frames += 1
+        if _trace_frames >= MAX_TRACE_FRAMES:
+            stop_trace()
+    _frame_start = None
+
+def fps():
+    """Frames per second over the recorded history"""
+    if len(history) < 2:
+        return 0.0
+    elapsed = history[-1]["start"] - history[0]["start"]
+    return (len(history) - 1) / elapsed if elapsed > 0 else 0.0
+
+def summary():
+    """Mean and max frame time, mean time per section and the latest counts"""
+    if not history:
+        return None
+    frames = len(history)
+    totals = {}
+    for frame in history:
+        for name, ms in frame["sections"].items():
+            totals[name] = totals.get(name, 0.0) + ms
+    return {
+        "fps": fps(),
+        "frame_ms": sum(frame["ms"] for frame in history) / frames,
+        "max_frame_ms": max(frame["ms"] for frame in history),
+        "sections": {name: ms / frames for name, ms in sorted(totals.items(), key=lambda item: -item[1])},
+        "counts": history[-1]["counts"],
+    }
+
+def toggle_overlay():
+    global overlay_enabled, _overlay_age
+    overlay_enabled = not overlay_enabled
+    history.clear()
+    _overlay_age = OVERLAY_REFRESH
+    log.info("Profiling overlay %s", "on" if overlay_enabled else "off")
+
+def set_status(name, value):
+    """Show a setting in the overlay, e.g. set_status("render", "dirty rects")"""
+    global _overlay_age
+    status[name] = value
+    _overlay_age = OVERLAY_REFRESH  # Repaint now, not up to OVERLAY_REFRESH frames later
+
+def start_trace():
+    global tracing, _trace_frames, _trace_origin
+    _trace.clear()
+    _trace_frames = 0
+    _trace_origin = time.perf_counter()
+    tracing = True
+    log.info("Profiling trace started")
+
+def stop_trace(path=None):
+    """Stop the running trace and write it out, returning the file path"""
+    global tracing
+    tracing = False
+    if path is None:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        path = os.path.join(TRACE_DIR, time.strftime("trace_%Y%m%d_%H%M%S.json"))
+    with open(path, "w") as f:
+        json.dump({"traceEvents": _trace, "displayTimeUnit": "ms"}, f)
+    log.info("Profiling trace of %d frames written to %s", _trace_frames, path)
+    _trace.clear()
+    return path
+
+def toggle_trace():
+    if tracing:
+        return stop_trace()
+    start_trace()
+
+def handle_profiler_keys(event):
+    """F10 toggles the overlay, F11 starts/stops a trace"""
+    import pygame
+    if event.type != pygame.KEYDOWN:
+        return
+    if event.key == pygame.K_F10:
+        toggle_overlay()
+    elif event.key == pygame.K_F11:
+        toggle_trace()
+
+def overlay_lines():
+    info = summary()
+    settings = [f"{name}: {value}" for name, value in status.items()]
+    if info is None:
+        return ["collecting..."] + settings
+    lines = [f"FPS {info['fps']:5.1f}  frame {info['frame_ms']:.2f} ms (max {info['max_frame_ms']:.2f})"]
+    for name, ms in info["sections"].items():
+        lines.append(f"  {name:<12} {ms:6.3f} ms")
+    if info["counts"]:
+        lines.append("  ".join(f"{name} {count}" for name, count in info["counts"].items()))
+    if tracing:
+        lines.append(f"TRACING ({_trace_frames} frames)")
+    return lines + settings
+
+def render_overlay(font):
+    """Paint the overlay text and frame time graph onto a new surface"""
+    import pygame
+    lines = overlay_lines()
+    line_height = font.get_linesize()
+    graph_height = 40
+    width = 260
+    surface = pygame.Surface((width, len(lines) * line_height + graph_height + 15))
+    surface.fill((10, 10, 25))
+    box = surface.get_rect()
+    pygame.draw.rect(surface, (90, 90, 140), box, 1)
+    for i, line in enumerate(lines):
+        # Not through the fonts text cache, these lines are rarely drawn twice
+        surface.blit(font.render(line, True, (200, 255, 200)), (5, 5 + i * line_height))
+
+    # Frame time graph, newest frame on the right; red bars are over budget
+    graph = pygame.Rect(5, box.bottom - graph_height - 5, width - 10, graph_height)
+    budget_y = graph.bottom - graph_height // 2
+    pygame.draw.line(surface, (90, 90, 140), (graph.left, budget_y), (graph.right, budget_y))
+    bar_width = graph.width / HISTORY
+    for i, frame in enumerate(history):
+        bar = min(graph_height, int(frame["ms"] / BUDGET_MS * graph_height / 2)) or 1
+        color = (220, 60, 60) if frame["ms"] > BUDGET_MS else (60, 200, 100)
+        left = graph.right - (len(history) - i) * bar_width
+        pygame.draw.line(surface, color, (left, graph.bottom), (left, graph.bottom - bar))
+    return surface
+
+def draw_overlay(screen, font, x=10, y=50):
+    """Draw the profiling overlay, returning the regions drawn"""
+    global _overlay_surface, _overlay_age
+    if not overlay_enabled:
+        return []
+    # Repainted a few times a second rather than every frame, so the numbers
+    # stay readable and the overlay barely shows up in its own timings
+    _overlay_age += 1
+    if _overlay_surface is None or _overlay_age >= OVERLAY_REFRESH:
+        _overlay_surface = render_overlay(font)
+        _overlay_age = 0
+    return [screen.blit(_overlay_surface, (x, y))]
@@ -0,0 +1,101 @@
+import struct
+import sys
+import time
+import zlib
+import engine
+
+# Replays record a game as its session seed plus the paddle input bits of every
+# simulation step. The engine is deterministic for a given seed and inputs, so
+# re-running the steps rebuilds the exact same game, headlessly and far faster
+# than real time.
+#
+# File layout (little endian):
+#   header  magic "BBRP", format version (u8), fps (u16), seed (u32),
+#           steps (u32), final score (u32)
+#   body    zlib-compressed input bits, four 2-bit steps per byte
+
+MAGIC = b"BBRP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBHIII")
+
+class Replay:
+    """Seed and per-step paddle inputs of one game"""
+
+    def __init__(self, seed, fps=engine.STEP_RATE, inputs=None, score=0):
+        self.seed = seed
+        self.fps = fps
+        self.inputs = bytearray() if inputs is None else bytearray(inputs)
+        self.score = score  # Final score claimed by whoever recorded the game
+
+    def record(self, inputs):
+        """Remember the input bits passed to one engine.step()"""
+        self.inputs.append(inputs)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def to_bytes(self):
+        inputs = self.inputs
+        packed = bytearray((len(inputs) + 3) // 4)
+        for i, bits in enumerate(inputs):
+            packed[i >> 2] |= (bits & 3) << ((i & 3) * 2)
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, self.fps, self.seed, len(inputs), self.score)
+        return header + zlib.compress(bytes(packed), 9)
+
+    @classmethod
+    def from_bytes(cls, data, max_steps=None):
+        """Parse replay bytes, rejecting replays longer than max_steps before decompressing them"""
+        magic, version, fps, seed, steps, score = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a replay file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported replay version {version}")
+        if max_steps is not None and steps > max_steps:
+            raise ValueError(f"replay has {steps} steps, more than {max_steps}")
+        # Never inflate more than the header's step count needs, so a small
+        # forged body cannot expand into gigabytes
+        expected = (steps + 3) // 4
+        inflater = zlib.decompressobj()
+        packed = inflater.decompress(data[HEADER.size:], expected)
+        if len(packed) < expected or not inflater.eof:
+            raise ValueError("replay is truncated")
+        if inflater.unconsumed_tail or inflater.unused_data:
+            raise ValueError("replay has more input than its header says")
+        inputs = bytearray(steps)
+        for i in range(steps):
+            inputs[i] = (packed[i >> 2] >> ((i & 3) * 2)) & 3
+        return cls(seed, fps, inputs, score)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+def simulate(replay):
+    """Re-run a replay through the engine and return the final GameState"""
+    state = engine.GameState(replay.seed)
+    dt = 1 / replay.fps
+    step = engine.step
+    for inputs in replay.inputs:
+        step(state, inputs, dt)
+        if state.game_over:
+            break
+    return state
+
+def main():
+    # Usage: python replay.py file.bbr ...
+    for path in sys.argv[1:]:
+        replay = Replay.load(path)
+        start = time.perf_counter()
+        state = simulate(replay)
+        elapsed = time.perf_counter() - start
+        verdict = "matches" if state.score == replay.score else f"recorded {replay.score}"
+        print(f"{path}: seed {replay.seed}, {len(replay)} steps, score {state.score} ({verdict}), "
+              f"level {state.level}, {len(replay) / max(elapsed, 1e-9):,.0f} steps/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import importlib
+import os
+import random
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import engine
+
+# Self-play: evaluate a paddle policy on many seeds. Seeds are split into
+# shards, each shard is played to the end on a process pool (one game never
+# waits on another, so throughput grows with the number of cores), and results
+# are saved as they come back, in bulk, through leaderboard.save_scores() so
+# the leaderboard and running totals stay consistent.
+#
+# A policy is named by a string so it can be sent to the workers: one of
+# POLICIES, or "module:function" for a factory of your own. A factory takes
+# the game seed and returns policy(state) -> input bits for engine.step().
+
+# Games are cut off after five minutes of game time
+MAX_STEPS = 5 * 60 * engine.STEP_RATE
+SHARD_SIZE = 32
+# Results saved per transaction
+SAVE_BATCH_SIZE = 1000
+
+def chase_policy(seed):
+    """Keep the paddle under the lowest ball"""
+    def policy(state):
+        if not state.balls:
+            return 0
+        ball = max(state.balls, key=lambda b: b.y)
+        center = state.paddle_x + state.paddle_width / 2
+        if ball.x < center - 10:
+            return engine.INPUT_LEFT
+        if ball.x > center + 10:
+            return engine.INPUT_RIGHT
+        return 0
+    return policy
+
+def random_policy(seed):
+    """Random moves, reproducible per seed"""
+    rng = random.Random(seed)
+    return lambda state: rng.choice((0, engine.INPUT_LEFT, engine.INPUT_RIGHT))
+
+def idle_policy(seed):
+    """Never move"""
+    return lambda state: 0
+
+POLICIES = {
+    "chase": chase_policy,
+    "random": random_policy,
+    "idle": idle_policy,
+}
+
+def load_policy(name):
+    """The policy factory for a POLICIES name or a "module:function" path"""
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, function = name.partition(":")
+    if not function:
+        raise ValueError(f"unknown policy {name!r}")
+    return getattr(importlib.import_module(module), function)
+
+def play(seed, policy="chase", max_steps=MAX_STEPS):
+    """Play one game to the end, returning (seed, score, level, steps)"""
+    state = engine.GameState(seed)
+    decide = load_policy(policy)(seed)
+    dt = 1 / engine.STEP_RATE
+    step = engine.step
+    steps = 0
+    while not state.game_over and steps < max_steps:
+        step(state, decide(state), dt)
+        steps += 1
+    return seed, state.score, state.level, steps
+
+def play_shard(seeds, policy="chase", max_steps=MAX_STEPS):
+    """Play a list of seeds in one worker"""
+    return [play(seed, policy, max_steps) for seed in seeds]
+
+def get_player(username):
+    """The users row id for a bot player, created on first use"""
+    from leaderboard import ensure_schema
+    from Db import get_connection
+    ensure_schema()
+    conn = get_connection()
+    with conn:
+        # Nobody should log in as a bot, so it gets a random password
+        conn.execute("INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)",
+                     (username, secrets.token_hex(16)))
+    return conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()[0]
+
+def run(seeds, policy="chase", workers=None, shard_size=SHARD_SIZE, max_steps=MAX_STEPS,
+        user_id=None, on_result=None):
+    """Play every seed across a process pool and return the results in seed order.
+
+    With user_id, results are saved to game_scores under that player as they
+    arrive. on_result(results) is called with each finished shard.
+    """
+    from leaderboard import save_scores
+    seeds = list(seeds)
+    shards = [seeds[i:i + shard_size] for i in range(0, len(seeds), shard_size)]
+    results = []
+    unsaved = []
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(play_shard, shard, policy, max_steps) for shard in shards]
+        for future in as_completed(futures):
+            shard_results = future.result()
+            results += shard_results
+            if on_result:
+                on_result(shard_results)
+            if user_id is not None:
+                unsaved += [(user_id, score, level) for _, score, level, _ in shard_results]
+                if len(unsaved) >= SAVE_BATCH_SIZE:
+                    save_scores(unsaved)
+                    unsaved = []
+    if unsaved:
+        save_scores(unsaved)
+    results.sort()
+    return results
+
+def main():
+    # Usage: python selfplay.py [-j workers] [--policy chase] [--seeds N] [--first-seed S]
+    #                           [--db path] [--no-save] [--scaling]
+    args = sys.argv[1:]
+    options = {"-j": None, "--policy": "chase", "--seeds": "1000", "--first-seed": "0", "--db": None}
+    flags = set()
+    while args:
+        arg = args.pop(0)
+        if arg in ("--no-save", "--scaling"):
+            flags.add(arg)
+        else:
+            options[arg] = args.pop(0)
+    seeds = range(int(options["--first-seed"]), int(options["--first-seed"]) + int(options["--seeds"]))
+    policy = options["--policy"]
+    load_policy(policy)  # Fail here rather than in every worker
+
+    if "--scaling" in flags:
+        # Seeds per second with 1, 2, 4, ... workers, compared to one
+        counts, workers = [], 1
+        while workers < (os.cpu_count() or 1):
+            counts.append(workers)
+            workers *= 2
+        counts.append(os.cpu_count() or 1)
+        base = None
+        for workers in counts:
+            start = time.perf_counter()
+            run(seeds, policy, workers)
+            rate = len(seeds) / (time.perf_counter() - start)
+            base = base or rate
+            print(f"{workers:3} workers: {rate:8.1f} seeds/s  {rate / base:5.2f}x  "
+                  f"({rate / base / workers:.0%} of linear)")
+        return
+
+    user_id = None
+    if "--no-save" not in flags:
+        import Db
+        if options["--db"]:
+            Db.DB_PATH = options["--db"]
+        user_id = get_player(f"bot-{policy}")
+
+    workers = int(options["-j"]) if options["-j"] else None
+    start = time.perf_counter()
+    results = run(seeds, policy, workers, user_id=user_id)
+    elapsed = time.perf_counter() - start
+    scores = [score for _, score, _, _ in results]
+    levels = [level for _, _, level, _ in results]
+    print(f"{len(results)} games with policy {policy!r} in {elapsed:.1f} s "
+          f"({len(results) / elapsed:.1f} games/s, {workers or os.cpu_count()} workers)")
+    print(f"score mean {sum(scores) / len(scores):.1f} max {max(scores)}  "
+          f"level mean {sum(levels) / len(levels):.2f} max {max(levels)}")
+    if user_id is not None:
+        print(f"saved as player bot-{policy} (id {user_id})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import pygame
+
+# Pre-rendered sprites for the gameplay screen. Bricks, the paddle and the ball
+# used to be drawn from several rects, circles and scanlines every frame; now
+# each look is painted once into a cached surface and drawn with plain blits.
+#
+# Sprites are painted onto an opaque surface over a key color, exactly like
+# the old drawing onto the screen (which has no alpha channel, so translucent
+# colors were painted opaque), then converted to per-pixel alpha with the key
+# color transparent. The result looks the same as before, rounded corners and all.
+
+KEY_COLOR = (255, 0, 255)
+
+_sprite_cache = {}
+stats = {"hits": 0, "misses": 0}
+
+def get_sprite(key, size, paint):
+    """Get the cached sprite for key, painting it with paint(surface) on first use"""
+    sprite = _sprite_cache.get(key)
+    if sprite is not None:
+        stats["hits"] += 1
+        return sprite
+
+    stats["misses"] += 1
+    sprite = pygame.Surface(size)
+    sprite.fill(KEY_COLOR)
+    paint(sprite)
+    sprite.set_colorkey(KEY_COLOR)
+    if pygame.display.get_surface() is not None:
+        sprite = sprite.convert_alpha()
+    _sprite_cache[key] = sprite
+    return sprite
+
+def cache_stats():
+    return dict(stats, sprites=len(_sprite_cache))
+
+def clear_cache():
+    """Drop all sprites, e.g. after a display mode change"""
+    _sprite_cache.clear()
@@ -0,0 +1,33 @@
+# Fixed timestep. The simulation always advances in steps of the same length,
+# however long a rendered frame took: real time is collected in an
+# accumulator and paid out as whole steps, and what is left over (alpha, a
+# fraction of a step) is used to interpolate what gets drawn between the last
+# two simulated states. A dropped frame just means more steps next frame
+# instead of a slower game, and the display can run at any refresh rate.
+
+# Frame time is capped at this, in seconds, so a long stall (a window drag, a
+# breakpoint) does not try to catch up with thousands of steps at once
+MAX_FRAME_TIME = 0.25
+
+class FixedTimestep:
+    """Turns real frame times into a whole number of fixed-length steps"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.dt = 1 / rate
+        self.accumulator = 0.0
+
+    def advance(self, elapsed):
+        """Add elapsed seconds of real time, returning how many steps to run now"""
+        self.accumulator += min(elapsed, MAX_FRAME_TIME)
+        steps = int(self.accumulator * self.rate)
+        self.accumulator -= steps * self.dt
+        return steps
+
+    @property
+    def alpha(self):
+        """How far real time is into the next step, from 0 to 1"""
+        return min(1.0, self.accumulator * self.rate)
+
+    def reset(self):
+        self.accumulator = 0.0
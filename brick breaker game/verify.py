@@ -0,0 +1,63 @@
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import engine
+from replay import Replay, simulate
+
+# Score verification. A score is only trusted if re-running its replay through
+# the headless engine ends on that same score. Anything that changes the game
+# outside the engine (cheat.py, a memory editor, a hand-written score) leaves a
+# replay that re-simulates to a different result, so the score is rejected.
+
+# The only step rate the game records at
+REPLAY_FPS = engine.STEP_RATE
+# Longest replay accepted, one hour of play, so a forged file cannot keep a
+# verifier busy forever
+MAX_STEPS = REPLAY_FPS * 60 * 60
+
+def check_replay(data):
+    """Re-simulate replay bytes, returning (ok, simulated score, simulated level).
+
+    ok is True when the replay is well formed and its simulation ends on the
+    score recorded in it. The level is the one the simulation reached, which
+    is what gets stored, never a level the client reports.
+    """
+    try:
+        replay = Replay.from_bytes(data, MAX_STEPS)
+    except (ValueError, struct.error, zlib.error):
+        return False, 0, 0
+    if replay.fps != REPLAY_FPS:
+        return False, 0, 0
+    state = simulate(replay)
+    return state.score == replay.score, state.score, state.level
+
+def verify_replays(blobs, workers=None, chunksize=4):
+    """Check many replays across a process pool, in order, as check_replay() results"""
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(check_replay, blobs, chunksize=chunksize))
+
+def main():
+    # Usage: python verify.py [-j workers] file.bbr ...
+    args = sys.argv[1:]
+    workers = None
+    if args[:1] == ["-j"]:
+        workers = int(args[1])
+        args = args[2:]
+    blobs = []
+    for path in args:
+        with open(path, "rb") as f:
+            blobs.append(f.read())
+
+    start = time.perf_counter()
+    results = verify_replays(blobs, workers)
+    elapsed = time.perf_counter() - start
+    for path, (ok, score, level) in zip(args, results):
+        print(f"{path}: {'ok' if ok else 'REJECTED'} (simulated score {score}, level {level})")
+    print(f"{len(blobs)} replays in {elapsed:.2f} s ({len(blobs) / max(elapsed, 1e-9):.1f} replays/s, "
+          f"{workers or os.cpu_count()} workers)")
+
+if __name__ == "__main__":
+    main()